@@ -0,0 +1,275 @@
+"""Memory-mapped catalog file shared by the workers of a multi-worker deployment.
+
+One worker, whichever holds the builder lock, follows Mongo and publishes
+the catalog as a file; the others map the newest file read-only and serve
+snapshot reads (by id, page, state) and the distance matrix from it. The OS
+page cache holds one copy of the file for all workers.
+
+Only the snapshot and the matrix are shared. Each worker still builds its
+own search, fuzzy, geo and typeahead indexes from the decoded documents,
+and the search index keeps those documents, so a follower's heap is about
+that of the indexes (see benchmarks/bench_catalog_file.py).
+
+Layout, little-endian: MAGIC, the header length as a uint64, the JSON
+header, then 8-byte aligned sections listed in the header:
+
+- ids: temple ids in sorted order, UTF-8 padded to the longest (NumPy "S" dtype)
+- docs, doc_offsets: one JSON document per temple, in id order
+- coordinates: float64 (lat, lng) per temple, NaN when missing
+- state_rows, deity_rows: uint32 rows per state and deity, ranges in the header
+- distances: the float32 road km matrix, only up to DISTANCES_MAX_TEMPLES
+
+Files are written under a temporary name and renamed into place. The CURRENT
+file names the newest one, with the version it holds and when the builder
+last confirmed it up to date, and is replaced atomically as well.
+"""
+import mmap
+import os
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+
+from distance_matrix import BLOCK_ROWS, DEFAULT_MAX_DENSE as DISTANCES_MAX_TEMPLES, road_km_matrix
+from planner import temple_point
+
+MAGIC = b"TMPLCAT1"
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "builder.lock"
+ALIGNMENT = 8
+# Published files kept on disk; a worker may still be opening the previous one
+KEEP_FILES = 2
+
+
+def _padding(length: int) -> bytes:
+    return b"\0" * (-length % ALIGNMENT)
+
+
+def _offsets(blobs: List[bytes]) -> np.ndarray:
+    offsets = np.zeros(len(blobs) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(blob) for blob in blobs], dtype=np.uint64)
+    return offsets
+
+
+def _postings(docs: List[Dict[str, Any]], field: str) -> Tuple[np.ndarray, Dict[str, List[int]]]:
+    rows: Dict[str, List[int]] = {}
+    for row, doc in enumerate(docs):
+        if doc.get(field):
+            rows.setdefault(doc[field], []).append(row)
+    ranges = {}
+    flat: List[int] = []
+    for value, value_rows in rows.items():
+        ranges[value] = [len(flat), len(value_rows)]
+        flat.extend(value_rows)
+    return np.array(flat, dtype=np.uint32), ranges
+
+
+def write_catalog_file(directory: str, version: int, temples: Iterable[Dict[str, Any]]) -> str:
+    """Write temples to a new catalog file in directory and return its name"""
+    docs = sorted(
+        ({key: value for key, value in temple.items() if key != "_id"} for temple in temples if temple.get("id")),
+        key=lambda doc: doc["id"]
+    )
+    ids = np.array([doc["id"].encode() for doc in docs], dtype=f"S{max((len(doc['id'].encode()) for doc in docs), default=1)}")
+    blobs = [orjson.dumps(doc) for doc in docs]
+    coordinates = np.array([temple_point(doc) or (np.nan, np.nan) for doc in docs], dtype=np.float64).reshape(-1, 2)
+    state_rows, states = _postings(docs, "state")
+    deity_rows, deities = _postings(docs, "deity")
+    sections = [
+        ("ids", ids.tobytes()),
+        ("doc_offsets", _offsets(blobs).tobytes()),
+        ("docs", b"".join(blobs)),
+        ("coordinates", coordinates.tobytes()),
+        ("state_rows", state_rows.tobytes()),
+        ("deity_rows", deity_rows.tobytes()),
+    ]
+    if len(docs) <= DISTANCES_MAX_TEMPLES:
+        lat, lng = np.radians(coordinates[:, 0]), np.radians(coordinates[:, 1])
+        distances = np.empty((len(docs), len(docs)), dtype=np.float32)
+        for start in range(0, len(docs), BLOCK_ROWS):
+            distances[start:start + BLOCK_ROWS] = road_km_matrix(lat[start:start + BLOCK_ROWS], lng[start:start + BLOCK_ROWS], lat, lng)
+        sections.append(("distances", distances.tobytes()))
+
+    # Section offsets depend on the header length, which depends on the offsets; fix the width first
+    layout = {name: [0, len(data)] for name, data in sections}
+    header = {
+        "version": version, "count": len(docs), "id_dtype": ids.dtype.str, "sections": layout,
+        "states": states, "deities": deities
+    }
+    width = len(orjson.dumps({**header, "sections": {name: [10 ** 15, size] for name, (_, size) in layout.items()}}))
+    position = len(MAGIC) + 8 + width + len(_padding(width))
+    for name, data in sections:
+        layout[name][0] = position
+        position += len(data) + len(_padding(len(data)))
+    encoded = orjson.dumps(header).ljust(width)
+
+    name = f"catalog-{version:010d}-{uuid.uuid4().hex[:8]}.bin"
+    temporary = os.path.join(directory, f".{name}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(MAGIC + len(encoded).to_bytes(8, "little") + encoded + _padding(len(encoded)))
+        for _, data in sections:
+            f.write(data + _padding(len(data)))
+    os.replace(temporary, os.path.join(directory, name))
+    return name
+
+
+def write_current(directory: str, name: str, version: int, verified_at: float):
+    """Point CURRENT at file name, holding version as confirmed at wall-clock time verified_at"""
+    temporary = os.path.join(directory, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(orjson.dumps({"file": name, "version": version, "verified_at": verified_at}))
+    os.replace(temporary, os.path.join(directory, CURRENT_FILE))
+
+
+def read_current(directory: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+
+def prune_catalog_files(directory: str, keep: str):
+    """Delete published files other than keep and the newest before it; mapped files stay readable"""
+    names = sorted(name for name in os.listdir(directory) if name.startswith("catalog-") and name.endswith(".bin"))
+    older = [name for name in names if name != keep]
+    for name in older[:max(0, len(older) - (KEEP_FILES - 1))]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+class MappedCatalog:
+    """Read-only view of a catalog file; documents are decoded from the mapping on access"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            # Never closed explicitly: NumPy views keep it alive until the last reference goes
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a catalog file")
+        width = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 8], "little")
+        header = orjson.loads(self._map[len(MAGIC) + 8:len(MAGIC) + 8 + width])
+        self.version: int = header["version"]
+        self.count: int = header["count"]
+        self._sections: Dict[str, List[int]] = header["sections"]
+        self._states: Dict[str, List[int]] = header["states"]
+        self._deities: Dict[str, List[int]] = header["deities"]
+        self._view = memoryview(self._map)
+        self.ids = self._array("ids", np.dtype(header["id_dtype"]))
+        self._doc_offsets = self._array("doc_offsets", np.uint64)
+        self._docs_start = self._sections["docs"][0]
+        self.coordinates = self._array("coordinates", np.float64).reshape(-1, 2)
+        self._state_rows = self._array("state_rows", np.uint32)
+        self._deity_rows = self._array("deity_rows", np.uint32)
+        self.distances = (
+            self._array("distances", np.float32).reshape(self.count, self.count) if "distances" in self._sections else None
+        )
+
+    def _array(self, section: str, dtype) -> np.ndarray:
+        offset, size = self._sections[section]
+        return np.frombuffer(self._map, dtype=dtype, count=size // np.dtype(dtype).itemsize, offset=offset)
+
+    def __len__(self):
+        return self.count
+
+    def id_at(self, row: int) -> str:
+        return self.ids[row].decode()
+
+    def raw(self, row: int) -> memoryview:
+        """The encoded document at row, without decoding it"""
+        return self._view[self._docs_start + int(self._doc_offsets[row]):self._docs_start + int(self._doc_offsets[row + 1])]
+
+    def doc(self, row: int) -> Dict[str, Any]:
+        return orjson.loads(self.raw(row))
+
+    def row_of(self, temple_id: str) -> Optional[int]:
+        key = temple_id.encode()
+        row = int(np.searchsorted(self.ids, key))
+        return row if row < self.count and self.ids[row] == key else None
+
+    def get(self, temple_id: str) -> Optional[Dict[str, Any]]:
+        row = self.row_of(temple_id)
+        return self.doc(row) if row is not None else None
+
+    def page(self, after: str = "", limit: int = 100) -> List[Dict[str, Any]]:
+        """Up to limit temples with ids after `after`, in id order"""
+        start = int(np.searchsorted(self.ids, after.encode(), side="right")) if after else 0
+        return [self.doc(row) for row in range(start, min(self.count, start + limit))]
+
+    def many(self, temple_ids: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Temples for the given ids in request order, plus the unknown ids"""
+        rows = {temple_id: self.row_of(temple_id) for temple_id in dict.fromkeys(temple_ids)}
+        temples = [self.doc(rows[temple_id]) for temple_id in temple_ids if rows[temple_id] is not None]
+        return temples, [temple_id for temple_id, row in rows.items() if row is None]
+
+    def _rows(self, ranges: Dict[str, List[int]], flat: np.ndarray, values: Iterable[str]) -> np.ndarray:
+        parts = [flat[start:start + size] for start, size in (ranges[value] for value in values if value in ranges)]
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.uint32)
+
+    def in_states(self, states: Iterable[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Temples whose state is one of states, in id order; all temples if states is empty"""
+        states = list(states)
+        if not states:
+            return self.page(limit=limit if limit is not None else self.count)
+        rows = self._rows(self._states, self._state_rows, states)
+        return [self.doc(int(row)) for row in rows[:limit]]
+
+    def temples(self) -> Iterator[Dict[str, Any]]:
+        for row in range(self.count):
+            yield self.doc(row)
+
+
+def catalog_file_changes(old: MappedCatalog, new: MappedCatalog) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Temples of new whose document differs from old, and the ids only old holds.
+
+    Documents are compared encoded, so only the changed ones are decoded.
+    """
+    _, old_rows, new_rows = np.intersect1d(old.ids, new.ids, assume_unique=True, return_indices=True)
+    kept = np.zeros(len(new), dtype=bool)
+    kept[new_rows] = True
+    upserted = [new.doc(int(row)) for row in np.flatnonzero(~kept)]
+    upserted += [new.doc(int(row)) for old_row, row in zip(old_rows, new_rows) if old.raw(int(old_row)) != new.raw(int(row))]
+    gone = np.ones(len(old), dtype=bool)
+    gone[old_rows] = False
+    return upserted, [old.id_at(int(row)) for row in np.flatnonzero(gone)]
+
+
+class BuilderLock:
+    """Advisory lock electing the one worker that follows Mongo and writes catalog files.
+
+    The OS drops the lock when its holder exits, so another worker takes over.
+    """
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """Take the lock if it is free; never blocks"""
+        # POSIX only, like the multi-worker mode that needs it
+        import fcntl
+
+        if self._file is not None:
+            return True
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
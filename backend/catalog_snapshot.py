@@ -0,0 +1,436 @@
+"""In-process snapshot of the temple catalog.
+
+Reads by id, id-ordered pages and state lookups are served from memory
+instead of Mongo. The snapshot follows writes from any replica: through a
+change stream on the temples collection when Mongo runs as a replica set,
+otherwise by polling the catalog version every half staleness interval
+and reloading when it moved.
+
+`fresh` is True only while the snapshot has been confirmed up to date
+within `max_staleness` seconds; callers fall back to Mongo when it is
+False, which includes the warm-up before the first load has finished.
+
+With a `catalog_file` directory, the workers of one host share a single
+copy: the worker holding the builder lock follows Mongo as above and
+publishes the catalog as a memory-mapped file (see catalog_file.py), and
+the others serve reads from the newest file without touching Mongo. When a
+new file is published, the others pass just the temples that differ from
+the previous file to on_change. If the builder exits, another worker takes
+the lock and carries on.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo.errors import OperationFailure
+
+from catalog_file import (
+    BuilderLock, MappedCatalog, catalog_file_changes, prune_catalog_files, read_current, write_catalog_file, write_current
+)
+
+DEFAULT_MAX_STALENESS = 5.0
+# Change events applied together, so a bulk import does not update the indexes row by row
+CHANGE_BATCH_SIZE = 500
+# Temples a reload applies between yields to the event loop when it updates the indexes in place
+RELOAD_BATCH_SIZE = 100
+# A reload that finds more changed temples than this rebuilds everything in a worker thread instead
+RELOAD_MAX_CHANGES = 5000
+RETRY_SECONDS = 5.0
+
+ReloadHook = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+ChangeHook = Callable[[List[Dict[str, Any]], List[str]], Awaitable[None]]
+
+
+def strip_id(temple: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in temple.items() if key != "_id"}
+
+
+def catalog_contents(temples: Iterable[Dict[str, Any]]):
+    """Docs by id, ids by state, temple ids by Mongo _id and ids in order, for CatalogSnapshot.replace"""
+    docs: Dict[str, Dict[str, Any]] = {}
+    by_state: Dict[str, Set[str]] = {}
+    object_ids: Dict[Any, str] = {}
+    for temple in temples:
+        temple_id = temple.get("id")
+        if not temple_id:
+            continue
+        previous = docs.get(temple_id)
+        if previous is not None and previous.get("state"):
+            by_state[previous["state"]].discard(temple_id)
+        doc = docs[temple_id] = strip_id(temple)
+        if "_id" in temple:
+            object_ids[temple["_id"]] = temple_id
+        if doc.get("state"):
+            by_state.setdefault(doc["state"], set()).add(temple_id)
+    by_state = {state: ids for state, ids in by_state.items() if ids}
+    return docs, by_state, object_ids, sorted(docs)
+
+
+def catalog_changes(known: Dict[str, Dict[str, Any]], temples: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Temples that differ from known, by id, and the ids of known temples missing from temples"""
+    seen = set()
+    upserted = []
+    for temple in temples:
+        temple_id = temple.get("id")
+        if not temple_id:
+            continue
+        seen.add(temple_id)
+        if known.get(temple_id) != strip_id(temple):
+            upserted.append(temple)
+    return upserted, [temple_id for temple_id in known if temple_id not in seen]
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """Apply an inclusion projection like temple_projection() builds"""
+    if not projection:
+        return doc
+    fields = [field for field, include in projection.items() if include and field != "_id"]
+    if not fields:
+        return doc
+    return {field: doc[field] for field in fields if field in doc}
+
+
+class CatalogSnapshot:
+    """Temples by id, with id order and state lookups, kept in step with Mongo"""
+
+    def __init__(
+        self,
+        temples_collection,
+        catalog_version,
+        max_staleness: float = DEFAULT_MAX_STALENESS,
+        on_reload: Optional[ReloadHook] = None,
+        on_change: Optional[ChangeHook] = None,
+        catalog_file: Optional[str] = None,
+    ):
+        self.temples_collection = temples_collection
+        self.catalog_version = catalog_version
+        self.max_staleness = max_staleness
+        self.on_reload = on_reload
+        self.on_change = on_change
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.by_state: Dict[str, Set[str]] = {}
+        # Mongo _id -> temple id, since change stream deletes only carry the _id
+        self._object_ids: Dict[Any, str] = {}
+        # Temple ids in order for pages, rebuilt lazily after writes
+        self._ordered: Optional[List[str]] = None
+        # Catalog version the contents correspond to
+        self.version: Optional[int] = None
+        self.verified_at: Optional[float] = None
+        self.mode: Optional[str] = None
+        self.reloads = 0
+        self.changes = 0
+        # Bumped on every change to docs, so the builder knows when to publish a new file
+        self._generation = 0
+        # Directory of the file shared by the workers of this host, and the file this worker serves from
+        self.catalog_file = catalog_file
+        self.mapped: Optional[MappedCatalog] = None
+        self._builder_lock = BuilderLock(catalog_file) if catalog_file else None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.mapped) if self.mapped is not None else len(self.docs)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the snapshot was last confirmed up to date"""
+        return None if self.verified_at is None else time.monotonic() - self.verified_at
+
+    @property
+    def fresh(self) -> bool:
+        age = self.age
+        return self.ready and age is not None and age <= self.max_staleness
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first load, for at most timeout seconds if given; whether it has finished"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    # Reads
+
+    def get(self, temple_id: str, projection=None) -> Optional[Dict[str, Any]]:
+        doc = self.mapped.get(temple_id) if self.mapped is not None else self.docs.get(temple_id)
+        return project(doc, projection) if doc is not None else None
+
+    def page(self, after: str = "", limit: int = 100, projection=None) -> List[Dict[str, Any]]:
+        """Up to limit temples with ids after `after`, in id order"""
+        if self.mapped is not None:
+            return [project(doc, projection) for doc in self.mapped.page(after, limit)]
+        if self._ordered is None:
+            self._ordered = sorted(self.docs)
+        start = bisect_right(self._ordered, after) if after else 0
+        return [project(self.docs[temple_id], projection) for temple_id in self._ordered[start:start + limit]]
+
+    def many(self, temple_ids: List[str], projection=None) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Temples for the given ids in request order, plus the unknown ids"""
+        if self.mapped is not None:
+            temples, missing = self.mapped.many(temple_ids)
+            return [project(doc, projection) for doc in temples], missing
+        temples = [project(self.docs[temple_id], projection) for temple_id in temple_ids if temple_id in self.docs]
+        missing = [temple_id for temple_id in dict.fromkeys(temple_ids) if temple_id not in self.docs]
+        return temples, missing
+
+    def in_states(self, states: Iterable[str], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Temples whose state is one of states, in id order; all temples if states is empty"""
+        if self.mapped is not None:
+            return self.mapped.in_states(states, limit)
+        states = list(states)
+        if not states:
+            return self.page(limit=limit if limit is not None else len(self.docs))
+        ids = sorted(set().union(*(self.by_state.get(state, ()) for state in states)))
+        return [self.docs[temple_id] for temple_id in ids[:limit]]
+
+    # Writes
+
+    def _add(self, temple: Dict[str, Any]):
+        temple_id = temple.get("id")
+        if not temple_id:
+            return
+        if temple_id in self.docs:
+            self._discard(temple_id)
+        doc = strip_id(temple)
+        self.docs[temple_id] = doc
+        if "_id" in temple:
+            self._object_ids[temple["_id"]] = temple_id
+        if doc.get("state"):
+            self.by_state.setdefault(doc["state"], set()).add(temple_id)
+        self._ordered = None
+        self._generation += 1
+
+    def _discard(self, temple_id: str):
+        doc = self.docs.pop(temple_id, None)
+        if doc is None:
+            return
+        ids = self.by_state.get(doc.get("state"))
+        if ids is not None:
+            ids.discard(temple_id)
+            if not ids:
+                del self.by_state[doc["state"]]
+        self._ordered = None
+        self._generation += 1
+
+    def replace(self, temples: Iterable[Dict[str, Any]]):
+        """Replace the contents with the given temples"""
+        self._adopt(catalog_contents(temples))
+
+    def _adopt(self, contents):
+        self.docs, self.by_state, self._object_ids, self._ordered = contents
+        self._generation += 1
+
+    def apply(self, upserted: Iterable[Dict[str, Any]] = (), removed: Iterable[str] = ()):
+        """Apply temples written or deleted by this process"""
+        if self.mapped is not None:
+            # The shared file is read-only: reads go to Mongo until the builder publishes these writes
+            self.verified_at = None
+            return
+        for temple in upserted:
+            self._add(temple)
+        for temple_id in removed:
+            self._discard(temple_id)
+
+    def _verified(self, version: Optional[int] = None):
+        if version is not None:
+            self.version = version
+        self.verified_at = time.monotonic()
+
+    # Refresh
+
+    async def reload(self):
+        """Load the whole catalog from Mongo and adopt the version it was read at.
+
+        The first load replaces the contents. Later ones, e.g. after another
+        replica or an import bumped the version, work out in a worker thread
+        which temples changed and apply just those, like change events; past
+        RELOAD_MAX_CHANGES everything is replaced as on the first load, with
+        the contents built off the event loop either way.
+        """
+        version = await self.catalog_version.read()
+        temples = await self.temples_collection.find({}).to_list(None)
+        changes = None
+        # Right after taking over as builder the docs are still empty, and everything is rebuilt
+        if self.ready and self.mapped is None and self.docs:
+            upserted, removed = await asyncio.to_thread(catalog_changes, dict(self.docs), temples)
+            if len(upserted) + len(removed) <= RELOAD_MAX_CHANGES:
+                changes = upserted, removed
+        if changes is None:
+            self._adopt(await asyncio.to_thread(catalog_contents, temples))
+            if self.on_reload is not None:
+                await self.on_reload(list(self.docs.values()))
+        else:
+            await self._apply_changes(*changes)
+        # A write that raced the read bumps the version again and is picked up next time
+        self.catalog_version.value = max(self.catalog_version.value, version)
+        self.reloads += 1
+        self._verified(version)
+        self._ready.set()
+
+    async def _apply_changes(self, upserted: List[Dict[str, Any]], removed: List[str]):
+        """Apply changes found by a reload or a new file in small batches, yielding to requests in between"""
+        for start in range(0, max(len(upserted), len(removed)), RELOAD_BATCH_SIZE):
+            batch, gone = upserted[start:start + RELOAD_BATCH_SIZE], removed[start:start + RELOAD_BATCH_SIZE]
+            if self.mapped is None:
+                # A mapped file already holds the changes
+                self.apply(batch, gone)
+                batch = [self.docs[temple["id"]] for temple in batch]
+            self.changes += len(batch) + len(gone)
+            if self.on_change is not None:
+                await self.on_change(batch, gone)
+            await asyncio.sleep(0)
+
+    def start(self):
+        """Start warming up and following changes; call from a running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._builder_lock is not None:
+            self._builder_lock.release()
+        # Nothing keeps the contents current any more
+        self._ready.clear()
+        self.verified_at = None
+        self.mode = None
+
+    async def _run(self):
+        if self._builder_lock is None:
+            await self._follow_mongo()
+            return
+        os.makedirs(self.catalog_file, exist_ok=True)
+        await self._follow_file()
+        # This worker is the builder now, and reloads from Mongo into its own docs
+        self.mapped = None
+        self.verified_at = None
+        await asyncio.gather(self._follow_mongo(), self._publish_file())
+
+    async def _follow_mongo(self):
+        while True:
+            try:
+                await self._follow_changes()
+            except OperationFailure as e:
+                if self.mode != "change_stream":
+                    # Standalone servers have no change streams
+                    print(f"Catalog change streams unavailable, polling the catalog version: {str(e)}")
+                    break
+                print(f"Catalog change stream failed: {str(e)}")
+                await asyncio.sleep(RETRY_SECONDS)
+            except Exception as e:
+                print(f"Catalog change stream failed: {str(e)}")
+                await asyncio.sleep(RETRY_SECONDS)
+        self.mode = "polling"
+        while True:
+            try:
+                if not self.ready or await self.catalog_version.read() != self.version:
+                    await self.reload()
+                else:
+                    self._verified()
+            except Exception as e:
+                print(f"Catalog snapshot refresh failed: {str(e)}")
+            await asyncio.sleep(self.max_staleness / 2)
+
+    async def _follow_changes(self):
+        """Apply change events until the stream fails; idle polls confirm freshness"""
+        async with self.temples_collection.watch(
+            full_document="updateLookup", max_await_time_ms=int(self.max_staleness * 500)
+        ) as stream:
+            self.mode = "change_stream"
+            # Anything written before the stream opened is only visible to a reload
+            await self.reload()
+            while True:
+                upserted: List[Dict[str, Any]] = []
+                removed: List[str] = []
+                change = await stream.try_next()
+                while change is not None:
+                    self._collect(change, upserted, removed)
+                    if len(upserted) + len(removed) >= CHANGE_BATCH_SIZE:
+                        break
+                    change = await stream.try_next()
+                if upserted or removed:
+                    self.apply(upserted, removed)
+                    self.changes += len(upserted) + len(removed)
+                    if self.on_change is not None:
+                        written = (self.docs.get(temple_id) for temple_id in dict.fromkeys(doc["id"] for doc in upserted))
+                        await self.on_change([doc for doc in written if doc is not None], removed)
+                # The version bump follows the temple writes, so ETags move once it lands
+                self.catalog_version.value = max(self.catalog_version.value, await self.catalog_version.read())
+                self._verified(self.catalog_version.value)
+
+    async def _follow_file(self):
+        """Serve the newest published file until this worker can take the builder lock"""
+        self.mode = "file"
+        while not self._builder_lock.acquire():
+            try:
+                await self._map_current()
+            except Exception as e:
+                print(f"Catalog file refresh failed: {str(e)}")
+            await asyncio.sleep(self.max_staleness / 2)
+
+    async def _map_current(self):
+        current = read_current(self.catalog_file)
+        if current is None:
+            return
+        if self.mapped is None or self.mapped.name != current["file"]:
+            mapped = await asyncio.to_thread(MappedCatalog, os.path.join(self.catalog_file, current["file"]))
+            previous, changes = self.mapped, None
+            if previous is not None and self.ready:
+                upserted, removed = await asyncio.to_thread(catalog_file_changes, previous, mapped)
+                if len(upserted) + len(removed) <= RELOAD_MAX_CHANGES:
+                    changes = upserted, removed
+            self.mapped = mapped
+            if changes is not None:
+                await self._apply_changes(*changes)
+            else:
+                if self.on_reload is not None:
+                    await self.on_reload(await asyncio.to_thread(lambda: list(mapped.temples())))
+                self.reloads += 1
+            self._ready.set()
+        self.catalog_version.value = max(self.catalog_version.value, current["version"])
+        # Fresh while the builder keeps confirming the file, and the file holds this worker's own writes
+        age = time.time() - current["verified_at"]
+        if current["version"] >= self.catalog_version.value and age <= self.max_staleness:
+            self._verified(current["version"])
+            self.verified_at -= max(0.0, age)
+
+    async def _publish_file(self):
+        """Publish a new file whenever the contents changed, and confirm the current one otherwise"""
+        published_generation = None
+        name = None
+        while True:
+            try:
+                if self.ready and self._generation != published_generation:
+                    generation = self._generation
+                    name = await asyncio.to_thread(write_catalog_file, self.catalog_file, self.version, list(self.docs.values()))
+                    published_generation = generation
+                    prune_catalog_files(self.catalog_file, name)
+                if name is not None and self._generation == published_generation and self.age is not None:
+                    write_current(self.catalog_file, name, self.version, time.time() - self.age)
+            except Exception as e:
+                print(f"Catalog file publish failed: {str(e)}")
+            await asyncio.sleep(self.max_staleness / 4)
+
+    def _collect(self, change: Dict[str, Any], upserted: List[Dict[str, Any]], removed: List[str]):
+        operation = change.get("operationType")
+        if operation in ("insert", "replace", "update"):
+            doc = change.get("fullDocument")
+            if doc and doc.get("id"):
+                known = self.docs.get(doc["id"])
+                # Writes made by this process have already been applied
+                if known is None or known != {key: value for key, value in doc.items() if key != "_id"}:
+                    upserted.append(doc)
+        elif operation == "delete":
+            temple_id = self._object_ids.pop(change.get("documentKey", {}).get("_id"), None)
+            if temple_id is not None:
+                removed.append(temple_id)
+        elif operation in ("drop", "rename", "invalidate"):
+            raise RuntimeError(f"temples collection {operation}")
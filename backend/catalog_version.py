@@ -0,0 +1,60 @@
+"""Catalog version counter behind the ETags of temple read routes.
+
+The version lives in a `meta` document so every replica derives the same
+ETag, and a copy is kept in memory so conditional requests can be answered
+without touching Mongo.
+"""
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+CATALOG_VERSION_ID = "catalog_version"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag, as RFC 9110 requires"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+class CatalogVersion:
+    """Monotonic version of temples_collection, bumped on every write"""
+
+    def __init__(self, meta_collection):
+        self.meta_collection = meta_collection
+        self.value = 0
+
+    @property
+    def etag(self) -> str:
+        return f'"catalog-{self.value}"'
+
+    async def read(self) -> int:
+        """The stored version, without adopting it"""
+        doc = await self.meta_collection.find_one({"_id": CATALOG_VERSION_ID})
+        return doc["version"] if doc else 0
+
+    async def load(self) -> int:
+        """Read the stored version, e.g. at startup"""
+        self.value = await self.read()
+        return self.value
+
+    async def bump(self) -> int:
+        """Record a catalog write and return the new version"""
+        doc = await self.meta_collection.find_one_and_update(
+            {"_id": CATALOG_VERSION_ID},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self.value = doc["version"]
+        return self.value
@@ -0,0 +1,190 @@
+"""Pairwise road distances and travel times between catalog temples.
+
+Temple coordinates are kept in NumPy arrays, one row per temple, and
+distances are computed with vectorized haversine in blocks of BLOCK_ROWS
+rows instead of pair by pair in Python.
+
+Up to `max_dense` temples, the full road-km matrix is precomputed when
+the catalog is loaded and kept current as temples are written: a new or
+moved temple costs one vectorized row, a removed one just frees its row
+for reuse. Past that size a dense matrix no longer fits comfortably in
+memory (n² float32s), so submatrices are computed on request instead,
+which still takes well under a millisecond for a few hundred temples.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from geo_index import EARTH_RADIUS_KM
+from planner import AVERAGE_ROAD_SPEED_KMH, ROAD_DETOUR_FACTOR, temple_point
+
+# 4000 temples is 64 MB of float32
+DEFAULT_MAX_DENSE = 4000
+BLOCK_ROWS = 1024
+MIN_CAPACITY = 64
+
+
+def road_km_matrix(lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """Road km from every point in 1 (rows) to every point in 2 (columns); coordinates in radians"""
+    d_phi = lat2[None, :] - lat1[:, None]
+    d_lambda = lng2[None, :] - lng1[:, None]
+    a = np.sin(d_phi / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * ROAD_DETOUR_FACTOR * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def travel_hours(km: np.ndarray) -> np.ndarray:
+    return km / AVERAGE_ROAD_SPEED_KMH
+
+
+class DistanceMatrix:
+    """Road distances between temples with coordinates, by temple id"""
+
+    def __init__(self, max_dense: int = DEFAULT_MAX_DENSE):
+        self.max_dense = max_dense
+        # temple id -> row in the coordinate arrays and the matrix
+        self.rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        # Rows in use or freed; rows at or past this have never been used
+        self._size = 0
+        self._lat = np.zeros(0)
+        self._lng = np.zeros(0)
+        # Road km between rows, capacity x capacity; None above max_dense temples
+        self._km: Optional[np.ndarray] = None
+        # The MappedCatalog the contents were adopted from, if any
+        self.mapped = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def dense(self) -> bool:
+        return self._km is not None
+
+    def build(self, temples: Iterable[Dict[str, Any]]):
+        """Replace the contents with the given temples and precompute the matrix if it fits"""
+        points: Dict[str, Tuple[float, float]] = {}
+        for temple in temples:
+            point = temple_point(temple)
+            if temple.get("id") and point is not None:
+                points[temple["id"]] = point
+        n = len(points)
+        capacity = max(MIN_CAPACITY, n)
+        self.rows = {temple_id: row for row, temple_id in enumerate(points)}
+        self._free = []
+        self._size = n
+        self._lat = np.zeros(capacity)
+        self._lng = np.zeros(capacity)
+        if n:
+            coordinates = np.radians(np.array(list(points.values()), dtype=np.float64))
+            self._lat[:n] = coordinates[:, 0]
+            self._lng[:n] = coordinates[:, 1]
+        self._km = None
+        self.mapped = None
+        if n <= self.max_dense:
+            self._km = np.zeros((capacity, capacity), dtype=np.float32)
+            for start in range(0, n, BLOCK_ROWS):
+                stop = min(n, start + BLOCK_ROWS)
+                self._km[start:stop, :n] = road_km_matrix(
+                    self._lat[start:stop], self._lng[start:stop], self._lat[:n], self._lng[:n]
+                )
+
+    def map(self, mapped):
+        """Adopt the coordinates and precomputed matrix of a MappedCatalog; the matrix stays shared until a write"""
+        located = ~np.isnan(mapped.coordinates[:, 0])
+        self.rows = {mapped.id_at(int(row)): int(row) for row in np.flatnonzero(located)}
+        self._free = [int(row) for row in np.flatnonzero(~located)]
+        self._size = len(mapped)
+        self._lat = np.where(located, np.radians(mapped.coordinates[:, 0]), 0.0)
+        self._lng = np.where(located, np.radians(mapped.coordinates[:, 1]), 0.0)
+        self._km = mapped.distances if mapped.distances is not None and len(self.rows) <= self.max_dense else None
+        self.mapped = mapped
+
+    def _grow(self):
+        capacity = max(MIN_CAPACITY, 2 * len(self._lat))
+        lat = np.zeros(capacity)
+        lng = np.zeros(capacity)
+        lat[:self._size] = self._lat[:self._size]
+        lng[:self._size] = self._lng[:self._size]
+        self._lat, self._lng = lat, lng
+        if self._km is not None:
+            # Never past max_dense rows: one more temple than that drops the matrix instead
+            capacity = min(capacity, max(self.max_dense, self._size + 1))
+            km = np.zeros((capacity, capacity), dtype=np.float32)
+            km[:self._size, :self._size] = self._km[:self._size, :self._size]
+            self._km = km
+
+    def upsert(self, temple: Dict[str, Any]):
+        """Add or move a temple; one without coordinates is removed"""
+        temple_id = temple.get("id")
+        if not temple_id:
+            return
+        point = temple_point(temple)
+        if point is None:
+            self.remove(temple_id)
+            return
+        row = self.rows.get(temple_id)
+        lat, lng = np.radians(point)
+        if row is not None and self._lat[row] == lat and self._lng[row] == lng:
+            # Not moved, e.g. a renamed temple or one a newly mapped file already holds
+            return
+        if self._km is not None and not self._km.flags.writeable:
+            # Mapped from the shared catalog file; computed on request until the next file is mapped
+            self._km = None
+        if row is None:
+            if self._km is not None and len(self.rows) >= self.max_dense:
+                # Too big to keep dense; submatrices are computed on request from now on.
+                # Dropped before growing so the matrix is never reallocated past max_dense.
+                self._km = None
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == len(self._lat):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self.rows[temple_id] = row
+        self._lat[row], self._lng[row] = lat, lng
+        if self._km is not None:
+            distances = road_km_matrix(self._lat[row:row + 1], self._lng[row:row + 1], self._lat[:self._size], self._lng[:self._size])[0]
+            self._km[row, :self._size] = distances
+            self._km[:self._size, row] = distances
+
+    def remove(self, temple_id: str):
+        """Drop a temple if present; its row is reused by the next new temple"""
+        row = self.rows.pop(temple_id, None)
+        if row is not None:
+            self._free.append(row)
+
+    def submatrix(self, temple_ids: Iterable[str]) -> Tuple[List[str], np.ndarray, List[str]]:
+        """Road km between the known temples among temple_ids, with those ids in request order and the unknown ids"""
+        unique_ids = list(dict.fromkeys(temple_ids))
+        found = [temple_id for temple_id in unique_ids if temple_id in self.rows]
+        missing = [temple_id for temple_id in unique_ids if temple_id not in self.rows]
+        rows = np.array([self.rows[temple_id] for temple_id in found], dtype=np.intp)
+        if self._km is not None:
+            # Stored as float32 to halve the memory; widened so rounding gives clean JSON numbers
+            return found, self._km[np.ix_(rows, rows)].astype(np.float64), missing
+        lat, lng = self._lat[rows], self._lng[rows]
+        km = np.empty((len(rows), len(rows)))
+        for start in range(0, len(rows), BLOCK_ROWS):
+            km[start:start + BLOCK_ROWS] = road_km_matrix(lat[start:start + BLOCK_ROWS], lng[start:start + BLOCK_ROWS], lat, lng)
+        return found, km, missing
+
+    def route_distances(self, temple_ids: List[str], start: Optional[Tuple[float, float]]) -> Optional[List[List[float]]]:
+        """Road km between start (if given) followed by temple_ids, as nested lists for the planner.
+
+        None if any temple is unknown, e.g. a write the matrix has not seen yet.
+        """
+        found, km, missing = self.submatrix(temple_ids)
+        if missing or len(found) != len(temple_ids):
+            return None
+        if start is None:
+            return km.tolist()
+        rows = np.array([self.rows[temple_id] for temple_id in found], dtype=np.intp)
+        lat, lng = np.radians(start)
+        from_start = road_km_matrix(np.array([lat]), np.array([lng]), self._lat[rows], self._lng[rows])[0]
+        full = np.zeros((len(found) + 1, len(found) + 1))
+        full[0, 1:] = from_start
+        full[1:, 0] = from_start
+        full[1:, 1:] = km
+        return full.tolist()
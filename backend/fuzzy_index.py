@@ -0,0 +1,258 @@
+"""Approximate temple search tolerant of typos and transliteration variants.
+
+Indian temple names have no single romanization: Meenakshi/Minakshi,
+Kashi/Kasi, Vishwanath/Vishvanath, Brihadishvara/Brihadeeswarar. Every
+indexed word is reduced to a phonetic key that folds the common variants
+together (long vowels, aspirated consonants, sh/s, w/v, doubled letters,
+a trailing schwa), so most variants meet on the same key.
+
+Whatever is left is handled by edit distance on the keys. Keys are indexed
+by their character trigrams; a query key only scores words that share
+enough trigrams to possibly lie within the allowed distance, so the
+banded edit-distance check runs on a handful of candidates instead of the
+whole vocabulary. Swapping two adjacent letters, the commonest typing slip
+("tempel"), counts as one edit.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from search_index import TEXT_FIELD_WEIGHTS, tokenize
+
+NGRAM = 3
+PAD = "^" * (NGRAM - 1), "$" * (NGRAM - 1)
+
+# Applied in order to a lowercase token to get its phonetic key
+PHONETIC_RULES = [
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo"), "u"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"q"), "k"),
+    (re.compile(r"sh"), "s"),
+    # Aspirated consonants: kh, gh, ch, jh, th, dh, ph, bh
+    (re.compile(r"([kgcjtdpb])h"), r"\1"),
+    (re.compile(r"(.)\1+"), r"\1"),
+    # Schwa deletion: Rama/Ram, Brihadishvara/Brihadishvar
+    (re.compile(r"(?<=...)a$"), ""),
+]
+
+# A word matching the start of the last query word, as while typing
+PREFIX_SIMILARITY = 0.75
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(token: str) -> str:
+    """Fold a lowercase token to the key its spelling variants share"""
+    for pattern, replacement in PHONETIC_RULES:
+        token = pattern.sub(replacement, token)
+    return token
+
+
+def max_distance(length: int) -> int:
+    """Edits allowed for a query key of this length"""
+    if length <= 3:
+        return 0
+    if length <= 8:
+        return 1
+    return 2
+
+
+def ngrams(key: str) -> Set[str]:
+    padded = PAD[0] + key + PAD[1]
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def bounded_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance between a and b, or limit + 1 once it is known to exceed limit.
+
+    Levenshtein distance plus transposition of adjacent characters as a
+    single edit. Only the diagonal band of width 2 * limit + 1 is filled in;
+    cells outside it cannot lead to a distance within limit.
+    """
+    too_far = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return too_far
+    before: Optional[List[int]] = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        lo = max(1, i - limit)
+        hi = min(len(b), i + limit)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i
+        row_min = i if lo == 1 else too_far
+        for j in range(lo, hi + 1):
+            char_b = b[j - 1]
+            cost = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return too_far
+        before, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+class FuzzyIndex:
+    """Phonetic keys with a trigram index, ranked by weighted key similarity"""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        # field -> key -> temple ids
+        self.postings: Dict[str, Dict[str, Set[str]]] = {field: {} for field in TEXT_FIELD_WEIGHTS}
+        # temple id -> field -> keys, for removal
+        self._doc_keys: Dict[str, Dict[str, Set[str]]] = {}
+        # key -> number of (field, temple) postings holding it
+        self._key_refs: Counter = Counter()
+        # trigram -> keys containing it
+        self.grams: Dict[str, Set[str]] = {}
+        # keys in order for prefix lookups, rebuilt lazily after writes
+        self._sorted_keys: List[str] = []
+        self._dirty = True
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self, temples: Iterable[Dict[str, Any]]):
+        """Replace the index contents with the given temples"""
+        self.names = {}
+        self.postings = {field: {} for field in TEXT_FIELD_WEIGHTS}
+        self._doc_keys = {}
+        self._key_refs = Counter()
+        self.grams = {}
+        self._dirty = True
+        for temple in temples:
+            self.upsert(temple)
+        self._keys_in_order()
+
+    def upsert(self, temple: Dict[str, Any]):
+        """Add a temple, replacing any previous version with the same id"""
+        temple_id = temple.get("id")
+        if not temple_id:
+            return
+        if temple_id in self.names:
+            self.remove(temple_id)
+        self.names[temple_id] = temple.get("name", "")
+        doc_keys = self._doc_keys[temple_id] = {}
+        for field in TEXT_FIELD_WEIGHTS:
+            keys = {phonetic_key(token) for token in tokenize(temple.get(field))}
+            doc_keys[field] = keys
+            field_postings = self.postings[field]
+            for key in keys:
+                field_postings.setdefault(key, set()).add(temple_id)
+                if not self._key_refs[key]:
+                    for gram in ngrams(key):
+                        self.grams.setdefault(gram, set()).add(key)
+                    self._dirty = True
+                self._key_refs[key] += 1
+
+    def remove(self, temple_id: str):
+        """Drop a temple from the index if present"""
+        if self.names.pop(temple_id, None) is None:
+            return
+        for field, keys in self._doc_keys.pop(temple_id).items():
+            field_postings = self.postings[field]
+            for key in keys:
+                ids = field_postings[key]
+                ids.discard(temple_id)
+                if not ids:
+                    del field_postings[key]
+                self._key_refs[key] -= 1
+                if self._key_refs[key] <= 0:
+                    del self._key_refs[key]
+                    for gram in ngrams(key):
+                        holders = self.grams[gram]
+                        holders.discard(key)
+                        if not holders:
+                            del self.grams[gram]
+                    self._dirty = True
+
+    def _keys_in_order(self) -> List[str]:
+        if self._dirty:
+            self._sorted_keys = sorted(self._key_refs)
+            self._dirty = False
+        return self._sorted_keys
+
+    def similar_keys(self, token: str, prefix: bool = False) -> Dict[str, float]:
+        """Indexed keys close to token, with a similarity in (0, 1]"""
+        query = phonetic_key(token)
+        similar: Dict[str, float] = {}
+        if query in self._key_refs:
+            similar[query] = 1.0
+        limit = max_distance(len(query))
+        if limit:
+            grams = ngrams(query)
+            # Each edit touches at most NGRAM of the query's trigrams, a transposition NGRAM + 1
+            needed = len(grams) - limit * (NGRAM + 1)
+            shared = Counter(chain.from_iterable(self.grams.get(gram, ()) for gram in grams))
+            for key, count in shared.items():
+                if count < needed or key in similar or abs(len(key) - len(query)) > limit:
+                    continue
+                distance = bounded_distance(query, key, limit)
+                if distance <= limit:
+                    similar[key] = 1.0 - distance / max(len(query), len(key))
+        if prefix and query:
+            keys = self._keys_in_order()
+            i = bisect_left(keys, query)
+            while i < len(keys) and keys[i].startswith(query):
+                similar[keys[i]] = max(similar.get(keys[i], 0.0), PREFIX_SIMILARITY)
+                i += 1
+        return similar
+
+    def match(self, q: str) -> Dict[str, float]:
+        """Scores of the temples where every query word approximately matches a text field.
+
+        The last word may also match as a prefix, since it can still be
+        being typed.
+        """
+        tokens = tokenize(q)
+        scores: Dict[str, float] = {}
+        for i, token in enumerate(tokens):
+            hits = []
+            for key, similarity in self.similar_keys(token, prefix=i == len(tokens) - 1).items():
+                for field, weight in TEXT_FIELD_WEIGHTS.items():
+                    ids = self.postings[field].get(key)
+                    if ids:
+                        hits.append((weight * similarity, ids))
+            # Best hits first, so each temple keeps the first score it gets
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+            token_scores: Dict[str, float] = {}
+            for score, ids in hits:
+                token_scores.update(dict.fromkeys(ids - token_scores.keys(), score))
+            if i == 0:
+                scores = token_scores
+            else:
+                scores = {
+                    temple_id: scores[temple_id] + score
+                    for temple_id, score in token_scores.items()
+                    if temple_id in scores
+                }
+            if not scores:
+                return {}
+        return scores
+
+    def rank(self, scores: Dict[str, float], allowed: Optional[Set[str]] = None, limit: Optional[int] = 100) -> List[str]:
+        """Temple ids from match() best first, restricted to allowed if given"""
+        if allowed is not None:
+            scores = {temple_id: score for temple_id, score in scores.items() if temple_id in allowed}
+
+        def rank_key(temple_id):
+            return (-scores[temple_id], self.names[temple_id])
+
+        if limit is None:
+            return sorted(scores, key=rank_key)
+        return heapq.nsmallest(limit, scores, key=rank_key)
+
+    def search_ids(self, q: str, allowed: Optional[Set[str]] = None, limit: Optional[int] = 100) -> List[str]:
+        """Ranked temple ids approximately matching q"""
+        return self.rank(self.match(q), allowed, limit)
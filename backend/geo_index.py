@@ -0,0 +1,169 @@
+"""In-memory spatial index over temple coordinates.
+
+Temples are bucketed into a fixed grid of lat/lng cells. A nearest-k query
+visits rings of cells around the query point and stops as soon as no
+unvisited cell can hold anything closer than the current k-th result, so
+only a handful of cells are examined regardless of catalog size.
+"""
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# 0.25 degrees is roughly 28 km north-south, a few dozen temples per cell at 100k
+DEFAULT_CELL_DEGREES = 0.25
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """Grid index answering nearest-k and within-radius queries"""
+
+    def __init__(self, cell_degrees: float = DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.points: Dict[str, Tuple[float, float]] = {}
+        self.cells: Dict[Tuple[int, int], Dict[str, Tuple[float, float]]] = {}
+        self._max_abs_lat = 0.0
+        # Bounding box of occupied cells, only ever grown
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def build(self, temples: Iterable[Dict]):
+        """Replace the index contents with the given temples"""
+        self.points = {}
+        self.cells = {}
+        self._max_abs_lat = 0.0
+        self._bounds = None
+        for temple in temples:
+            self.upsert(temple)
+
+    def upsert(self, temple: Dict):
+        """Add or move a temple; temples without usable coordinates are skipped"""
+        temple_id = temple.get("id")
+        coordinates = temple.get("coordinates") or {}
+        lat = coordinates.get("lat")
+        lng = coordinates.get("lng")
+        if not temple_id:
+            return
+        self.remove(temple_id)
+        if lat is None or lng is None:
+            return
+        point = (float(lat), float(lng))
+        self.points[temple_id] = point
+        row, col = self._cell(*point)
+        self.cells.setdefault((row, col), {})[temple_id] = point
+        self._max_abs_lat = max(self._max_abs_lat, abs(point[0]))
+        if self._bounds is None:
+            self._bounds = (row, row, col, col)
+        else:
+            min_row, max_row, min_col, max_col = self._bounds
+            self._bounds = (min(min_row, row), max(max_row, row), min(min_col, col), max(max_col, col))
+
+    def remove(self, temple_id: str):
+        """Drop a temple from the index if present"""
+        point = self.points.pop(temple_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(temple_id, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def _ring(self, center: Tuple[int, int], radius: int) -> Iterable[Tuple[int, int]]:
+        """Cells on the square ring at Chebyshev distance radius from center, clipped to the occupied bounds"""
+        row, col = center
+        min_row, max_row, min_col, max_col = self._bounds
+        if radius == 0:
+            if min_row <= row <= max_row and min_col <= col <= max_col:
+                yield center
+            return
+        top, bottom = row - radius, row + radius
+        for edge_row in (top, bottom):
+            if min_row <= edge_row <= max_row:
+                for edge_col in range(max(col - radius, min_col), min(col + radius, max_col) + 1):
+                    yield (edge_row, edge_col)
+        for edge_col in (col - radius, col + radius):
+            if min_col <= edge_col <= max_col:
+                for edge_row in range(max(top + 1, min_row), min(bottom - 1, max_row) + 1):
+                    yield (edge_row, edge_col)
+
+    def _ring_min_km(self, lat: float, lng: float, radius: int) -> float:
+        """Lower bound on the distance from a query point to any cell beyond `radius` rings"""
+        reach = radius * self.cell_degrees
+        # Going the other way round the antimeridian can be shorter than the grid suggests
+        _, _, min_col, max_col = self._bounds
+        widest_lng = max(lng - min_col * self.cell_degrees, (max_col + 1) * self.cell_degrees - lng)
+        reach = max(0.0, min(reach, 360.0 - widest_lng, 180.0))
+        # Longitude degrees shrink away from the equator, so bound with the widest latitude in play;
+        # points that far apart in longitude are closest along a great circle, not a parallel
+        widest_lat = min(90.0, max(abs(lat), self._max_abs_lat))
+        a = math.cos(math.radians(widest_lat)) * math.sin(math.radians(reach) / 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, a))
+
+    def nearest(self, lat: float, lng: float, k: int = 10, radius_km: Optional[float] = None) -> List[Tuple[str, float]]:
+        """The k closest temples as (temple_id, distance_km), nearest first"""
+        if k <= 0 or not self.points:
+            return []
+        center = self._cell(lat, lng)
+        # Max-heap of the best k so far, stored as (-distance, temple_id)
+        best: List[Tuple[float, str]] = []
+        max_ring = self._max_ring(center, lat, lng, radius_km)
+        # Rings closer in than the occupied bounds are empty, e.g. for a query far from every temple
+        radius = self._first_ring(center)
+        while radius <= max_ring:
+            for cell in self._ring(center, radius):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for temple_id, (t_lat, t_lng) in bucket.items():
+                    distance = haversine_km(lat, lng, t_lat, t_lng)
+                    if radius_km is not None and distance > radius_km:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, temple_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, temple_id))
+            if len(best) == k and self._ring_min_km(lat, lng, radius) >= -best[0][0]:
+                break
+            radius += 1
+        return sorted(((temple_id, -neg) for neg, temple_id in best), key=lambda hit: hit[1])
+
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Tuple[str, float]]:
+        """All temples within radius_km as (temple_id, distance_km), nearest first"""
+        return self.nearest(lat, lng, k=len(self.points), radius_km=radius_km)
+
+    def _first_ring(self, center: Tuple[int, int]) -> int:
+        """The innermost ring that overlaps the occupied bounds"""
+        row, col = center
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(min_row - row, row - max_row, min_col - col, col - max_col, 0)
+
+    def _max_ring(self, center: Tuple[int, int], lat: float, lng: float, radius_km: Optional[float]) -> int:
+        """How many rings can possibly contain a result"""
+        row, col = center
+        min_row, max_row, min_col, max_col = self._bounds
+        max_ring = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+        if radius_km is None:
+            return max_ring
+        # Ring r + 1 only holds points at least _ring_min_km(r) away
+        radius = 0
+        while radius < max_ring and self._ring_min_km(lat, lng, radius) <= radius_km:
+            radius += 1
+        return radius
@@ -0,0 +1,200 @@
+"""Streaming bulk import of temple catalogs from NDJSON or CSV dumps.
+
+Rows are validated against the Temple model and upserted by `id` in
+unordered bulk writes of `batch_size`, so memory stays bounded by one batch
+no matter how large the dump is.
+
+    python ingest.py temples.ndjson
+    python ingest.py temples.csv --batch-size 5000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+DEFAULT_BATCH_SIZE = 1000
+# Per-row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+LIST_FIELDS = ("festivals", "nearby_attractions")
+
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    raise ValueError(f"Cannot tell the format of {filename!r}; use .ndjson/.jsonl or .csv")
+
+
+def _csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a flat CSV row into a Temple-shaped dict.
+
+    List fields may be JSON arrays or `|`-separated; coordinates may be a JSON
+    object in `coordinates` or separate `lat` / `lng` columns.
+    """
+    doc: Dict[str, Any] = {key: value for key, value in row.items() if key is not None}
+    for field in LIST_FIELDS:
+        value = (doc.get(field) or "").strip()
+        if value.startswith("["):
+            doc[field] = json.loads(value)
+        else:
+            doc[field] = [item.strip() for item in value.split("|") if item.strip()]
+    coordinates = (doc.get("coordinates") or "").strip()
+    if coordinates:
+        doc["coordinates"] = json.loads(coordinates)
+    elif doc.get("lat") and doc.get("lng"):
+        doc["coordinates"] = {"lat": float(doc.pop("lat")), "lng": float(doc.pop("lng"))}
+    return doc
+
+
+def iter_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield `(row_number, row)`; a row that cannot be decoded is yielded as the exception"""
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            try:
+                yield number, _csv_row(row)
+            except (ValueError, TypeError) as e:
+                yield number, e
+    elif fmt == "ndjson":
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, e
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+class ImportReport:
+    """Counters and per-row errors for one import run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.valid = 0
+        self.upserted = 0
+        self.modified = 0
+        self.matched = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def add_error(self, row: Optional[int], message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "valid": self.valid,
+            "upserted": self.upserted,
+            "modified": self.modified,
+            "unchanged": self.matched - self.modified,
+            "error_count": self.error_count,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows / self.seconds) if self.seconds else None,
+        }
+
+
+async def import_temples(
+    collection,
+    stream: IO[str],
+    fmt: str,
+    model,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+) -> ImportReport:
+    """Validate rows against `model` and upsert them into `collection` by id.
+
+    `on_batch` is awaited with the documents of each successfully written
+    batch, e.g. to update in-memory indexes. Rows are read and validated in a
+    worker thread, one batch at a time.
+    """
+    report = ImportReport()
+    rows = iter_rows(stream, fmt)
+
+    def read_batch() -> List[Tuple[int, Dict[str, Any]]]:
+        """Read and validate rows until batch_size are valid or the stream ends"""
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        for row_number, row in rows:
+            report.rows += 1
+            if isinstance(row, Exception):
+                report.add_error(row_number, f"Unreadable row: {row}")
+                continue
+            try:
+                doc = model.model_validate(row).model_dump()
+            except ValidationError as e:
+                report.add_error(row_number, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+                ))
+                continue
+            report.valid += 1
+            batch.append((row_number, doc))
+            if len(batch) >= batch_size:
+                break
+        return batch
+
+    async def flush(batch: List[Tuple[int, Dict[str, Any]]]):
+        requests = [ReplaceOne({"id": doc["id"]}, doc, upsert=True) for _, doc in batch]
+        failed = set()
+        try:
+            result = await collection.bulk_write(requests, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for error in details.get("writeErrors", []):
+                row_number = batch[error["index"]][0]
+                failed.add(error["index"])
+                report.add_error(row_number, error.get("errmsg", "write error"))
+        report.upserted += details.get("nUpserted", 0)
+        report.matched += details.get("nMatched", 0)
+        report.modified += details.get("nModified", 0)
+        written = [doc for i, (_, doc) in enumerate(batch) if i not in failed]
+        if on_batch is not None and written:
+            await on_batch(written)
+
+    while True:
+        # Reading and validating is blocking and CPU-bound; keep it off the event loop
+        batch = await asyncio.to_thread(read_batch)
+        if not batch:
+            break
+        await flush(batch)
+
+    report.seconds = time.perf_counter() - report.started
+    return report
+
+
+async def _main(path: str, fmt: Optional[str], batch_size: int):
+    from server import Temple, catalog_version, ensure_indexes, temples_collection
+
+    await ensure_indexes()
+    with open(path, encoding="utf-8", newline="") as stream:
+        report = await import_temples(temples_collection, stream, fmt or detect_format(path), Temple, batch_size)
+    if report.upserted or report.modified:
+        # Once for the whole import: running servers see a new version, refresh their snapshot and change ETags
+        await catalog_version.bump()
+    print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import temples from an NDJSON or CSV dump")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.path, args.format, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Bounded-latency calls to the trip-planning LLM.
+
+Every request gets a deadline covering the wait for a concurrency slot
+and the call itself; when it passes, the call is abandoned and the caller
+falls back to the offline planner. A hedge delay, taken from a percentile
+of recent call latencies, starts a second attempt when the first is
+unusually slow and a slot is free, and whichever reply arrives first wins.
+
+A circuit breaker counts consecutive failed requests, timeouts included.
+Once it opens, requests fail immediately with CircuitOpen for
+`reset_seconds`; then a single probe request is let through, and its
+outcome closes or reopens the circuit.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from metrics import LLM_DEADLINES, LLM_HEDGES, LLM_REJECTED, llm_call
+
+DEFAULT_DEADLINE_SECONDS = 30.0
+# Calls measured before the hedge delay is trusted
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_SECONDS = 30.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_seconds: float = DEFAULT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.opens = 0
+        self._probing = False
+
+    @property
+    def rejecting(self) -> bool:
+        """True while requests would be turned away, without claiming the probe"""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at < self.reset_seconds
+        return self.state == HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        """Whether a request may go out now; in half-open state only the probe may"""
+        if self.state == CLOSED:
+            return True
+        if self.rejecting:
+            return False
+        self.state = HALF_OPEN
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opens += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self):
+        """Forget a request that ended without an outcome, e.g. a cancelled probe"""
+        if self.state == HALF_OPEN:
+            self._probing = False
+
+
+class LatencyWindow:
+    """Durations of the most recent successful calls"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class ResilientLlm:
+    """Deadline, hedging and circuit breaking around one-shot and streaming LLM calls.
+
+    `send(text)` makes one call and returns the reply; `stream(text)` yields
+    reply chunks. Each attempt gets a fresh chat from them, since a chat
+    session keeps its message history.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[str]],
+        stream: Callable[[str], AsyncIterator[str]],
+        semaphore: asyncio.Semaphore,
+        deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+        hedge_percentile: float = 0.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self._send = send
+        self._stream = stream
+        self.semaphore = semaphore
+        self.deadline_seconds = deadline_seconds
+        # 0 disables hedging; each hedge is a second paid call
+        self.hedge_percentile = hedge_percentile
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies = LatencyWindow()
+
+    def check(self, kind: str):
+        """Raise CircuitOpen if a request would be rejected, so callers can skip preparing it"""
+        if self.breaker.rejecting:
+            LLM_REJECTED.inc(kind)
+            raise CircuitOpen("LLM circuit breaker is open")
+
+    def _admit(self, kind: str):
+        if not self.breaker.allow():
+            LLM_REJECTED.inc(kind)
+            raise CircuitOpen("LLM circuit breaker is open")
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    async def send(self, text: str, kind: str = "plan") -> str:
+        """The reply to text, within the deadline"""
+        self._admit(kind)
+        try:
+            reply = await asyncio.wait_for(self._hedged(text, kind), self.deadline_seconds)
+        except asyncio.TimeoutError:
+            LLM_DEADLINES.inc(kind)
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return reply
+
+    async def _attempt(self, text: str, kind: str) -> str:
+        async with llm_call(self.semaphore, kind):
+            started = time.perf_counter()
+            reply = str(await self._send(text))
+        self.latencies.add(time.perf_counter() - started)
+        return reply
+
+    async def _hedged(self, text: str, kind: str) -> str:
+        tasks = [asyncio.create_task(self._attempt(text, kind))]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+                # A hedge waiting for a slot would only add load; hedge only with capacity to spare
+                if not tasks[0].done() and not self.semaphore.locked():
+                    LLM_HEDGES.inc(kind)
+                    tasks.append(asyncio.create_task(self._attempt(text, kind)))
+            error: Optional[BaseException] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Read every outcome, so a losing attempt's error is not reported as never retrieved
+                outcomes = [(task, task.exception()) for task in done]
+                for task, task_error in outcomes:
+                    if task_error is None:
+                        return task.result()
+                    error = task_error
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _read_stream(self, text: str, kind: str, chunks: asyncio.Queue):
+        """Put reply chunks on chunks while holding a slot, then None, or the error that ended it"""
+        try:
+            async with llm_call(self.semaphore, kind):
+                async for chunk in self._stream(text):
+                    chunks.put_nowait(chunk)
+        except Exception as error:
+            chunks.put_nowait(error)
+        else:
+            chunks.put_nowait(None)
+
+    async def stream(self, text: str, kind: str = "stream") -> AsyncIterator[str]:
+        """Reply chunks for text; the deadline covers the whole reply.
+
+        The reply is read by a separate task, so the concurrency slot is
+        released when the model finishes rather than when a slow consumer does.
+        """
+        self._admit(kind)
+        deadline = time.monotonic() + self.deadline_seconds
+        chunks: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(self._read_stream(text, kind, chunks))
+        finished = False
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                chunk = await asyncio.wait_for(chunks.get(), remaining)
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+            finished = True
+        except asyncio.TimeoutError:
+            LLM_DEADLINES.inc(kind)
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        finally:
+            reader.cancel()
+            if finished:
+                self.breaker.record_success()
+            else:
+                # Covers the consumer stopping early; failures were recorded above
+                self.breaker.release()
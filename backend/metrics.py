@@ -0,0 +1,401 @@
+"""Prometheus metrics and per-request timings for the API's hot paths.
+
+Route latencies, Mongo operations, LLM calls and trip-plan fallbacks are
+recorded into the module-level metrics below and rendered in the Prometheus
+text format by GET /metrics. The few instrument types needed are
+implemented here instead of pulling in a client library.
+
+While a request is being handled, the same measurements are summed per
+category (mongo, llm, parse, ...). With SERVER_TIMING enabled they are
+returned in a Server-Timing header, which browser devtools and load tests
+can read per response.
+"""
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Seconds; spans a cached lookup through a slow LLM reply
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prompt sizes in estimated tokens, and temples per prompt
+TOKEN_BUCKETS = (100, 200, 300, 400, 600, 800, 1000, 1500, 2000, 3000, 4000, 8000)
+TEMPLE_BUCKETS = (0, 1, 2, 5, 10, 15, 20, 30, 50, 100)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 collect: Optional[Callable[[], Dict[Labels, float]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Values read at scrape time, for state that already lives elsewhere
+        self.collect = collect
+        self._values: Dict[Labels, Any] = {}
+
+    def _samples(self) -> List[str]:
+        values = self.collect() if self.collect is not None else self._values
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        state = self._values.get(labels)
+        if state is None:
+            # Per-bucket (not cumulative) counts, then sum and count
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), collect=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, collect))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+HTTP_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Time to the end of the response body", ("method", "route")
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+MONGO_DURATION = registry.histogram(
+    "mongo_operation_duration_seconds", "Awaited Mongo operations", ("collection", "operation")
+)
+MONGO_DOCUMENTS = registry.counter(
+    "mongo_documents_total", "Documents returned or written by Mongo operations", ("collection", "operation")
+)
+MONGO_ERRORS = registry.counter(
+    "mongo_operation_errors_total", "Mongo operations that raised", ("collection", "operation")
+)
+LLM_WAIT = registry.histogram(
+    "llm_queue_wait_seconds", "Time waiting for a free LLM concurrency slot", ("kind",)
+)
+LLM_DURATION = registry.histogram(
+    "llm_call_duration_seconds", "LLM calls from request to last chunk", ("kind", "outcome")
+)
+LLM_IN_FLIGHT = registry.gauge("llm_calls_in_flight", "LLM calls holding a concurrency slot")
+LLM_HEDGES = registry.counter(
+    "llm_hedged_calls_total", "Second LLM attempts started because the first was slower than the hedge delay", ("kind",)
+)
+LLM_DEADLINES = registry.counter(
+    "llm_deadline_exceeded_total", "LLM requests abandoned at their deadline", ("kind",)
+)
+LLM_REJECTED = registry.counter(
+    "llm_calls_rejected_total", "LLM requests not sent because the circuit breaker was open", ("kind",)
+)
+PARSE_FAILURES = registry.counter(
+    "trip_plan_parse_failures_total", "LLM replies that were not a JSON plan", ("kind",)
+)
+FALLBACKS = registry.counter(
+    "trip_plan_fallbacks_total", "Plans served by the offline planner instead of the LLM", ("reason",)
+)
+PLANNER_DURATION = registry.histogram(
+    "trip_planner_duration_seconds", "Offline itinerary planning"
+)
+PROMPT_TOKENS = registry.histogram(
+    "trip_prompt_tokens", "Estimated tokens per trip-plan prompt, by prompt part", ("kind", "part"), buckets=TOKEN_BUCKETS
+)
+PROMPT_TEMPLES = registry.histogram(
+    "trip_prompt_temples", "Candidate temples that fit the prompt's token budget", ("kind",), buckets=TEMPLE_BUCKETS
+)
+
+# Per-request sums by category: {category: [seconds, count]}
+_timings: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_timings", default=None)
+
+
+def record_timing(category: str, seconds: float):
+    """Add to the current request's Server-Timing totals, if a request is being measured"""
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.get(category)
+    if entry is None:
+        timings[category] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def timed(category: str, histogram: Optional[Histogram] = None, *labels: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record_timing(category, elapsed)
+        if histogram is not None:
+            histogram.observe(elapsed, *labels)
+
+
+@asynccontextmanager
+async def llm_call(semaphore, kind: str):
+    """Hold an LLM concurrency slot from semaphore, measuring the wait and the call"""
+    queued = time.perf_counter()
+    async with semaphore:
+        started = time.perf_counter()
+        LLM_WAIT.observe(started - queued, kind)
+        record_timing("llm-wait", started - queued)
+        LLM_IN_FLIGHT.inc()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            elapsed = time.perf_counter() - started
+            LLM_IN_FLIGHT.dec()
+            LLM_DURATION.observe(elapsed, kind, outcome)
+            record_timing("llm", elapsed)
+
+
+def server_timing_header(timings: Dict[str, List[float]], total: float) -> str:
+    entries = [
+        f'{category};dur={seconds * 1000:.2f};desc="{count} calls"' if count > 1 else f"{category};dur={seconds * 1000:.2f}"
+        for category, (seconds, count) in timings.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording route metrics and, optionally, a Server-Timing header.
+
+    Routes are labelled by their template (/api/temples/{temple_id}), so
+    label cardinality stays bounded. The Server-Timing header carries what was
+    measured before the response started; streamed bodies are only covered
+    by the histogram.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        timings: Dict[str, List[float]] = {}
+        token = _timings.set(timings)
+        status_code = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    header = server_timing_header(timings, time.perf_counter() - started)
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(scope["method"], template, str(status_code))
+            HTTP_DURATION.observe(time.perf_counter() - started, scope["method"], template)
+
+
+# Motor collection methods that return an awaitable
+MONGO_OPERATIONS = frozenset({
+    "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+    "insert_one", "insert_many", "replace_one", "update_one", "update_many", "delete_one", "delete_many",
+    "bulk_write", "count_documents", "estimated_document_count", "distinct",
+    "create_index", "create_indexes", "drop_index", "index_information",
+})
+
+
+def _document_count(operation: str, result: Any) -> int:
+    if result is None:
+        return 0
+    if operation in ("find_one", "find_one_and_update", "find_one_and_replace", "insert_one"):
+        return 1
+    if operation == "insert_many":
+        return len(result.inserted_ids)
+    if operation == "bulk_write":
+        return result.inserted_count + result.upserted_count + result.matched_count + result.deleted_count
+    if operation in ("update_one", "update_many", "replace_one"):
+        return result.matched_count + (1 if result.upserted_id is not None else 0)
+    if operation in ("delete_one", "delete_many"):
+        return result.deleted_count
+    return 0
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, collection: str):
+        self._cursor = cursor
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "hint", "max_time_ms"):
+            def chain(*args, **kwargs):
+                attribute(*args, **kwargs)
+                return self
+            return chain
+        return attribute
+
+    async def to_list(self, length=None):
+        started = time.perf_counter()
+        try:
+            docs = await self._cursor.to_list(length)
+        except Exception:
+            MONGO_ERRORS.inc(self._collection, "find")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            MONGO_DURATION.observe(elapsed, self._collection, "find")
+            record_timing("mongo", elapsed)
+        MONGO_DOCUMENTS.inc(self._collection, "find", amount=len(docs))
+        return docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        started = time.perf_counter()
+        count = 0
+        try:
+            async for doc in self._cursor:
+                count += 1
+                yield doc
+        finally:
+            elapsed = time.perf_counter() - started
+            MONGO_DURATION.observe(elapsed, self._collection, "find")
+            MONGO_DOCUMENTS.inc(self._collection, "find", amount=count)
+            record_timing("mongo", elapsed)
+
+
+class InstrumentedCollection:
+    """Wraps a Motor collection, timing every awaited operation.
+
+    Each call is observed in mongo_operation_duration_seconds and counted in
+    mongo_documents_total by the documents it returned or wrote. Everything
+    else (name, database, aggregate, ...) passes straight through.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> InstrumentedCursor:
+        return InstrumentedCursor(self._collection.find(*args, **kwargs), self.name)
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in MONGO_OPERATIONS:
+            return attribute
+
+        async def observed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await attribute(*args, **kwargs)
+            except Exception:
+                MONGO_ERRORS.inc(self.name, name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                MONGO_DURATION.observe(elapsed, self.name, name)
+                record_timing("mongo", elapsed)
+            MONGO_DOCUMENTS.inc(self.name, name, amount=_document_count(name, result))
+            return result
+
+        return observed
@@ -0,0 +1,105 @@
+"""Incremental parsing of streamed trip-plan JSON.
+
+The model replies with one JSON object whose `daily_itinerary` array is by
+far the longest part. ItineraryStreamParser is fed the reply chunk by chunk
+and hands back each day object as soon as its closing brace arrives, so the
+client can render day 1 while the model is still writing day 7. That only
+happens when the chat client can stream (see streams_replies); otherwise
+the days are parsed out of the whole reply once it arrives.
+"""
+import json
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+ITINERARY_KEY_RE = re.compile(r'"daily_itinerary"\s*:\s*\[')
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` fence if the model added one"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+class ItineraryStreamParser:
+    """Extracts complete `daily_itinerary` entries from a growing JSON document"""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos: Optional[int] = None  # scan position once the array has been found
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start: Optional[int] = None
+        self._done = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Append a chunk and return any itinerary days completed by it"""
+        self.buffer += chunk
+        if self._done:
+            return []
+        if self._pos is None:
+            match = ITINERARY_KEY_RE.search(self.buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        days = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the itinerary array itself
+                    self._done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        day = json.loads(buffer[self._item_start:i + 1])
+                    except json.JSONDecodeError:
+                        day = None
+                    if isinstance(day, dict):
+                        days.append(day)
+                    self._item_start = None
+            i += 1
+        self._pos = i
+        return days
+
+    def result(self) -> Dict[str, Any]:
+        """Parse the complete reply; raises ValueError if it is not a JSON object"""
+        plan = json.loads(strip_code_fences(self.buffer))
+        if not isinstance(plan, dict):
+            raise ValueError("Trip plan reply is not a JSON object")
+        return plan
+
+
+def streams_replies(chat_class) -> bool:
+    """Whether the chat client can stream a reply; without it the reply only arrives whole"""
+    return callable(getattr(chat_class, "stream_message", None))
+
+
+async def iter_reply_chunks(chat, message) -> AsyncIterator[str]:
+    """Yield the model reply as text chunks from the chat client's streaming call"""
+    async for chunk in chat.stream_message(message):
+        yield str(chunk)
@@ -0,0 +1,228 @@
+"""Deterministic offline itinerary planner.
+
+Builds a routed plan from temple coordinates in a few milliseconds, with no
+LLM involved. Temples are picked from the request's interests and preferred
+states, ordered with a nearest-neighbour tour refined by 2-opt, and packed
+into days under a per-day travel budget.
+"""
+import heapq
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from geo_index import haversine_km
+
+# Road distance is longer than the great-circle distance between two points
+ROAD_DETOUR_FACTOR = 1.3
+AVERAGE_ROAD_SPEED_KMH = 50.0
+MAX_DRIVE_KM_PER_DAY = 350.0
+MAX_TEMPLES_PER_DAY = 3
+# Legs longer than this are better covered by train or flight
+LONG_HAUL_KM = 600.0
+TWO_OPT_MAX_PASSES = 8
+# Each 2-opt pass is O(n²) in pure Python; longer routes keep the nearest-neighbour order
+TWO_OPT_MAX_POINTS = 100
+# Longest trip the API accepts; routes stay within TWO_OPT_MAX_POINTS
+MAX_TRIP_DAYS = 30
+COST_PER_DAY = (3000, 5000)
+
+# (temple ids, start) -> road km between start, if given, and the temples, or None if unavailable
+RouteDistances = Callable[[List[str], Optional[Tuple[float, float]]], Optional[List[List[float]]]]
+
+
+def _fold(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def temple_point(temple: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """(lat, lng) of a temple, or None if it has no coordinates"""
+    coordinates = temple.get("coordinates") or {}
+    if coordinates.get("lat") is None or coordinates.get("lng") is None:
+        return None
+    return (float(coordinates["lat"]), float(coordinates["lng"]))
+
+
+def road_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    return haversine_km(a[0], a[1], b[0], b[1]) * ROAD_DETOUR_FACTOR
+
+
+def locate_start(starting_location: str, temples: Iterable[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    """Approximate coordinates for the starting location from catalog cities"""
+    wanted = _fold(starting_location.split(",")[0])
+    if not wanted:
+        return None
+    points = [
+        point for point in (temple_point(temple) for temple in temples
+                            if _fold(temple.get("city")) == wanted)
+        if point is not None
+    ]
+    if not points:
+        return None
+    return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+
+def select_temples(request, temples: List[Dict[str, Any]], start: Optional[Tuple[float, float]]) -> List[Dict[str, Any]]:
+    """Explicit interests first, then the preferred-state temples closest to the start"""
+    limit = max(1, request.days) * MAX_TEMPLES_PER_DAY
+    located = [temple for temple in temples if temple_point(temple) is not None]
+
+    interests = [_fold(name) for name in request.temples_of_interest or [] if _fold(name)]
+    chosen: List[Dict[str, Any]] = []
+    chosen_ids = set()
+    for interest in interests:
+        for temple in located:
+            if temple["id"] in chosen_ids:
+                continue
+            if interest == _fold(temple["id"]) or interest in _fold(temple.get("name")):
+                chosen.append(temple)
+                chosen_ids.add(temple["id"])
+                break
+
+    states = {_fold(state) for state in request.preferred_states or []}
+    pool = [
+        temple for temple in located
+        if temple["id"] not in chosen_ids and (not states or _fold(temple.get("state")) in states)
+    ]
+    needed = max(0, limit - len(chosen))
+    if start is not None:
+        chosen.extend(heapq.nsmallest(needed, pool, key=lambda temple: (road_km(start, temple_point(temple)), temple["id"])))
+    else:
+        chosen.extend(heapq.nsmallest(needed, pool, key=lambda temple: temple["id"]))
+    return chosen[:limit]
+
+
+def _path_length(points: List[Tuple[float, float]]) -> float:
+    return sum(road_km(points[i], points[i + 1]) for i in range(len(points) - 1))
+
+
+def order_route(
+    points: List[Tuple[float, float]],
+    start: Optional[Tuple[float, float]],
+    dist: Optional[List[List[float]]] = None,
+) -> List[int]:
+    """Visiting order for points: nearest-neighbour tour improved with 2-opt.
+
+    The route is an open path that begins at `start` when known, otherwise at
+    the first point. `dist` may hold the precomputed road km between start and
+    the points, in that order. Routes over TWO_OPT_MAX_POINTS skip 2-opt.
+    """
+    if not points:
+        return []
+    # Node 0 is the fixed start of the path
+    nodes = [start] + points if start is not None else list(points)
+    offset = 1 if start is not None else 0
+    n = len(nodes)
+    if dist is None:
+        dist = [[road_km(nodes[i], nodes[j]) for j in range(n)] for i in range(n)]
+
+    remaining = set(range(1, n))
+    path = [0]
+    while remaining:
+        nearest = min(remaining, key=lambda j: (dist[path[-1]][j], j))
+        remaining.remove(nearest)
+        path.append(nearest)
+
+    for _ in range(TWO_OPT_MAX_PASSES if n <= TWO_OPT_MAX_POINTS else 0):
+        improved = False
+        for i in range(1, n - 1):
+            for j in range(i + 1, n):
+                a, b, c = path[i - 1], path[i], path[j]
+                if j + 1 < n:
+                    d = path[j + 1]
+                    delta = dist[a][c] + dist[b][d] - dist[a][b] - dist[c][d]
+                else:
+                    delta = dist[a][c] - dist[a][b]
+                if delta < -1e-9:
+                    path[i:j + 1] = reversed(path[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return [node - offset for node in path[offset:]]
+
+
+def _hours(km: float) -> str:
+    hours = km / AVERAGE_ROAD_SPEED_KMH
+    if hours < 0.5:
+        return f"Under 30 minutes ({round(km)} km)"
+    return f"About {hours:.1f} hours ({round(km)} km)"
+
+
+def plan_itinerary(
+    request,
+    temples: List[Dict[str, Any]],
+    start: Optional[Tuple[float, float]] = None,
+    distances: Optional[RouteDistances] = None,
+) -> Dict[str, Any]:
+    """Plan body in the same shape as an LLM-generated plan.
+
+    `temples` are the candidates to choose from; `start` defaults to the
+    catalog city matching the request's starting location. `distances`
+    supplies precomputed road km for routing, e.g. DistanceMatrix.route_distances.
+    """
+    days = max(1, request.days)
+    if start is None:
+        start = locate_start(request.starting_location, temples)
+    selected = select_temples(request, temples, start)
+    points = [temple_point(temple) for temple in selected]
+    dist = distances([temple["id"] for temple in selected], start) if distances is not None and selected else None
+    route = [selected[i] for i in order_route(points, start, dist)]
+
+    # Pack the route into days: a new day starts when the drive budget or temple count runs out
+    daily_stops: List[List[Tuple[Dict[str, Any], float]]] = []
+    position = start
+    day_km = 0.0
+    for temple in route:
+        leg = road_km(position, temple_point(temple)) if position is not None else 0.0
+        current = daily_stops[-1] if daily_stops else None
+        if current is None or len(current) >= MAX_TEMPLES_PER_DAY or (current and day_km + leg > MAX_DRIVE_KM_PER_DAY):
+            if len(daily_stops) == days:
+                break
+            daily_stops.append([])
+            day_km = 0.0
+        daily_stops[-1].append((temple, leg))
+        day_km += leg
+        position = temple_point(temple)
+
+    itinerary = []
+    longest_leg = 0.0
+    for i in range(days):
+        stops = daily_stops[i] if i < len(daily_stops) else []
+        if stops:
+            travel_km = sum(leg for _, leg in stops)
+            day_longest = max(leg for _, leg in stops)
+            longest_leg = max(longest_leg, day_longest)
+            city = stops[-1][0].get("city") or stops[-1][0].get("location")
+            itinerary.append({
+                "day": i + 1,
+                "location": stops[0][0].get("location") or city,
+                "temples": [temple["name"] for temple, _ in stops],
+                "activities": ["Temple darshan"] + [
+                    f"Visit {attraction}" for attraction in (stops[-1][0].get("nearby_attractions") or [])[:2]
+                ],
+                "travel_time": (
+                    f"Long-distance transfer by train or flight ({round(travel_km)} km)"
+                    if day_longest > LONG_HAUL_KM else _hours(travel_km)
+                ),
+                "accommodation": f"Stay in {city}",
+            })
+        else:
+            # Spare days are spent around the last stop
+            last = itinerary[-1]["accommodation"][len("Stay in "):] if itinerary else request.starting_location
+            itinerary.append({
+                "day": i + 1,
+                "location": last,
+                "temples": [],
+                "activities": ["Local exploration", "Prayer and meditation", "Rest"],
+                "travel_time": "No long-distance travel",
+                "accommodation": f"Stay in {last}",
+            })
+
+    total_temples = sum(len(day["temples"]) for day in itinerary)
+    states = sorted({stop[0].get("state") for stops in daily_stops for stop in stops if stop[0].get("state")})
+    region = ", ".join(states) if states else "India"
+    return {
+        "title": f"{days}-Day Temple Trail through {region} from {request.starting_location}",
+        "duration": days,
+        "daily_itinerary": itinerary,
+        "total_temples": total_temples,
+        "estimated_cost": f"₹{days * COST_PER_DAY[0]}-{days * COST_PER_DAY[1]}",
+        "best_travel_mode": "Train or flight between regions, car locally" if longest_leg > LONG_HAUL_KM else "Car with driver",
+    }
@@ -0,0 +1,113 @@
+"""Ranked, token-budgeted temple context for the trip-planning prompt.
+
+Candidates are ranked by explicit interest first, then by a mix of
+closeness to the starting location and how many other candidates lie
+nearby, so the model sees temples it can actually string into a route.
+Each temple is one compact line, and lines are added in rank order until
+the token budget is spent.
+
+Tokens are estimated at CHARS_PER_TOKEN characters each, which is close
+enough for budgeting English and romanized names without a tokenizer.
+"""
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from planner import temple_point, road_km
+
+DEFAULT_TOKEN_BUDGET = 400
+CHARS_PER_TOKEN = 4
+# Candidates scored for clustering; the rest are cut by distance first
+MAX_RANKED = 120
+CLUSTER_RADIUS_KM = 150.0
+# Distance at which the proximity score has halved
+PROXIMITY_HALF_KM = 200.0
+PROXIMITY_WEIGHT = 0.6
+CLUSTER_WEIGHT = 0.4
+
+HEADER = "Candidate temples, best first (name | city, state | deity | road km from start):"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def encode_temple(temple: Dict[str, Any], start: Optional[Tuple[float, float]]) -> str:
+    point = temple_point(temple)
+    distance = f"{round(road_km(start, point))}" if start is not None and point is not None else "?"
+    return f"{temple.get('name', '')} | {temple.get('city', '')}, {temple.get('state', '')} | {temple.get('deity', '')} | {distance}"
+
+
+def rank_candidates(
+    candidates: Iterable[Dict[str, Any]],
+    start: Optional[Tuple[float, float]],
+    interest_ids: Iterable[str] = (),
+) -> List[Dict[str, Any]]:
+    """Candidates best first: interests in the order given, then by proximity and clustering"""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for temple in candidates:
+        by_id.setdefault(temple["id"], temple)
+    interests = [by_id[temple_id] for temple_id in dict.fromkeys(interest_ids) if temple_id in by_id]
+    chosen: Set[str] = {temple["id"] for temple in interests}
+
+    located = [(temple, temple_point(temple)) for temple in by_id.values() if temple["id"] not in chosen]
+    unlocated = [temple for temple, point in located if point is None]
+    located = [(temple, point) for temple, point in located if point is not None]
+    if start is not None and len(located) > MAX_RANKED:
+        located = heapq.nsmallest(MAX_RANKED, located, key=lambda item: (road_km(start, item[1]), item[0]["id"]))
+    else:
+        located = sorted(located, key=lambda item: item[0]["id"])[:MAX_RANKED]
+
+    # Neighbours within CLUSTER_RADIUS_KM, counting interests as anchors too
+    anchors = [point for point in map(temple_point, interests) if point is not None]
+    neighbours = [sum(1 for anchor in anchors if road_km(point, anchor) <= CLUSTER_RADIUS_KM) for _, point in located]
+    for i in range(len(located)):
+        for j in range(i + 1, len(located)):
+            if road_km(located[i][1], located[j][1]) <= CLUSTER_RADIUS_KM:
+                neighbours[i] += 1
+                neighbours[j] += 1
+    most = max(neighbours, default=0) or 1
+
+    def score(i: int) -> float:
+        cluster = neighbours[i] / most
+        if start is None:
+            return cluster
+        proximity = 1.0 / (1.0 + road_km(start, located[i][1]) / PROXIMITY_HALF_KM)
+        return PROXIMITY_WEIGHT * proximity + CLUSTER_WEIGHT * cluster
+
+    order = sorted(range(len(located)), key=lambda i: (-score(i), located[i][0]["id"]))
+    return interests + [located[i][0] for i in order] + sorted(unlocated, key=lambda temple: temple["id"])
+
+
+class PromptContext:
+    """The encoded temple list and what went into it"""
+
+    def __init__(self, text: str, temples: List[Dict[str, Any]], candidates: int, tokens: int):
+        self.text = text
+        self.temples = temples
+        self.candidates = candidates
+        self.tokens = tokens
+
+
+def build_context(
+    candidates: List[Dict[str, Any]],
+    start: Optional[Tuple[float, float]],
+    interest_ids: Iterable[str] = (),
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+) -> PromptContext:
+    """Encode ranked candidates until token_budget is reached"""
+    ranked = rank_candidates(candidates, start, interest_ids)
+    lines = [HEADER]
+    used = estimate_tokens(HEADER)
+    included = []
+    for temple in ranked:
+        line = encode_temple(temple, start)
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+        included.append(temple)
+    if not included:
+        return PromptContext("No temples found for selected states", [], len(ranked), 0)
+    return PromptContext("\n".join(lines), included, len(ranked), used)
@@ -0,0 +1,310 @@
+"""In-memory inverted index over the temple catalog.
+
+Answers the search box without touching Mongo. Each searchable field is
+tokenized into lowercase words, and every word maps to the set of temple
+ids that contain it. Query words are matched as prefixes against a sorted
+vocabulary, so "meen" finds "Meenakshi" while the user is still typing.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Fields searched by the free-text `q` parameter and how much a hit counts
+TEXT_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "city": 2.0,
+    "location": 1.5,
+}
+
+# Fields that back the `state` / `deity` filters
+FILTER_FIELDS = ("state", "deity")
+
+INDEXED_FIELDS = tuple(TEXT_FIELD_WEIGHTS) + FILTER_FIELDS
+
+# Fields whose values are counted for the search sidebar
+FACET_FIELDS = ("state", "deity", "city")
+
+# An exact word match ranks above a prefix-only match
+EXACT_MATCH_BONUS = 1.0
+
+
+def tokenize(text: Any) -> List[str]:
+    """Split a field value into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class TempleSearchIndex:
+    """Tokenized inverted index with prefix matching and relevance ranking"""
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # field -> token -> temple ids
+        self.postings: Dict[str, Dict[str, Set[str]]] = {field: {} for field in INDEXED_FIELDS}
+        # field -> sorted tokens, rebuilt lazily after writes
+        self._vocab: Dict[str, List[str]] = {}
+        self._dirty: Set[str] = set(INDEXED_FIELDS)
+        # temple ids ordered by name, used when there is no text to rank by
+        self._by_name: Optional[List[str]] = None
+        # field -> temple id -> value, and field -> value -> number of temples
+        self._facet_values: Dict[str, Dict[str, Any]] = {field: {} for field in FACET_FIELDS}
+        self._facet_totals: Dict[str, Counter] = {field: Counter() for field in FACET_FIELDS}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def build(self, temples: Iterable[Dict[str, Any]]):
+        """Replace the index contents with the given temples"""
+        self.docs = {}
+        self.postings = {field: {} for field in INDEXED_FIELDS}
+        self._dirty = set(INDEXED_FIELDS)
+        self._by_name = None
+        self._facet_values = {field: {} for field in FACET_FIELDS}
+        self._facet_totals = {field: Counter() for field in FACET_FIELDS}
+        for temple in temples:
+            self.upsert(temple)
+        # Sort the vocabularies now rather than on the first query
+        for field in INDEXED_FIELDS:
+            self._vocabulary(field)
+        self._name_order()
+
+    def upsert(self, temple: Dict[str, Any]):
+        """Add a temple, replacing any previous version with the same id"""
+        temple_id = temple.get("id")
+        if not temple_id:
+            return
+        if temple_id in self.docs:
+            self.remove(temple_id)
+        doc = {key: value for key, value in temple.items() if key != "_id"}
+        self.docs[temple_id] = doc
+        self._by_name = None
+        for field in FACET_FIELDS:
+            if doc.get(field):
+                self._facet_values[field][temple_id] = doc[field]
+                self._facet_totals[field][doc[field]] += 1
+        for field in INDEXED_FIELDS:
+            field_postings = self.postings[field]
+            for token in set(tokenize(doc.get(field))):
+                if token not in field_postings:
+                    field_postings[token] = set()
+                    self._dirty.add(field)
+                field_postings[token].add(temple_id)
+
+    def remove(self, temple_id: str):
+        """Drop a temple from the index if present"""
+        doc = self.docs.pop(temple_id, None)
+        if doc is None:
+            return
+        self._by_name = None
+        for field in FACET_FIELDS:
+            value = self._facet_values[field].pop(temple_id, None)
+            if value:
+                totals = self._facet_totals[field]
+                totals[value] -= 1
+                if totals[value] <= 0:
+                    del totals[value]
+        for field in INDEXED_FIELDS:
+            field_postings = self.postings[field]
+            for token in set(tokenize(doc.get(field))):
+                ids = field_postings.get(token)
+                if ids is None:
+                    continue
+                ids.discard(temple_id)
+                if not ids:
+                    del field_postings[token]
+                    self._dirty.add(field)
+
+    def _vocabulary(self, field: str) -> List[str]:
+        if field in self._dirty:
+            self._vocab[field] = sorted(self.postings[field])
+            self._dirty.discard(field)
+        return self._vocab[field]
+
+    def _name_order(self) -> List[str]:
+        if self._by_name is None:
+            self._by_name = sorted(self.docs, key=lambda temple_id: self.docs[temple_id].get("name", ""))
+        return self._by_name
+
+    def _expand(self, field: str, prefix: str) -> List[str]:
+        """All indexed tokens of a field that start with prefix"""
+        vocab = self._vocabulary(field)
+        matches = []
+        i = bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            matches.append(vocab[i])
+            i += 1
+        return matches
+
+    def _match_field(self, field: str, prefix: str) -> Dict[str, bool]:
+        """Temple ids whose field has a token starting with prefix.
+
+        The value records whether any of the matches was an exact token hit.
+        """
+        hits: Dict[str, bool] = {}
+        field_postings = self.postings[field]
+        for token in self._expand(field, prefix):
+            exact = token == prefix
+            for temple_id in field_postings[token]:
+                hits[temple_id] = hits.get(temple_id, False) or exact
+        return hits
+
+    def _ids_with_prefix(self, field: str, prefix: str) -> Set[str]:
+        """Union of the posting sets for every token of a field starting with prefix"""
+        field_postings = self.postings[field]
+        tokens = self._expand(field, prefix)
+        if len(tokens) == 1:
+            return field_postings[tokens[0]]
+        return set().union(*(field_postings[token] for token in tokens))
+
+    def _filter(self, field: str, value: str) -> Optional[Set[str]]:
+        """Temple ids whose field matches every token of value, or None if value is empty"""
+        tokens = tokenize(value)
+        if not tokens:
+            return None
+        result: Optional[Set[str]] = None
+        for token in tokens:
+            ids = self._ids_with_prefix(field, token)
+            result = set(ids) if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def _text_ids(self, tokens: List[str]) -> Set[str]:
+        """Temple ids where every token prefixes a word of some text field"""
+        result: Optional[Set[str]] = None
+        for token in tokens:
+            ids: Set[str] = set()
+            for field in TEXT_FIELD_WEIGHTS:
+                if self._expand(field, token):
+                    ids |= self._ids_with_prefix(field, token)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def _tally(self, field: str, ids: Set[str], left_out: Dict[int, Set[str]]) -> Counter:
+        """Value counts of a facet field over ids.
+
+        left_out caches the complement of each id set across fields of one call.
+        """
+        values = self._facet_values[field]
+        if len(ids) * 2 <= len(self.docs):
+            counts = Counter(map(values.get, ids))
+            counts.pop(None, None)
+            return counts
+        # Most of the catalog matches: tally the temples left out and subtract
+        if id(ids) not in left_out:
+            left_out[id(ids)] = self.docs.keys() - ids
+        counts = self._facet_totals[field].copy()
+        counts.subtract(map(values.get, left_out[id(ids)]))
+        counts.pop(None, None)
+        return +counts
+
+    def facets(
+        self, q: str = "", state: str = "", deity: str = "", limit: int = 20, text_ids: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """Per-value temple counts for FACET_FIELDS, plus the total number of matches.
+
+        A filter field is counted as if its own filter were not applied, so the
+        sidebar still shows what picking a different state or deity would give.
+        Counts come from intersecting posting sets and tallying the matching
+        ids' values, never from Mongo; with no query and no other filters a
+        field uses its running totals. text_ids, when given, replaces the
+        exact match of q (the fuzzy search passes its own matches).
+        """
+        filters = {field: self._filter(field, value) for field, value in (("state", state), ("deity", deity))}
+        if text_ids is not None:
+            base = [text_ids]
+        else:
+            tokens = tokenize(q)
+            base = [self._text_ids(tokens)] if tokens else []
+        # Fields constrained by the same sets share one intersection and one complement
+        matched: Dict[tuple, Set[str]] = {}
+        left_out: Dict[int, Set[str]] = {}
+
+        def matching(sets: List[Set[str]]) -> Set[str]:
+            key = tuple(sorted(map(id, sets)))
+            if key not in matched:
+                sets = sorted(sets, key=len)
+                matched[key] = sets[0] if len(sets) == 1 else sets[0].intersection(*sets[1:])
+            return matched[key]
+
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for field in FACET_FIELDS:
+            sets = base + [ids for other, ids in filters.items() if other != field and ids is not None]
+            counts = self._tally(field, matching(sets), left_out) if sets else self._facet_totals[field]
+            result[field] = [
+                {"value": value, "count": count}
+                for value, count in heapq.nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+            ]
+
+        sets = base + [ids for ids in filters.values() if ids is not None]
+        return {"total": len(matching(sets)) if sets else len(self.docs), "facets": result}
+
+    def allowed_ids(self, state: str = "", deity: str = "") -> Optional[Set[str]]:
+        """Temple ids passing the state and deity filters, or None if neither is set"""
+        allowed: Optional[Set[str]] = None
+        for field, value in (("state", state), ("deity", deity)):
+            ids = self._filter(field, value)
+            if ids is None:
+                continue
+            allowed = ids if allowed is None else allowed & ids
+            if not allowed:
+                return set()
+        return allowed
+
+    def search_ids(self, q: str = "", state: str = "", deity: str = "", limit: Optional[int] = 100) -> List[str]:
+        """Ranked temple ids matching the query and filters"""
+        allowed = self.allowed_ids(state, deity)
+        if allowed is not None and not allowed:
+            return []
+
+        scores: Dict[str, float] = {}
+        tokens = tokenize(q)
+        if tokens:
+            for i, token in enumerate(tokens):
+                token_scores: Dict[str, float] = {}
+                for field, weight in TEXT_FIELD_WEIGHTS.items():
+                    for temple_id, exact in self._match_field(field, token).items():
+                        if allowed is not None and temple_id not in allowed:
+                            continue
+                        score = weight + (EXACT_MATCH_BONUS if exact else 0.0)
+                        token_scores[temple_id] = max(token_scores.get(temple_id, 0.0), score)
+                # Every query word has to match somewhere
+                if i == 0:
+                    scores = token_scores
+                else:
+                    scores = {
+                        temple_id: scores[temple_id] + score
+                        for temple_id, score in token_scores.items()
+                        if temple_id in scores
+                    }
+                if not scores:
+                    return []
+        else:
+            # Filters only: walk temples in name order and stop once limit is reached
+            ordered = self._name_order()
+            if allowed is not None:
+                ordered = (temple_id for temple_id in ordered if temple_id in allowed)
+            ranked = []
+            for temple_id in ordered:
+                if limit is not None and len(ranked) == limit:
+                    break
+                ranked.append(temple_id)
+            return ranked
+
+        def rank_key(temple_id):
+            return (-scores[temple_id], self.docs[temple_id].get("name", ""))
+
+        if limit is None:
+            return sorted(scores, key=rank_key)
+        return heapq.nsmallest(limit, scores, key=rank_key)
+
+    def search(self, q: str = "", state: str = "", deity: str = "", limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Ranked temple documents matching the query and filters"""
+        return [self.docs[temple_id] for temple_id in self.search_ids(q, state, deity, limit)]
@@ -1,20 +1,52 @@
-from fastapi import FastAPI, HTTPException, status
+import time
+# Taken before the other imports so the startup report includes them
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import Depends, FastAPI, File, Header, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Tuple
 import os
+import re
+import secrets
 import uuid
 import asyncio
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import io
 import json
-from bson import ObjectId
+import orjson
+from search_index import FACET_FIELDS, TempleSearchIndex
+from fuzzy_index import FuzzyIndex
+from geo_index import GeoIndex
+from distance_matrix import DEFAULT_MAX_DENSE, DistanceMatrix, travel_hours
+from suggest_index import MAX_K as MAX_SUGGESTIONS, SuggestIndex
+from trip_cache import TripPlanCache, trip_plan_cache_key
+from plan_stream import ItineraryStreamParser, iter_reply_chunks, streams_replies, strip_code_fences
+from planner import MAX_TEMPLES_PER_DAY, MAX_TRIP_DAYS, locate_start, plan_itinerary
+from ingest import DEFAULT_BATCH_SIZE, detect_format, import_temples
+from catalog_version import CatalogVersion, etag_matches
+from catalog_snapshot import DEFAULT_MAX_STALENESS, CatalogSnapshot
+from trip_jobs import DONE, QueueFull, TripPlanJobQueue
+from trip_store import PLAN_BODY_GRACE_SECONDS, TripStore
+from llm_client import CLOSED, HALF_OPEN, DEFAULT_DEADLINE_SECONDS, CircuitBreaker, CircuitOpen, ResilientLlm
+from startup import StartupReport
+from prompt_context import DEFAULT_TOKEN_BUDGET, MAX_RANKED, build_context, estimate_tokens
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, FALLBACKS, PARSE_FAILURES, PLANNER_DURATION, PROMPT_TEMPLES, PROMPT_TOKENS,
+    InstrumentedCollection, MetricsMiddleware, registry, timed
+)
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
 
 # Load environment variables
 load_dotenv()
 
+# Timed startup phases behind /readyz; the first one is importing this module
+startup = StartupReport(IMPORT_STARTED)
+startup.record("import", time.perf_counter() - IMPORT_STARTED)
+
 app = FastAPI()
 
 # CORS settings
@@ -24,34 +56,167 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Missing-Ids", "ETag", "Server-Timing"],
 )
 
-# Database connection
+# Route metrics for /metrics; SERVER_TIMING=1 also adds a Server-Timing header to every response
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
+
+# Database connection; the client connects on first use, which warm_up() triggers
 MONGO_URL = os.environ.get("MONGO_URL")
 client = AsyncIOMotorClient(MONGO_URL)
 db = client["temple_db"]
-temples_collection = db["temples"]
-trips_collection = db["trips"]
+temples_collection = InstrumentedCollection(db["temples"])
+trips_collection = InstrumentedCollection(db["trips"])
+# Itinerary bodies shared by trips, keyed by content hash
+plans_collection = InstrumentedCollection(db["trip_plans"])
+meta_collection = InstrumentedCollection(db["meta"])
+# Trip plan job statuses, for polls that reach a different worker or replica than the job
+jobs_collection = InstrumentedCollection(db["trip_jobs"])
+
+# Bumped on every write to temples_collection; drives catalog ETags
+catalog_version = CatalogVersion(meta_collection)
+CATALOG_CACHE_MAX_AGE = int(os.environ.get("CATALOG_CACHE_MAX_AGE", "60"))
+
+# Bearer token for /api/admin routes; they are disabled when it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# In-memory search, fuzzy search, spatial and typeahead indexes, rebuilt from temples_collection at startup.
+# Rebuilds replace these objects, so always look them up through the module
+search_index = TempleSearchIndex()
+fuzzy_index = FuzzyIndex()
+geo_index = GeoIndex()
+suggest_index = SuggestIndex()
+# Road distances between temples, precomputed up to DISTANCE_MATRIX_MAX_DENSE temples
+DISTANCE_MATRIX_MAX_DENSE = int(os.environ.get("DISTANCE_MATRIX_MAX_DENSE", DEFAULT_MAX_DENSE))
+distance_matrix = DistanceMatrix(max_dense=DISTANCE_MATRIX_MAX_DENSE)
+# Temples written while a rebuild runs, replayed onto the new indexes before they are swapped in
+writes_during_rebuild: Optional[List[Tuple[List[Dict[str, Any]], List[str]]]] = None
+# Temples per POST /api/temples/distances request
+MAX_DISTANCE_IDS = 500
+# How long a request waits for the catalog indexes to warm up before search falls
+# back to Mongo and the other index-backed routes answer 503
+CATALOG_WAIT_SECONDS = float(os.environ.get("CATALOG_WAIT_SECONDS", "2"))
 
 # AI Integration
 EMERGENT_LLM_KEY = os.environ.get("EMERGENT_LLM_KEY")
+# Imported by load_llm_client(), off the startup path
+LlmChat = None
+UserMessage = None
+
+# Generated plans are reused for identical requests
+trip_plan_cache = TripPlanCache(
+    ttl_seconds=float(os.environ.get("TRIP_PLAN_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.environ.get("TRIP_PLAN_CACHE_MAX_ENTRIES", "1000"))
+)
 
-# Helper function to convert ObjectId to string
-def serialize_doc(doc):
-    """Convert MongoDB document to JSON serializable format"""
-    if doc is None:
-        return None
-    if isinstance(doc, list):
-        return [serialize_doc(item) for item in doc]
-    if isinstance(doc, dict):
-        for key, value in doc.items():
-            if isinstance(value, ObjectId):
-                doc[key] = str(value)
-            elif isinstance(value, dict):
-                doc[key] = serialize_doc(value)
-            elif isinstance(value, list):
-                doc[key] = serialize_doc(value)
-    return doc
+# Estimated tokens of ranked temple context per trip-plan prompt
+TRIP_PROMPT_TOKEN_BUDGET = int(os.environ.get("TRIP_PROMPT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+# Temples each name in temples_of_interest may resolve to
+INTEREST_MATCHES = 2
+
+# Caps concurrent LLM calls across request handlers and background jobs
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Trip-plan LLM calls give up after LLM_DEADLINE_SECONDS, are hedged past the
+# LLM_HEDGE_PERCENTILE latency (0 disables), and go straight to the offline planner
+# for LLM_BREAKER_RESET_SECONDS after LLM_BREAKER_FAILURES failures in a row
+llm = ResilientLlm(
+    send=lambda text: send_trip_prompt(text),
+    stream=lambda text: stream_trip_prompt(text),
+    semaphore=llm_semaphore,
+    deadline_seconds=float(os.environ.get("LLM_DEADLINE_SECONDS", DEFAULT_DEADLINE_SECONDS)),
+    hedge_percentile=float(os.environ.get("LLM_HEDGE_PERCENTILE", "0")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("LLM_BREAKER_FAILURES", "5")),
+        reset_seconds=float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+    )
+)
+
+# Worker pool for POST /api/trip-plan?job=true
+trip_plan_jobs = TripPlanJobQueue(
+    handler=lambda queued: run_trip_plan_job(queued),
+    concurrency=int(os.environ.get("TRIP_PLAN_WORKERS", "4")),
+    max_queued=int(os.environ.get("TRIP_PLAN_QUEUE_MAX", "1000")),
+    status_collection=jobs_collection
+)
+# Recorded job statuses expire this long after their last update
+TRIP_JOB_TTL_SECONDS = 86400
+# Reads of a trip that finished on another worker and may still be in its write buffer
+TRIP_READ_ATTEMPTS = 4
+
+# Trip plans are written behind the response, in batches, with shared itinerary bodies
+trip_store = TripStore(
+    trips_collection,
+    plans_collection,
+    batch_size=int(os.environ.get("TRIP_WRITE_BATCH_SIZE", "100")),
+    flush_interval=float(os.environ.get("TRIP_WRITE_FLUSH_SECONDS", "0.5"))
+)
+# Stored trips expire this long after they were created, plan bodies a grace period after they were last used
+TRIP_PLAN_TTL_SECONDS = int(float(os.environ.get("TRIP_PLAN_TTL_DAYS", "30")) * 86400)
+# Mongo's error code for an existing index with different options, e.g. a changed TTL
+INDEX_OPTIONS_CONFLICT = 85
+
+# State that already lives in other objects, read when /metrics is scraped
+registry.gauge("catalog_temples", "Temples in the in-memory catalog indexes", collect=lambda: {(): len(search_index)})
+registry.gauge("catalog_version", "Current catalog version", collect=lambda: {(): catalog_version.value})
+registry.gauge(
+    "catalog_snapshot_age_seconds", "Seconds since the catalog snapshot was confirmed up to date",
+    collect=lambda: {(): catalog.age} if catalog.age is not None else {}
+)
+registry.counter(
+    "trip_plan_cache_lookups_total", "Trip plan cache lookups by result", ("result",),
+    collect=lambda: {
+        ("hit",): trip_plan_cache.hits, ("miss",): trip_plan_cache.misses, ("coalesced",): trip_plan_cache.coalesced
+    }
+)
+registry.gauge(
+    "trip_plan_jobs", "Queued and running trip plan jobs", ("state",),
+    collect=lambda: {("queued",): trip_plan_jobs.stats()["queued"], ("running",): trip_plan_jobs.running}
+)
+registry.counter(
+    "trip_plan_jobs_finished_total", "Finished trip plan jobs by status", ("status",),
+    collect=lambda: {("done",): trip_plan_jobs.completed, ("failed",): trip_plan_jobs.failed}
+)
+registry.gauge(
+    "trip_store_buffered", "Trip plans waiting to be written", collect=lambda: {(): len(trip_store.pending)}
+)
+registry.counter(
+    "trip_store_writes_total", "Trip plans by write outcome", ("outcome",),
+    collect=lambda: {
+        ("written",): trip_store.written, ("failed",): trip_store.failed, ("dropped",): trip_store.dropped
+    }
+)
+registry.counter(
+    "trip_store_deduplicated_total", "Written trip plans whose itinerary body was already stored",
+    collect=lambda: {(): trip_store.deduplicated}
+)
+registry.gauge(
+    "llm_circuit_state", "LLM circuit breaker state: 0 closed, 1 half-open, 2 open",
+    collect=lambda: {(): {CLOSED: 0, HALF_OPEN: 1}.get(llm.breaker.state, 2)}
+)
+registry.gauge(
+    "startup_phase_seconds", "Duration of each finished startup phase", ("phase",),
+    collect=lambda: {(name,): seconds for name, seconds in startup.phases.items()}
+)
+registry.gauge(
+    "startup_ready_seconds", "Seconds from process start until the app was ready",
+    collect=lambda: {(): startup.ready_after} if startup.ready_after is not None else {}
+)
+
+def ndjson_line(obj) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+def json_bytes_response(data, headers=None):
+    """Encode trusted DB output straight to bytes.
+
+    Returning a Response skips FastAPI's response_model validation and
+    jsonable_encoder pass. Callers must exclude `_id` (e.g. with a projection),
+    since orjson does not encode ObjectId.
+    """
+    return Response(content=orjson.dumps(data), media_type="application/json", headers=headers)
 
 # Pydantic models
 class Temple(BaseModel):
@@ -72,9 +237,35 @@ class Temple(BaseModel):
     coordinates: Dict[str, float]
     nearby_attractions: List[str]
 
+# Fields the temple list view needs
+SUMMARY_FIELDS = ["id", "name", "city", "state", "deity", "image"]
+
+def temple_projection(fields: str = ""):
+    """Mongo projection for a comma-separated `fields` parameter; `_id` is always excluded"""
+    if not fields:
+        return {"_id": 0}
+    if fields == "summary":
+        names = SUMMARY_FIELDS
+    else:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in Temple.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown temple fields: {', '.join(unknown)}")
+    projection = {"_id": 0, "id": 1}
+    projection.update({name: 1 for name in names})
+    return projection
+
+class TempleBatchRequest(BaseModel):
+    ids: List[str]
+    fields: str = ""
+
+class DistanceMatrixRequest(BaseModel):
+    ids: List[str]
+
 class TripPlanRequest(BaseModel):
     starting_location: str
-    days: int
+    # The offline planner routes days * MAX_TEMPLES_PER_DAY temples inside the request
+    days: int = Field(ge=1, le=MAX_TRIP_DAYS)
     preferred_states: List[str]
     temples_of_interest: Optional[List[str]] = []
 
@@ -199,71 +390,458 @@ SAMPLE_TEMPLES = [
     }
 ]
 
-# Initialize database with sample data
+async def ensure_indexes():
+    """Create the indexes the read paths rely on; safe to run on every startup"""
+    indexes = [
+        (temples_collection, [("id", ASCENDING)], {"unique": True}),
+        (temples_collection, [("state", ASCENDING)], {}),
+        (temples_collection, [("deity", ASCENDING)], {}),
+        (trips_collection, [("id", ASCENDING)], {"unique": True}),
+        (trips_collection, [("created_at", ASCENDING)], {"expireAfterSeconds": TRIP_PLAN_TTL_SECONDS}),
+        (jobs_collection, [("updated_at", ASCENDING)], {"expireAfterSeconds": TRIP_JOB_TTL_SECONDS}),
+        # Plan bodies outlive the trips pointing at them
+        (plans_collection, [("last_used_at", ASCENDING)], {"expireAfterSeconds": TRIP_PLAN_TTL_SECONDS + PLAN_BODY_GRACE_SECONDS}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT or "expireAfterSeconds" not in options:
+                print(f"Could not create index {keys} on {collection.name}: {e}")
+                continue
+            # The TTL changed since the index was created
+            try:
+                await db.command("collMod", collection.name, index={
+                    "keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]
+                })
+            except OperationFailure as e:
+                print(f"Could not update the TTL of index {keys} on {collection.name}: {e}")
+
 @app.on_event("startup")
-async def initialize_database():
-    # Check if temples exist, if not insert sample data
-    existing_temples = await temples_collection.count_documents({})
-    if existing_temples == 0:
+async def start_trip_plan_workers():
+    trip_plan_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_trip_plan_workers():
+    await trip_plan_jobs.stop()
+
+@app.on_event("startup")
+async def start_trip_store():
+    trip_store.start()
+
+@app.on_event("shutdown")
+async def stop_trip_store():
+    # After the job workers, so plans they finished are written too
+    await trip_store.stop()
+
+async def seed_database():
+    """Insert the sample temples into an empty catalog and adopt the stored catalog version"""
+    # find_one stops at the first document, where count_documents scans the collection
+    if await temples_collection.find_one({}, {"_id": 1}) is None:
         await temples_collection.insert_many(SAMPLE_TEMPLES)
+        await catalog_version.bump()
         print("Initialized database with sample temple data")
+    else:
+        await catalog_version.load()
+
+async def load_catalog():
+    """Start the catalog snapshot and wait for its first load, which also builds the in-memory indexes"""
+    # Reads go to Mongo until the snapshot is ready
+    catalog.start()
+    await catalog.wait_ready()
+
+async def warm_up():
+    """Startup work, run after the app is already accepting connections"""
+    async def database():
+        # The first round trip opens the connection pool
+        await startup.run("mongo", lambda: client.admin.command("ping"))
+        await asyncio.gather(
+            startup.run("indexes", ensure_indexes),
+            seed_and_load_catalog()
+        )
+
+    async def seed_and_load_catalog():
+        await startup.run("seed", seed_database)
+        await startup.run("catalog", load_catalog)
+
+    await asyncio.gather(
+        database(),
+        # A missing or broken client library only disables AI plans, so it does not hold up readiness
+        startup.run("llm_client", lambda: asyncio.to_thread(load_llm_client), retry=False)
+    )
+
+@app.on_event("startup")
+async def start_warm_up():
+    startup.start(warm_up)
+
+@app.on_event("shutdown")
+async def stop_warm_up():
+    await startup.stop()
+
+@app.on_event("shutdown")
+async def stop_catalog_snapshot():
+    await catalog.stop()
+
+def build_catalog_indexes(temples, mapped):
+    """New search, fuzzy, geo, typeahead and distance indexes over temples; blocking, run in a worker thread"""
+    indexes = (TempleSearchIndex(), FuzzyIndex(), GeoIndex(), SuggestIndex(), DistanceMatrix(max_dense=DISTANCE_MATRIX_MAX_DENSE))
+    search, fuzzy, geo, suggest, distances = indexes
+    search.build(temples)
+    fuzzy.build(temples)
+    geo.build(temples)
+    suggest.build(temples)
+    if mapped is not None:
+        # Share the matrix in the catalog file instead of computing a copy per worker
+        distances.map(mapped)
+    else:
+        distances.build(temples)
+    return indexes
+
+def apply_index_writes(indexes, temples, removed_ids):
+    search, fuzzy, geo, suggest, distances = indexes
+    for temple in temples:
+        search.upsert(temple)
+        fuzzy.upsert(temple)
+        geo.upsert(temple)
+        distances.upsert(temple)
+    suggest.upsert_many(temples)
+    for temple_id in removed_ids:
+        search.remove(temple_id)
+        fuzzy.remove(temple_id)
+        geo.remove(temple_id)
+        suggest.remove(temple_id)
+        distances.remove(temple_id)
+
+async def rebuild_catalog_indexes(temples):
+    """Rebuild the in-memory catalog indexes from a full catalog load.
+
+    The builds take seconds of CPU for a large catalog, so they run in a worker
+    thread while requests are still served from the current indexes, and the
+    new ones replace them all at once when complete.
+    """
+    global search_index, fuzzy_index, geo_index, suggest_index, distance_matrix, writes_during_rebuild
+    writes_during_rebuild = []
+    try:
+        indexes = await asyncio.to_thread(build_catalog_indexes, temples, catalog.mapped)
+        for written, removed_ids in writes_during_rebuild:
+            apply_index_writes(indexes, written, removed_ids)
+    finally:
+        writes_during_rebuild = None
+    search_index, fuzzy_index, geo_index, suggest_index, distance_matrix = indexes
+    print(f"Catalog indexes built with {len(search_index)} temples")
+
+async def update_catalog_indexes(temples, removed_ids=()):
+    """Apply written and deleted temples to the in-memory catalog indexes"""
+    global distance_matrix
+    if catalog.mapped is not None and distance_matrix.mapped is not catalog.mapped:
+        # Changes from a newly published catalog file, whose matrix already includes them
+        remapped = DistanceMatrix(max_dense=DISTANCE_MATRIX_MAX_DENSE)
+        await asyncio.to_thread(remapped.map, catalog.mapped)
+        distance_matrix = remapped
+    apply_index_writes((search_index, fuzzy_index, geo_index, suggest_index, distance_matrix), temples, removed_ids)
+    if writes_during_rebuild is not None:
+        writes_during_rebuild.append((list(temples), list(removed_ids)))
+
+# Temple reads by id, page and state are served from memory while the snapshot is
+# no more than CATALOG_MAX_STALENESS seconds behind Mongo, and from Mongo otherwise.
+# With CATALOG_FILE_DIR set, the workers of a host share one memory-mapped copy
+catalog = CatalogSnapshot(
+    temples_collection,
+    catalog_version,
+    max_staleness=float(os.environ.get("CATALOG_MAX_STALENESS", DEFAULT_MAX_STALENESS)),
+    on_reload=rebuild_catalog_indexes,
+    on_change=update_catalog_indexes,
+    catalog_file=os.environ.get("CATALOG_FILE_DIR") or None
+)
+
+async def index_temples(temples):
+    """Apply temples written by this process to the snapshot and indexes, and bump the catalog version"""
+    catalog.apply(temples)
+    await update_catalog_indexes(temples)
+    previous = catalog.version
+    version = await catalog_version.bump()
+    # If another replica wrote in between, leave the versions apart so the next refresh reloads
+    if previous is not None and version == previous + 1:
+        catalog.version = version
+
+def catalog_cache_headers():
+    return {
+        "ETag": catalog_version.etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate"
+    }
+
+def catalog_not_modified(request: Request):
+    """A 304 response if the client already holds the current catalog version, else None"""
+    if etag_matches(request.headers.get("if-none-match"), catalog_version.etag):
+        return Response(status_code=304, headers=catalog_cache_headers())
+    return None
+
+async def require_catalog():
+    """Wait up to CATALOG_WAIT_SECONDS for the catalog indexes; 503 while they are still loading"""
+    if not await catalog.wait_ready(CATALOG_WAIT_SECONDS):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Catalog is still loading",
+            headers={"Retry-After": "5"}
+        )
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Reject requests without the ADMIN_TOKEN bearer token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled; set ADMIN_TOKEN to enable it")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"}
+        )
 
 # API Routes
 @app.get("/")
 async def root():
     return {"message": "Temple Search & Trip Planning API"}
 
-@app.get("/api/temples", response_model=List[Temple])
-async def get_all_temples():
-    temples = await temples_collection.find({}).to_list(1000)
-    return serialize_doc(temples)
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once startup has finished, 503 with its progress until then"""
+    return JSONResponse(startup.as_dict(), status_code=200 if startup.ready else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of the API metrics"""
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/api/temples")
+async def get_all_temples(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after: str = "",
+    fields: str = "",
+    ids: str = ""
+):
+    """One page of temples ordered by id.
+
+    Pass the `X-Next-Cursor` response header back as `after` to get the next
+    page; the header is absent on the last page. `fields` is a comma-separated
+    list of Temple fields, or `summary` for the fields list views need.
+    `ids` (comma-separated) fetches exactly those temples in that order
+    instead; unknown ids are listed in the `X-Missing-Ids` header.
+    """
+    not_modified = catalog_not_modified(request)
+    if not_modified:
+        return not_modified
+    headers = catalog_cache_headers()
+    if ids:
+        temples, missing = await find_temples_by_ids(
+            [temple_id.strip() for temple_id in ids.split(",") if temple_id.strip()],
+            temple_projection(fields)
+        )
+        if missing:
+            headers["X-Missing-Ids"] = ",".join(missing)
+        return json_bytes_response(temples, headers=headers)
+    projection = temple_projection(fields)
+    if catalog.fresh:
+        temples = catalog.page(after, limit, projection)
+    else:
+        query = {"id": {"$gt": after}} if after else {}
+        temples = await temples_collection.find(query, projection).sort("id", 1).limit(limit).to_list(limit)
+    if len(temples) == limit:
+        headers["X-Next-Cursor"] = temples[-1]["id"]
+    return json_bytes_response(temples, headers=headers)
+
+async def find_temples_by_ids(temple_ids: List[str], projection):
+    """Temples for the given ids in request order, plus the ids that were not found, in one query"""
+    if catalog.fresh:
+        return catalog.many(temple_ids, projection)
+    unique_ids = list(dict.fromkeys(temple_ids))
+    found = await temples_collection.find({"id": {"$in": unique_ids}}, projection).to_list(None)
+    by_id = {temple["id"]: temple for temple in found}
+    temples = [by_id[temple_id] for temple_id in temple_ids if temple_id in by_id]
+    missing = [temple_id for temple_id in unique_ids if temple_id not in by_id]
+    return temples, missing
+
+@app.post("/api/temples/batch")
+async def get_temples_batch(batch: TempleBatchRequest):
+    """Resolve many temple ids with a single `$in` query, preserving request order"""
+    temples, missing = await find_temples_by_ids(batch.ids, temple_projection(batch.fields))
+    return json_bytes_response({"temples": temples, "missing": missing})
+
+@app.post("/api/temples/distances")
+async def get_temple_distances(batch: DistanceMatrixRequest):
+    """Road distances and driving times between the given temples, from the precomputed matrix"""
+    if len(batch.ids) > MAX_DISTANCE_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DISTANCE_IDS} ids per request")
+    await require_catalog()
+    ids, km, missing = distance_matrix.submatrix(batch.ids)
+    return json_bytes_response({
+        "ids": ids,
+        "distance_km": km.round(1).tolist(),
+        "travel_hours": travel_hours(km).round(2).tolist(),
+        "missing": missing
+    })
+
+@app.post("/api/admin/temples/import", dependencies=[Depends(require_admin)])
+async def import_temple_catalog(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000)
+):
+    """Upsert temples from an uploaded NDJSON or CSV dump and report per-row errors"""
+    try:
+        fmt = format or detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    report = await import_temples(temples_collection, stream, fmt, Temple, batch_size, on_batch=index_temples)
+    return report.as_dict()
+
+@app.get("/api/temples/nearby")
+async def get_nearby_temples(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    k: int = Query(10, ge=1, le=100),
+):
+    not_modified = catalog_not_modified(request)
+    if not_modified:
+        return not_modified
+    # Served from the catalog indexes, which are filled once the snapshot has warmed up
+    await require_catalog()
+    hits = geo_index.nearest(lat, lng, k=k, radius_km=radius_km)
+    return json_bytes_response([
+        {**search_index.docs[temple_id], "distance_km": round(distance, 3)}
+        for temple_id, distance in hits
+        if temple_id in search_index.docs
+    ], headers=catalog_cache_headers())
 
 @app.get("/api/temples/{temple_id}", response_model=Temple)
-async def get_temple(temple_id: str):
-    temple = await temples_collection.find_one({"id": temple_id})
+async def get_temple(temple_id: str, request: Request):
+    not_modified = catalog_not_modified(request)
+    if not_modified:
+        return not_modified
+    if catalog.fresh:
+        temple = catalog.get(temple_id)
+    else:
+        temple = await temples_collection.find_one({"id": temple_id}, {"_id": 0})
     if not temple:
         raise HTTPException(status_code=404, detail="Temple not found")
-    return serialize_doc(temple)
+    return json_bytes_response(temple, headers=catalog_cache_headers())
 
 @app.get("/api/search/temples")
-async def search_temples(q: str = "", state: str = "", deity: str = ""):
-    query = {}
-    if q:
-        query["$or"] = [
-            {"name": {"$regex": q, "$options": "i"}},
-            {"location": {"$regex": q, "$options": "i"}},
-            {"city": {"$regex": q, "$options": "i"}}
-        ]
+async def search_temples(
+    request: Request,
+    q: str = "",
+    state: str = "",
+    deity: str = "",
+    facets: bool = False,
+    facet_limit: int = Query(20, ge=1, le=200),
+    fuzzy: bool = False,
+):
+    """Ranked search results; with facets=true the body is {temples, total, facets}.
+
+    fuzzy=true matches q tolerating typos and transliteration variants
+    (Minakshi finds Meenakshi) instead of requiring exact word prefixes.
+    """
+    not_modified = catalog_not_modified(request)
+    if not_modified:
+        return not_modified
+    # Served from the catalog indexes once the snapshot has warmed up, from Mongo until then
+    if not await catalog.wait_ready(CATALOG_WAIT_SECONDS):
+        return json_bytes_response(await search_temples_in_mongo(q, state, deity, facets, facet_limit))
+    text_ids = None
+    if fuzzy and q.strip():
+        allowed = search_index.allowed_ids(state=state, deity=deity)
+        scores = fuzzy_index.match(q)
+        temples = [search_index.docs[temple_id] for temple_id in fuzzy_index.rank(scores, allowed, limit=100)]
+        text_ids = set(scores)
+    else:
+        temples = search_index.search(q=q, state=state, deity=deity, limit=100)
+    if facets:
+        body = {
+            "temples": temples,
+            **search_index.facets(q=q, state=state, deity=deity, limit=facet_limit, text_ids=text_ids)
+        }
+        return json_bytes_response(body, headers=catalog_cache_headers())
+    return json_bytes_response(temples, headers=catalog_cache_headers())
+
+def regex_filter(value: str):
+    return {"$regex": re.escape(value), "$options": "i"}
+
+async def search_temples_in_mongo(q: str, state: str, deity: str, facets: bool, facet_limit: int):
+    """Unranked substring search straight from Mongo, for while the catalog indexes warm up"""
+    filters = {}
     if state:
-        query["state"] = {"$regex": state, "$options": "i"}
+        filters["state"] = regex_filter(state)
     if deity:
-        query["deity"] = {"$regex": deity, "$options": "i"}
-    
-    temples = await temples_collection.find(query).to_list(100)
-    return serialize_doc(temples)
+        filters["deity"] = regex_filter(deity)
+    text = {"$or": [{field: regex_filter(q)} for field in ("name", "location", "city")]} if q else {}
+    temples = await temples_collection.find({**text, **filters}, {"_id": 0}).to_list(100)
+    if not facets:
+        return temples
 
-@app.post("/api/trip-plan", response_model=TripPlan)
-async def generate_trip_plan(request: TripPlanRequest):
-    try:
-        # Get relevant temples based on preferred states
+    async def tally(field):
+        # Like the index, a field is counted without its own filter
+        query = {**text, **{other: value for other, value in filters.items() if other != field}}
+        pipeline = [
+            {"$match": query},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$match": {"_id": {"$nin": [None, ""]}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": facet_limit},
+        ]
+        return [{"value": row["_id"], "count": row["count"]} for row in await temples_collection.aggregate(pipeline).to_list(None)]
+
+    total, *counts = await asyncio.gather(
+        temples_collection.count_documents({**text, **filters}), *(tally(field) for field in FACET_FIELDS)
+    )
+    return {"temples": temples, "total": total, "facets": dict(zip(FACET_FIELDS, counts))}
+
+def trip_start(request: TripPlanRequest):
+    """Approximate coordinates of the starting city from the catalog, if it has temples there"""
+    city = request.starting_location.split(",")[0].strip()
+    return locate_start(city, search_index.search(q=city, limit=None)) if city else None
+
+def interest_temple_ids(request: TripPlanRequest):
+    """Catalog temples named in temples_of_interest, matched fuzzily when no name matches exactly"""
+    temple_ids = []
+    for name in request.temples_of_interest or []:
+        matches = search_index.search_ids(q=name, limit=INTEREST_MATCHES)
+        temple_ids.extend(matches or fuzzy_index.search_ids(name, limit=INTEREST_MATCHES))
+    return temple_ids
+
+async def trip_prompt_candidates(request: TripPlanRequest, start):
+    """Temples in the preferred states, or near the start when no state is preferred"""
+    if not catalog.fresh:
         query = {}
         if request.preferred_states:
             query["state"] = {"$in": request.preferred_states}
-        
-        temples = await temples_collection.find(query).to_list(50)
-        temples = serialize_doc(temples)
-        
-        # Create AI prompt for trip planning
-        temples_info = []
-        for temple in temples[:10]:  # Limit to 10 temples for prompt
-            temples_info.append(f"- {temple['name']} in {temple['location']} (Deity: {temple['deity']})")
-        
-        temples_text = "\n".join(temples_info) if temples_info else "No temples found for selected states"
-        
-        prompt = f"""Create a detailed {request.days}-day temple pilgrimage itinerary starting from {request.starting_location}.
+        return await temples_collection.find(query, {"_id": 0}).to_list(MAX_RANKED)
+    if request.preferred_states:
+        return catalog.in_states(request.preferred_states)
+    if start is not None:
+        nearby = geo_index.nearest(start[0], start[1], k=MAX_RANKED)
+        return [temple for temple in (catalog.get(temple_id) for temple_id, _ in nearby) if temple is not None]
+    return catalog.page(limit=MAX_RANKED)
 
-Available temples in preferred states:
-{temples_text}
+async def build_trip_prompt(request: TripPlanRequest, kind: str = "plan"):
+    """Prompt for the LLM plus the candidate temples it mentions.
+
+    Candidates are ranked by interest, distance from the start and
+    clustering, and only as many as fit TRIP_PROMPT_TOKEN_BUDGET are listed.
+    """
+    start = trip_start(request)
+    interest_ids = interest_temple_ids(request)
+    candidates = await trip_prompt_candidates(request, start)
+    candidates += [search_index.docs[temple_id] for temple_id in interest_ids if temple_id in search_index.docs]
+    context = build_context(candidates, start, interest_ids, TRIP_PROMPT_TOKEN_BUDGET)
+    
+    prompt = f"""Create a detailed {request.days}-day temple pilgrimage itinerary starting from {request.starting_location}.
+
+{context.text}
 
 Please provide a JSON response with the following structure:
 {{
@@ -285,104 +863,281 @@ Please provide a JSON response with the following structure:
 }}
 
 Focus on creating a practical, spiritual journey with proper time allocation and regional diversity."""
-        
-        # Initialize AI chat
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"trip_plan_{uuid.uuid4()}",
-            system_message="You are an expert travel planner specializing in Indian temple pilgrimages. Provide detailed, practical itineraries in valid JSON format."
-        )
-        
-        # Use default model which is gpt-4o-mini as per playbook
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        # Parse AI response
-        try:
-            response_text = str(response).strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:-3]
-            elif response_text.startswith("```"):
-                response_text = response_text[3:-3]
-            
-            ai_plan = json.loads(response_text)
-        except (json.JSONDecodeError, Exception) as e:
-            print(f"JSON parsing error: {e}")
-            # Fallback if JSON parsing fails
-            ai_plan = {
-                "title": f"{request.days}-Day Sacred Temple Journey",
-                "duration": request.days,
-                "daily_itinerary": [
-                    {
-                        "day": i+1,
-                        "location": f"Day {i+1} - Temple City",
-                        "temples": [f"Temple {i+1}"] if i < len(temples) else ["Local temple"],
-                        "activities": ["Temple darshan", "Local exploration", "Prayer and meditation"],
-                        "travel_time": "2-4 hours",
-                        "accommodation": "Local guest house or hotel"
-                    } for i in range(request.days)
-                ],
-                "total_temples": min(request.days * 2, len(temples)) if temples else request.days,
-                "estimated_cost": f"₹{request.days * 3000}-{request.days * 5000}",
-                "best_travel_mode": "Car/Taxi"
-            }
+    PROMPT_TOKENS.observe(context.tokens, kind, "context")
+    PROMPT_TOKENS.observe(estimate_tokens(prompt), kind, "total")
+    PROMPT_TEMPLES.observe(len(context.temples), kind)
+    return prompt, context.temples
+
+def load_llm_client():
+    """Import the LLM client library on first use; it is slow to import and only trip plans need it"""
+    global LlmChat, UserMessage
+    if LlmChat is None:
+        from emergentintegrations.llm.chat import LlmChat
+    if UserMessage is None:
+        from emergentintegrations.llm.chat import UserMessage
+
+def new_trip_chat():
+    load_llm_client()
+    return LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=f"trip_plan_{uuid.uuid4()}",
+        system_message="You are an expert travel planner specializing in Indian temple pilgrimages. Provide detailed, practical itineraries in valid JSON format."
+    )
+
+async def send_trip_prompt(prompt: str):
+    # Use default model which is gpt-4o-mini as per playbook
+    return await new_trip_chat().send_message(UserMessage(text=prompt))
+
+def stream_trip_prompt(prompt: str):
+    return iter_reply_chunks(new_trip_chat(), UserMessage(text=prompt))
+
+def llm_streams_replies() -> bool:
+    """Whether trip-plan days can be sent while the model is still writing later ones"""
+    try:
+        load_llm_client()
+    except ImportError:
+        return False
+    return streams_replies(LlmChat)
+
+def fallback_reason(error: Exception) -> str:
+    """Why a plan fell back to the offline planner, as a FALLBACKS label"""
+    if isinstance(error, CircuitOpen):
+        return "circuit_open"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    return "error"
+
+def fast_plan(request: TripPlanRequest):
+    """Routed plan from the in-memory catalog, built without the LLM in a few milliseconds"""
+    with timed("planner", PLANNER_DURATION):
+        start = trip_start(request)
+        if request.preferred_states:
+            candidate_ids = set()
+            for state in request.preferred_states:
+                candidate_ids.update(search_index.search_ids(state=state, limit=None))
+        elif start is not None:
+            nearby = geo_index.nearest(start[0], start[1], k=request.days * MAX_TEMPLES_PER_DAY * 4)
+            candidate_ids = {temple_id for temple_id, _ in nearby}
+        else:
+            candidate_ids = set(search_index.search_ids(limit=request.days * MAX_TEMPLES_PER_DAY))
+        for name in request.temples_of_interest or []:
+            candidate_ids.update(search_index.search_ids(q=name, limit=5))
+        candidates = [search_index.docs[temple_id] for temple_id in sorted(candidate_ids)]
+        return plan_itinerary(request, candidates, start=start, distances=distance_matrix.route_distances)
+
+def complete_plan(request: TripPlanRequest, ai_plan, temples):
+    """Fill in any TripPlan fields the LLM left out"""
+    return {
+        "title": ai_plan.get("title", f"{request.days}-Day Temple Journey"),
+        "duration": ai_plan.get("duration", request.days),
+        "daily_itinerary": ai_plan.get("daily_itinerary", []),
+        "total_temples": ai_plan.get("total_temples", len(temples) if temples else 1),
+        "estimated_cost": ai_plan.get("estimated_cost", f"₹{request.days * 3000}-{request.days * 5000}"),
+        "best_travel_mode": ai_plan.get("best_travel_mode", "Car/Taxi")
+    }
+
+async def generate_ai_plan(request: TripPlanRequest):
+    """Ask the LLM for a plan body.
+
+    Returns `(plan, parsed)`, where `parsed` is False when the reply could not
+    be parsed and the offline plan was substituted; only parsed plans are cached.
+    """
+    # Skip building the prompt while the provider is known to be failing
+    llm.check("plan")
+    prompt, temples = await build_trip_prompt(request)
+    response = await llm.send(prompt, "plan")
+    
+    # Parse AI response
+    parsed = True
+    try:
+        with timed("parse"):
+            ai_plan = json.loads(strip_code_fences(str(response)))
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"JSON parsing error: {e}")
+        PARSE_FAILURES.inc("plan")
+        FALLBACKS.inc("parse_failure")
+        parsed = False
+        # Fallback if JSON parsing fails
+        ai_plan = fast_plan(request)
+    
+    return complete_plan(request, ai_plan, temples), parsed
+
+def fallback_trip_plan(request: TripPlanRequest, trip_id: Optional[str] = None):
+    """Offline plan returned when generation fails outright"""
+    return TripPlan(id=trip_id or str(uuid.uuid4()), **fast_plan(request))
+
+async def create_trip_plan(request: TripPlanRequest, mode: str = "ai", trip_id: Optional[str] = None):
+    """Generate and save a plan; falls back to the offline planner on any error"""
+    trip_id = trip_id or str(uuid.uuid4())
+    # The offline planner, also the fallback, reads the catalog indexes
+    await require_catalog()
+    try:
+        if mode == "fast":
+            # Routed offline plan, no LLM round trip
+            plan = fast_plan(request)
+        else:
+            # Identical requests share one cached plan; each caller still gets its own trip id
+            plan = await trip_plan_cache.get_or_compute(
+                trip_plan_cache_key(request),
+                lambda: generate_ai_plan(request)
+            )
         
         # Create trip plan object
-        trip_plan = TripPlan(
-            id=str(uuid.uuid4()),
-            title=ai_plan.get("title", f"{request.days}-Day Temple Journey"),
-            duration=ai_plan.get("duration", request.days),
-            daily_itinerary=ai_plan.get("daily_itinerary", []),
-            total_temples=ai_plan.get("total_temples", len(temples) if temples else 1),
-            estimated_cost=ai_plan.get("estimated_cost", f"₹{request.days * 3000}-{request.days * 5000}"),
-            best_travel_mode=ai_plan.get("best_travel_mode", "Car/Taxi")
-        )
+        trip_plan = TripPlan(id=trip_id, **plan)
         
-        # Save trip plan to database  
-        trip_dict = trip_plan.model_dump()
-        await trips_collection.insert_one(trip_dict)
+        # Save trip plan to database, behind the response
+        trip_store.add(trip_plan.model_dump())
         
         return trip_plan
         
     except Exception as e:
-        print(f"Error generating trip plan: {str(e)}")
-        print(f"Error type: {type(e)}")
+        reason = fallback_reason(e)
+        if reason != "circuit_open":
+            print(f"Error generating trip plan: {str(e)}")
+            print(f"Error type: {type(e)}")
+        FALLBACKS.inc(reason)
         
         # Return a fallback response instead of failing
-        fallback_plan = TripPlan(
-            id=str(uuid.uuid4()),
-            title=f"{request.days}-Day Temple Pilgrimage from {request.starting_location}",
-            duration=request.days,
-            daily_itinerary=[
-                {
-                    "day": i+1,
-                    "location": f"Day {i+1} destination",
-                    "temples": ["Selected sacred temple"],
-                    "activities": ["Temple darshan", "Cultural exploration", "Local cuisine"],
-                    "travel_time": "2-4 hours",
-                    "accommodation": "Comfortable local accommodation"
-                } for i in range(request.days)
-            ],
-            total_temples=request.days * 2,
-            estimated_cost=f"₹{request.days * 3000}-{request.days * 5000}",
-            best_travel_mode="Car with driver"
-        )
+        fallback_plan = fallback_trip_plan(request, trip_id)
         
         # Save fallback plan
-        try:
-            await trips_collection.insert_one(fallback_plan.model_dump())
-        except:
-            pass
-            
+        trip_store.add(fallback_plan.model_dump())
         return fallback_plan
 
+@app.get("/api/suggest")
+async def suggest(request: Request, prefix: str = "", k: int = Query(10, ge=1, le=MAX_SUGGESTIONS)):
+    """Ranked completions of prefix over temple names, cities, states and deities"""
+    not_modified = catalog_not_modified(request)
+    if not_modified:
+        return not_modified
+    # Served from the catalog indexes, which are filled once the snapshot has warmed up
+    await require_catalog()
+    return json_bytes_response(suggest_index.suggest(prefix, k), headers=catalog_cache_headers())
+
+@app.post("/api/trip-plan", response_model=TripPlan)
+async def generate_trip_plan(
+    request: TripPlanRequest,
+    mode: str = Query("ai", pattern="^(ai|fast)$"),
+    job: bool = False,
+    priority: int = Query(5, ge=0, le=9)
+):
+    """Generate a plan, or with `job=true` queue it and return its id right away.
+
+    Queued plans are generated by a bounded worker pool; poll
+    GET /api/trip-plans/{id} until its status is "done". Lower `priority`
+    values are served first.
+    """
+    if job:
+        try:
+            queued = trip_plan_jobs.submit((request, mode), priority=priority)
+        except QueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        await trip_plan_jobs.record(queued)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=queued.as_dict())
+    return await create_trip_plan(request, mode)
+
+async def run_trip_plan_job(queued):
+    request, mode = queued.request
+    await create_trip_plan(request, mode, trip_id=queued.id)
+
+@app.post("/api/trip-plan/stream")
+async def stream_trip_plan(request: TripPlanRequest):
+    """Stream a plan as NDJSON.
+
+    Emits `{"type": "day", "day": {...}}` for each itinerary day, then a final
+    `{"type": "plan", "plan": {...}}` with the complete saved TripPlan, which is
+    authoritative. Days arrive as soon as the model has finished writing them
+    only if the LLM client can stream; the X-Plan-Delivery header says
+    "incremental" then and "buffered" when the days follow the whole reply.
+    """
+    # Checked before the response starts, so a cold catalog is still a 503
+    await require_catalog()
+    incremental = llm_streams_replies()
+
+    async def events():
+        cache_key = trip_plan_cache_key(request)
+        plan = trip_plan_cache.get(cache_key)
+        if plan is not None:
+            for day in plan["daily_itinerary"]:
+                yield ndjson_line({"type": "day", "day": day})
+        else:
+            try:
+                llm.check("stream")
+                prompt, temples = await build_trip_prompt(request, kind="stream")
+                parser = ItineraryStreamParser()
+                if incremental:
+                    async for chunk in llm.stream(prompt, "stream"):
+                        for day in parser.feed(chunk):
+                            yield ndjson_line({"type": "day", "day": day})
+                else:
+                    # The one-shot call, which unlike a stream can be hedged
+                    for day in parser.feed(await llm.send(prompt, "stream")):
+                        yield ndjson_line({"type": "day", "day": day})
+                try:
+                    with timed("parse"):
+                        result = parser.result()
+                    plan = complete_plan(request, result, temples)
+                    trip_plan_cache.put(cache_key, plan)
+                except ValueError as e:
+                    print(f"JSON parsing error: {e}")
+                    PARSE_FAILURES.inc("stream")
+                    FALLBACKS.inc("parse_failure")
+                    plan = complete_plan(request, fast_plan(request), temples)
+            except Exception as e:
+                reason = fallback_reason(e)
+                if reason != "circuit_open":
+                    print(f"Error streaming trip plan: {str(e)}")
+                FALLBACKS.inc(reason)
+                plan = None
+        
+        trip_plan = TripPlan(id=str(uuid.uuid4()), **plan) if plan else fallback_trip_plan(request)
+        trip_dict = trip_plan.model_dump()
+        trip_store.add(trip_dict)
+        yield ndjson_line({"type": "plan", "plan": trip_dict})
+    
+    return StreamingResponse(
+        events(), media_type="application/x-ndjson",
+        headers={"X-Plan-Delivery": "incremental" if incremental else "buffered"}
+    )
+
+@app.get("/api/trip-plan/cache")
+async def get_trip_plan_cache_stats():
+    return trip_plan_cache.stats()
+
+@app.get("/api/trip-plan/jobs")
+async def get_trip_plan_job_stats():
+    return trip_plan_jobs.stats()
+
 @app.get("/api/trip-plans/{trip_id}", response_model=TripPlan)
 async def get_trip_plan(trip_id: str):
-    trip = await trips_collection.find_one({"id": trip_id})
+    queued = trip_plan_jobs.get(trip_id)
+    if queued is not None and queued.status != DONE:
+        return json_bytes_response(queued.as_dict())
+    trip = await trip_store.get(trip_id)
+    if not trip and queued is None:
+        # A job submitted to another worker or replica, which records its status in Mongo
+        recorded = await trip_plan_jobs.recorded(trip_id)
+        if recorded is not None and recorded["status"] != DONE:
+            return json_bytes_response(recorded)
+        # Done there, but the plan may still be in that worker's write buffer
+        for _ in range(TRIP_READ_ATTEMPTS if recorded is not None else 0):
+            await asyncio.sleep(trip_store.flush_interval)
+            trip = await trip_store.get(trip_id)
+            if trip:
+                break
     if not trip:
         raise HTTPException(status_code=404, detail="Trip plan not found")
-    return serialize_doc(trip)
+    trip["status"] = DONE
+    return json_bytes_response(trip)
 
 if __name__ == "__main__":
+    import tempfile
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        # Workers share one memory-mapped catalog snapshot, built by whichever of them holds its lock;
+        # each still builds its own search, fuzzy, geo and typeahead indexes from it
+        os.environ.setdefault("CATALOG_FILE_DIR", os.path.join(tempfile.gettempdir(), "temple_catalog"))
+        uvicorn.run("server:app", host="0.0.0.0", port=8001, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""Startup phases and readiness.
+
+The app accepts connections as soon as it is imported. Everything slow,
+such as the first Mongo round trip, index creation, the catalog load and
+the LLM client import, runs afterwards as named phases in the background,
+concurrently where they do not depend on each other. Each phase is timed,
+and the durations are printed once the app is ready, returned by /readyz
+and exported on /metrics.
+
+Liveness only means the process is serving requests. Readiness means every
+phase has finished, so load balancers should route on /readyz.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+RETRY_SECONDS = 2.0
+
+
+class StartupReport:
+    """Durations of the startup phases and whether the app is ready"""
+
+    def __init__(self, started: float):
+        # time.perf_counter() when the process began importing the app
+        self.started = started
+        self.phases: Dict[str, float] = {}
+        self.running: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.ready_after: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        """Time the enclosed block as phase name; only a block that completes is recorded"""
+        started = time.perf_counter()
+        self.running[name] = started
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = str(e)
+            raise
+        else:
+            self.record(name, time.perf_counter() - started)
+            self.errors.pop(name, None)
+        finally:
+            self.running.pop(name, None)
+
+    async def run(self, name: str, step: Callable[[], Awaitable[Any]], retry: bool = True):
+        """Run step as phase name, retrying every RETRY_SECONDS until it succeeds unless retry is False"""
+        while True:
+            try:
+                async with self.phase(name):
+                    return await step()
+            except Exception as e:
+                if not retry:
+                    print(f"Startup phase {name} failed: {str(e)}")
+                    return None
+                print(f"Startup phase {name} failed, retrying in {RETRY_SECONDS:g}s: {str(e)}")
+                await asyncio.sleep(RETRY_SECONDS)
+
+    def mark_ready(self):
+        self.ready_after = time.perf_counter() - self.started
+        self._ready.set()
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        print(f"Ready {self.ready_after:.2f}s after start ({phases})")
+
+    def start(self, warm_up: Callable[[], Awaitable[None]]):
+        """Run warm_up in the background and mark the app ready when it returns; call from a running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._warm_up(warm_up))
+
+    async def _warm_up(self, warm_up: Callable[[], Awaitable[None]]):
+        await warm_up()
+        self.mark_ready()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._ready.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        return {
+            "ready": self.ready,
+            "seconds_to_ready": round(self.ready_after, 4) if self.ready_after is not None else None,
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "running": {name: round(now - started, 4) for name, started in self.running.items()},
+            "errors": dict(self.errors),
+        }
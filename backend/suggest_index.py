@@ -0,0 +1,361 @@
+"""Typeahead over temple names, cities, states and deities.
+
+Every label is stored under each of its word suffixes ("kashi vishwanath
+temple", "vishwanath temple", "temple") in one sorted list, so a prefix
+lookup is a binary search. Prefixes that cover more than
+PRECOMPUTE_THRESHOLD keys get their best completions precomputed, and any
+other prefix has a small range that is ranked on the fly. Either way a
+query touches a bounded number of keys.
+
+Writes update the sorted keys in place and move the changed entries within
+the precomputed lists, which hold TOP_DEPTH completions so that a few
+demotions do not empty them. A list that drops below MAX_K is recomputed
+from its children's lists rather than from its keys.
+"""
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+# Separates the searchable text from the entry reference inside a key
+SEP = "\x00"
+# Sorts after any folded text, so keys starting with p lie in [p, p + END)
+END = "￿"
+
+CATEGORY_FIELDS = ("city", "state", "deity")
+MAX_K = 20
+PRECOMPUTE_THRESHOLD = 256
+# Completions kept per precomputed prefix; the slack over MAX_K absorbs demotions between refills
+TOP_DEPTH = 2 * MAX_K
+# Above this many key changes per write, one pass over the key list beats inserting keys one by one
+SPLICE_MIN_CHANGES = 100
+
+EntryKey = Tuple[str, str]  # (type, ref): ref is the temple id, or the folded label for categories
+Ranked = Tuple[Tuple, EntryKey]  # (rank, entry); rank ties are broken by the entry
+Snapshot = Optional[Tuple[int, str, str]]  # (count, text, label) of an entry, None if absent
+
+
+def fold(text: Any) -> str:
+    return NON_ALNUM_RE.sub(" ", str(text or "").lower()).strip()
+
+
+def word_suffixes(text: str) -> List[str]:
+    words = text.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    """Sorted prefix index returning top-k ranked completions"""
+
+    def __init__(self):
+        # entry -> {"id", "label", "type", "count", "text"}
+        self.entries: Dict[EntryKey, Dict[str, Any]] = {}
+        self.keys: List[str] = []
+        # prefix -> best (rank, entry) pairs for that prefix, best first. Entries not
+        # in a list rank after its last item, but may rank before items a write removed
+        self._top: Dict[str, List[Ranked]] = {}
+        # temple id -> entries it contributes to, and the labels they came from
+        self._temple_entries: Dict[str, List[EntryKey]] = {}
+        self._labels: Dict[str, Tuple] = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Keys and ranking
+
+    def _entry_keys(self, entry_key: EntryKey, text: Optional[str] = None) -> List[str]:
+        entry_type, ref = entry_key
+        if text is None:
+            text = self.entries[entry_key]["text"]
+        return [
+            f"{suffix}{SEP}{'1' if i == 0 else '0'}{SEP}{entry_type}{SEP}{ref}"
+            for i, suffix in enumerate(word_suffixes(text))
+        ]
+
+    @staticmethod
+    def _parse(key: str) -> Tuple[bool, EntryKey]:
+        _, full, entry_type, ref = key.split(SEP, 3)
+        return full == "1", (entry_type, ref)
+
+    def _rank(self, entry_key: EntryKey, full: bool) -> Tuple:
+        """Sort key, smaller is better: whole-label matches, then more temples, then shorter labels"""
+        entry = self.entries[entry_key]
+        return (not full, -entry["count"], len(entry["label"]), entry["label"])
+
+    @staticmethod
+    def _snapshot_rank(snapshot: Snapshot, prefix: str) -> Tuple:
+        """_prefix_rank of an entry as it was when snapshot was taken"""
+        count, text, label = snapshot
+        return (not text.startswith(prefix), -count, len(label), label)
+
+    def _rank_range(self, lo: int, hi: int) -> List[Ranked]:
+        best: Dict[EntryKey, Tuple] = {}
+        for key in self.keys[lo:hi]:
+            full, entry_key = self._parse(key)
+            rank = self._rank(entry_key, full)
+            if entry_key not in best or rank < best[entry_key]:
+                best[entry_key] = rank
+        return heapq.nsmallest(TOP_DEPTH, ((rank, entry_key) for entry_key, rank in best.items()))
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + END, lo)
+        return lo, hi
+
+    # Building
+
+    def build(self, temples: Iterable[Dict[str, Any]]):
+        """Replace the index contents and precompute completions for broad prefixes"""
+        self.entries = {}
+        self._temple_entries = {}
+        self._labels = {}
+        self._top = {}
+        for temple in temples:
+            self._add_temple(temple)
+        self.keys = sorted(key for entry_key in self.entries for key in self._entry_keys(entry_key))
+        self._precompute("", 0, len(self.keys))
+
+    def _precompute(self, prefix: str, lo: int, hi: int) -> Tuple[List[Ranked], Optional[Ranked]]:
+        """Top completions for keys[lo:hi], stored for every prefix whose range exceeds the threshold.
+
+        Works bottom-up: a broad prefix merges the short lists of its children
+        instead of rescanning their keys, reusing stored lists that are full.
+        Also returns a bound that every completion left out ranks after, or
+        None if none were left out.
+        """
+        if hi - lo <= PRECOMPUTE_THRESHOLD:
+            top = self._rank_range(lo, hi)
+            return top, (top[-1] if len(top) == TOP_DEPTH else None)
+        depth = len(prefix)
+        best: Dict[EntryKey, Tuple] = {}
+        bound: Optional[Ranked] = None
+
+        def consider(entry_key: EntryKey, rank: Tuple):
+            if entry_key not in best or rank < best[entry_key]:
+                best[entry_key] = rank
+
+        i = lo
+        while i < hi:
+            key = self.keys[i]
+            if key[depth] == SEP:
+                # The key's text is exactly the prefix
+                full, entry_key = self._parse(key)
+                consider(entry_key, self._rank(entry_key, full))
+                i += 1
+                continue
+            child = prefix + key[depth]
+            j = bisect_left(self.keys, child + END, i, hi)
+            stored = self._top.get(child)
+            if stored is not None and len(stored) == TOP_DEPTH:
+                child_top, child_bound = stored, stored[-1]
+            else:
+                child_top, child_bound = self._precompute(child, i, j)
+            for _, entry_key in child_top:
+                consider(entry_key, self._prefix_rank(entry_key, prefix))
+            if child_bound is not None and (bound is None or child_bound < bound):
+                bound = child_bound
+            i = j
+        ranked = sorted((rank, entry_key) for entry_key, rank in best.items())
+        if bound is not None:
+            # Past the bound, a child may hold completions its list left out
+            ranked = [item for item in ranked if item <= bound]
+        top = ranked[:TOP_DEPTH]
+        self._top[prefix] = top
+        if bound is None and len(ranked) <= TOP_DEPTH:
+            return top, None
+        return top, (top[-1] if top else bound)
+
+    @staticmethod
+    def _contributions(temple: Dict[str, Any]) -> List[EntryKey]:
+        """Entries a temple counts towards"""
+        contributed = [("temple", temple["id"])] if temple.get("name") else []
+        for field in CATEGORY_FIELDS:
+            if fold(temple.get(field)):
+                contributed.append((field, fold(temple[field])))
+        return contributed
+
+    def _add_temple(self, temple: Dict[str, Any]):
+        """Register a temple's entries"""
+        temple_id = temple["id"]
+        if temple_id in self._temple_entries:
+            # Duplicate id within one build: the later document wins
+            self._remove(temple_id)
+        contributed = self._contributions(temple)
+        for entry_key in contributed:
+            entry_type, ref = entry_key
+            entry = self.entries.get(entry_key)
+            if entry_type == "temple":
+                self.entries[entry_key] = {
+                    "id": temple_id, "label": temple["name"], "type": "temple", "count": 1, "text": fold(temple["name"])
+                }
+            elif entry is None:
+                label = temple[entry_type]
+                self.entries[entry_key] = {"id": label, "label": label, "type": entry_type, "count": 1, "text": ref}
+            else:
+                entry["count"] += 1
+        self._temple_entries[temple_id] = contributed
+        self._labels[temple_id] = self._temple_labels(temple)
+
+    @staticmethod
+    def _temple_labels(temple: Dict[str, Any]) -> Tuple:
+        return (temple.get("name"),) + tuple(temple.get(field) for field in CATEGORY_FIELDS)
+
+    # Incremental updates
+
+    def upsert_many(self, temples: Iterable[Dict[str, Any]]):
+        """Apply added or changed temples without a full rebuild"""
+        before: Dict[EntryKey, Snapshot] = {}
+        for temple in temples:
+            temple_id = temple.get("id")
+            if not temple_id:
+                continue
+            if self._labels.get(temple_id) == self._temple_labels(temple):
+                continue
+            for entry_key in self._temple_entries.get(temple_id, []) + self._contributions(temple):
+                if entry_key not in before:
+                    before[entry_key] = self._snapshot(entry_key)
+            self._remove(temple_id)
+            self._add_temple(temple)
+        self._apply(before)
+
+    def remove(self, temple_id: str):
+        """Drop a temple's contributions"""
+        before = {entry_key: self._snapshot(entry_key) for entry_key in self._temple_entries.get(temple_id, [])}
+        self._remove(temple_id)
+        self._apply(before)
+
+    def _remove(self, temple_id: str):
+        """Forget a temple's contributions to the entries; keys and lists are left to _apply"""
+        contributed = self._temple_entries.pop(temple_id, None)
+        self._labels.pop(temple_id, None)
+        for entry_key in contributed or []:
+            entry = self.entries[entry_key]
+            entry["count"] -= 1
+            if entry["count"] <= 0:
+                del self.entries[entry_key]
+
+    def _snapshot(self, entry_key: EntryKey) -> Snapshot:
+        entry = self.entries.get(entry_key)
+        return (entry["count"], entry["text"], entry["label"]) if entry is not None else None
+
+    def _apply(self, before: Dict[EntryKey, Snapshot]):
+        """Bring keys and precomputed lists up to date with entries that were `before` a write"""
+        stale_keys: List[str] = []
+        new_keys: List[str] = []
+        changed: List[Tuple[EntryKey, Snapshot, Snapshot, Set[str], Set[str]]] = []
+        for entry_key, was in before.items():
+            now = self._snapshot(entry_key)
+            if now == was:
+                # E.g. a renamed temple that left its state as it was
+                continue
+            old_keys = self._entry_keys(entry_key, was[1]) if was is not None else []
+            current_keys = self._entry_keys(entry_key, now[1]) if now is not None else []
+            if old_keys != current_keys:
+                stale_keys.extend(old_keys)
+                new_keys.extend(current_keys)
+            changed.append((entry_key, was, now, self._stored_prefixes(old_keys), self._stored_prefixes(current_keys)))
+        self._update_keys(stale_keys, new_keys)
+
+        short = set()
+        for entry_key, was, now, old_prefixes, current_prefixes in changed:
+            for prefix in old_prefixes | current_prefixes:
+                top = self._top[prefix]
+                self._place(
+                    top, entry_key,
+                    self._snapshot_rank(was, prefix) if prefix in old_prefixes else None,
+                    self._snapshot_rank(now, prefix) if prefix in current_prefixes else None
+                )
+                if len(top) < MAX_K:
+                    short.add(prefix)
+        for prefix in short:
+            self._refill(prefix)
+
+    def _update_keys(self, stale_keys: List[str], new_keys: List[str]):
+        stale = set(stale_keys)
+        new = set(new_keys)
+        stale, new = stale - new, new - stale
+        if len(stale) + len(new) < SPLICE_MIN_CHANGES:
+            for key in stale:
+                i = bisect_left(self.keys, key)
+                if i < len(self.keys) and self.keys[i] == key:
+                    del self.keys[i]
+            for key in new:
+                insort(self.keys, key)
+            return
+        # Copy the unchanged runs between changes once instead of shifting the list per key
+        merged: List[str] = []
+        position = 0
+        for key, adding in sorted([(key, False) for key in stale] + [(key, True) for key in new]):
+            i = bisect_left(self.keys, key, position)
+            merged += self.keys[position:i]
+            if adding:
+                merged.append(key)
+                position = i
+            else:
+                position = i + 1 if i < len(self.keys) and self.keys[i] == key else i
+        merged += self.keys[position:]
+        self.keys = merged
+
+    def _stored_prefixes(self, keys: List[str]) -> Set[str]:
+        """Prefixes of keys that have a precomputed list"""
+        prefixes = set()
+        for key in keys:
+            text = key.split(SEP, 1)[0]
+            for end in range(len(text) + 1):
+                # Every prefix of a stored prefix is stored too
+                if text[:end] not in self._top:
+                    break
+                prefixes.add(text[:end])
+        return prefixes
+
+    def _place(self, top: List[Ranked], entry_key: EntryKey, old_rank: Optional[Tuple], rank: Optional[Tuple]):
+        """Move a changed entry within a precomputed list; a None rank means it did not or no longer matches"""
+        limit = top[-1] if top else None
+        if old_rank is not None:
+            # Stored ranks are kept current, so the entry, if listed, sits exactly at its old rank
+            i = bisect_left(top, (old_rank, entry_key))
+            if i < len(top) and top[i][1] == entry_key:
+                del top[i]
+        # Entries outside the list rank after its last item; one that falls past it may be overtaken by them
+        if rank is not None and (limit is None or (rank, entry_key) <= limit):
+            insort(top, (rank, entry_key))
+            del top[TOP_DEPTH:]
+
+    def _refill(self, prefix: str):
+        """Recompute the list of a prefix that lost too many entries"""
+        lo, hi = self._range(prefix)
+        if hi - lo <= PRECOMPUTE_THRESHOLD:
+            # Narrow now, but kept stored so that the prefixes of stored prefixes stay stored
+            self._top[prefix] = self._rank_range(lo, hi)
+            return
+        self._precompute(prefix, lo, hi)
+
+    def _prefix_rank(self, entry_key: EntryKey, prefix: str) -> Tuple:
+        """Rank of an entry among the completions of prefix"""
+        return self._rank(entry_key, self.entries[entry_key]["text"].startswith(prefix))
+
+    # Queries
+
+    def suggest(self, prefix: str, k: int = 10) -> List[Dict[str, str]]:
+        """Top-k completions for prefix as {id, label, type}"""
+        text = fold(prefix)
+        if not text:
+            return []
+        top = self._top.get(text)
+        if top is None:
+            lo, hi = self._range(text)
+            if lo == hi:
+                return []
+            if hi - lo > PRECOMPUTE_THRESHOLD:
+                # Grown past the threshold since the last build. Stored from now on, along with
+                # the prefixes before it, starting at the shortest one that is not stored yet
+                end = next(end for end in range(len(text) + 1) if text[:end] not in self._top)
+                self._precompute(text[:end], *self._range(text[:end]))
+                top = self._top[text]
+            else:
+                top = self._rank_range(lo, hi)
+        return [
+            {"id": self.entries[entry_key]["id"], "label": self.entries[entry_key]["label"], "type": self.entries[entry_key]["type"]}
+            for _, entry_key in top[:k]
+        ]
@@ -0,0 +1,126 @@
+"""TTL + LRU cache for generated trip plans with single-flight request coalescing.
+
+Many users ask for the same plan ("3 days from Chennai, Tamil Nadu"). The
+cache is keyed on a normalized request, and while one LLM call for a key is
+in flight every other caller for that key awaits the same future instead of
+starting its own call.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+def _fold(value: Optional[str]) -> str:
+    """Case-fold and collapse whitespace so trivially different inputs share a key"""
+    return " ".join((value or "").split()).casefold()
+
+
+def _fold_all(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({_fold(value) for value in values or [] if _fold(value)}))
+
+
+def trip_plan_cache_key(request) -> Tuple:
+    """Normalized cache key for a TripPlanRequest"""
+    return (
+        _fold(request.starting_location),
+        request.days,
+        _fold_all(request.preferred_states),
+        _fold_all(request.temples_of_interest),
+    )
+
+
+class TripPlanCache:
+    """Async LRU cache with per-entry TTL and single-flight computation"""
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Cached value for key, or None if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Any:
+        """Return the cached value for key, computing it at most once concurrently.
+
+        `compute` returns `(value, cacheable)`; values produced by a degraded
+        path (e.g. an unparseable LLM reply) are shared with concurrent
+        waiters but not stored.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        while in_flight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    # This waiter was cancelled, not the computation
+                    raise
+            # The caller computing the value was cancelled; the first waiter to wake takes over
+            in_flight = self._in_flight.get(key)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value, cacheable = await compute()
+        except asyncio.CancelledError:
+            # Wakes the waiters, which start over instead of failing with a cancellation they did not cause
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieve the exception so asyncio doesn't warn about it
+            future.exception()
+            raise
+        else:
+            if cacheable:
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "in_flight": len(self._in_flight),
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,188 @@
+"""Background trip-plan jobs with a bounded worker pool.
+
+POST /api/trip-plan?job=true enqueues the request and returns right away.
+A fixed number of workers pull jobs from a priority queue, so at most
+`concurrency` plans are generated at once no matter how many are
+submitted, and the queue depth and wait times show how to size the pool.
+
+Jobs run in the process that accepted them. With a `status_collection`,
+each job's status is also recorded in Mongo, so a status poll that lands on
+another worker or replica still finds it.
+"""
+import asyncio
+import itertools
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Finished jobs are remembered for status lookups up to this many
+MAX_FINISHED_JOBS = 10000
+# Wait times kept for the percentile metrics
+WAIT_SAMPLES = 1000
+# How long stop() lets queued and running jobs finish before giving up on them
+DRAIN_SECONDS = 10.0
+
+
+class QueueFull(Exception):
+    pass
+
+
+class TripPlanJob:
+    def __init__(self, job_id: str, request, priority: int):
+        self.id = job_id
+        self.request = request
+        self.priority = priority
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {"id": self.id, "status": self.status}
+        if self.error:
+            info["error"] = self.error
+        return info
+
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TripPlanJobQueue:
+    """Priority queue of trip-plan jobs drained by `concurrency` workers.
+
+    Lower `priority` values run first; equal priorities run in submission order.
+    """
+
+    def __init__(self, handler: Callable[[TripPlanJob], Awaitable[None]], concurrency: int = 4, max_queued: int = 1000,
+                 status_collection=None):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.status_collection = status_collection
+        self.jobs: Dict[str, TripPlanJob] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._wait_times = deque(maxlen=WAIT_SAMPLES)
+        self._finished = deque()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the workers; call from a running event loop"""
+        if self._workers:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self, timeout: float = DRAIN_SECONDS):
+        """Let queued and running jobs finish for up to timeout seconds, then fail the rest.
+
+        Unfinished jobs are recorded as failed, so polls stop reporting them
+        as pending or running.
+        """
+        if self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        unfinished = [job for job in self.jobs.values() if job.status in (PENDING, RUNNING)]
+        for job in unfinished:
+            job.status = FAILED
+            job.error = "The server shut down before the plan was generated"
+            self.failed += 1
+        await asyncio.gather(*(self.record(job) for job in unfinished))
+
+    def submit(self, request, priority: int = 5) -> TripPlanJob:
+        if self._queue is None:
+            raise RuntimeError("Trip plan job queue has not been started")
+        if self._queue.qsize() >= self.max_queued:
+            raise QueueFull(f"{self._queue.qsize()} trip plan jobs already queued")
+        job = TripPlanJob(str(uuid.uuid4()), request, priority)
+        self.jobs[job.id] = job
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[TripPlanJob]:
+        return self.jobs.get(job_id)
+
+    async def record(self, job: TripPlanJob):
+        """Store the job's status in status_collection, if any; a failed write is only logged"""
+        if self.status_collection is None:
+            return
+        info = job.as_dict()
+        del info["id"]
+        info["updated_at"] = datetime.now(timezone.utc)
+        # A worker may pick the job up before its pending status is written; that write never overwrites a later one
+        update = {"$setOnInsert": info} if job.status == PENDING else {"$set": info}
+        try:
+            await self.status_collection.update_one({"_id": job.id}, update, upsert=True)
+        except Exception as e:
+            print(f"Error recording trip plan job {job.id}: {str(e)}")
+
+    async def recorded(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job as recorded by whichever process runs it, like TripPlanJob.as_dict()"""
+        if self.status_collection is None:
+            return None
+        info = await self.status_collection.find_one({"_id": job_id}, {"_id": 0, "updated_at": 0})
+        return {"id": job_id, **info} if info else None
+
+    async def _work(self):
+        while True:
+            _, _, job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.monotonic()
+            self._wait_times.append(job.started_at - job.enqueued_at)
+            self.running += 1
+            try:
+                await self.record(job)
+                await self.handler(job)
+                job.status = DONE
+                self.completed += 1
+            except Exception as e:
+                print(f"Trip plan job {job.id} failed: {str(e)}")
+                job.status = FAILED
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+                job.finished_at = time.monotonic()
+                self._queue.task_done()
+                self._finished.append(job.id)
+                while len(self._finished) > MAX_FINISHED_JOBS:
+                    self.jobs.pop(self._finished.popleft(), None)
+                if job.status != RUNNING:
+                    await self.record(job)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = list(self._wait_times)
+        return {
+            "concurrency": self.concurrency,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds": {
+                "p50": _percentile(waits, 0.50),
+                "p95": _percentile(waits, 0.95),
+                "max": max(waits) if waits else None,
+            },
+        }
@@ -0,0 +1,186 @@
+"""Write-behind, content-deduplicated storage for generated trip plans.
+
+Handlers hand finished plans to TripStore.add() and return without waiting
+for Mongo. A background task writes them in batches of `batch_size`, or
+every `flush_interval` seconds, whichever comes first, and whatever is
+still buffered is written on shutdown. Until a plan is written it is
+served from memory, so GET /api/trip-plans/{id} works right away.
+
+Many trips carry the same itinerary (cached plans, offline fallbacks). The
+itinerary body is stored once in the plans collection under the SHA-256 of
+its canonical JSON, and each trip document only holds its id, that hash
+and a creation time. Trips expire through a TTL index on created_at; plan
+bodies through one on last_used_at, which every new trip using the body
+refreshes. Bodies are kept PLAN_BODY_GRACE_SECONDS longer than trips, so the
+last trip using a body expires well before the body does; a trip whose body
+is gone anyway is treated as expired.
+"""
+import asyncio
+import hashlib
+import json
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+PLAN_FIELDS = ("title", "duration", "daily_itinerary", "total_temples", "estimated_cost", "best_travel_mode")
+DUPLICATE_KEY = 11000
+# A batch that fails is retried on later flushes this many times in total
+WRITE_ATTEMPTS = 3
+# How much longer plan bodies are kept than the trips pointing at them; Mongo
+# removes expired documents about once a minute, in no particular order
+PLAN_BODY_GRACE_SECONDS = 86400
+
+
+def plan_body(trip: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: trip[field] for field in PLAN_FIELDS if field in trip}
+
+
+def plan_hash(body: Dict[str, Any]) -> str:
+    canonical = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def only_duplicates(error: BulkWriteError) -> bool:
+    return all(write_error.get("code") == DUPLICATE_KEY for write_error in error.details.get("writeErrors", []))
+
+
+class TripStore:
+    """Buffers trip plans and writes them to Mongo in deduplicated batches"""
+
+    def __init__(self, trips_collection, plans_collection, batch_size: int = 100, flush_interval: float = 0.5,
+                 max_buffered: int = 10000):
+        self.trips_collection = trips_collection
+        self.plans_collection = plans_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        # trip id -> trip, from add() until its batch is written
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._attempts: Dict[str, int] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flush_lock = asyncio.Lock()
+        self.written = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def add(self, trip: Dict[str, Any]):
+        """Queue a trip plan for writing; never waits on Mongo"""
+        if len(self._buffer) >= self.max_buffered:
+            # Mongo has been failing for a while: give up on the oldest plan
+            oldest = self._buffer.popleft()
+            self.pending.pop(oldest["id"], None)
+            self.dropped += 1
+        trip = dict(trip)
+        self.pending[trip["id"]] = trip
+        self._buffer.append(trip)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def get(self, trip_id: str) -> Optional[Dict[str, Any]]:
+        """A trip plan by id, whether still buffered or already stored"""
+        trip = self.pending.get(trip_id)
+        if trip is not None:
+            return dict(trip)
+        trip = await self.trips_collection.find_one({"id": trip_id}, {"_id": 0, "created_at": 0})
+        if trip is None or "plan_hash" not in trip:
+            # Trips stored before deduplication hold their whole body
+            return trip
+        body = await self.plans_collection.find_one({"_id": trip.pop("plan_hash")}, {"_id": 0, "last_used_at": 0})
+        if body is None:
+            # Expired between the two reads, or out of order with its trip
+            return None
+        return {**body, **trip}
+
+    def start(self):
+        """Start the background flusher; call from a running event loop"""
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        if self._task is not None:
+            # Not cancelled, so a batch being written is not lost halfway
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush(retry=False)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self, retry: bool = True):
+        """Write all buffered trips in batches of batch_size"""
+        async with self._flush_lock:
+            failed: List[Dict[str, Any]] = []
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not await self._write(batch):
+                    failed.extend(batch)
+            for trip in failed:
+                attempts = self._attempts.get(trip["id"], 0) + 1
+                if retry and attempts < WRITE_ATTEMPTS:
+                    self._attempts[trip["id"]] = attempts
+                    self._buffer.append(trip)
+                else:
+                    self._attempts.pop(trip["id"], None)
+                    self.pending.pop(trip["id"], None)
+                    self.failed += 1
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        now = datetime.now(timezone.utc)
+        bodies: Dict[str, Dict[str, Any]] = {}
+        trips = []
+        for trip in batch:
+            body = plan_body(trip)
+            digest = plan_hash(body)
+            bodies.setdefault(digest, body)
+            trips.append({"id": trip["id"], "plan_hash": digest, "created_at": now})
+        try:
+            try:
+                result = await self.plans_collection.bulk_write([
+                    UpdateOne({"_id": digest}, {"$setOnInsert": body, "$set": {"last_used_at": now}}, upsert=True)
+                    for digest, body in bodies.items()
+                ], ordered=False)
+                self.deduplicated += len(batch) - result.upserted_count
+            except BulkWriteError as e:
+                # Two replicas upserting the same new body race on its _id
+                if not only_duplicates(e):
+                    raise
+            try:
+                await self.trips_collection.insert_many(trips, ordered=False)
+            except BulkWriteError as e:
+                # A retried batch may be partly stored already
+                if not only_duplicates(e):
+                    raise
+        except Exception as e:
+            print(f"Error saving {len(batch)} trip plans: {str(e)}")
+            return False
+        for trip in batch:
+            self.pending.pop(trip["id"], None)
+            self._attempts.pop(trip["id"], None)
+        self.written += len(batch)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
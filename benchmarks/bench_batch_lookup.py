@@ -0,0 +1,65 @@
+"""Latency of fetching N temples: N calls to /api/temples/{id} vs one /api/temples/batch.
+
+Runs against a live server, like backend_test.py:
+
+    python -m benchmarks.bench_batch_lookup --base-url http://localhost:8001
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import requests
+
+SIZES = [1, 5, 10, 25, 50, 100]
+REPEAT = 5
+
+
+def per_id(session, base_url, temple_ids):
+    for temple_id in temple_ids:
+        session.get(f"{base_url}/api/temples/{temple_id}").raise_for_status()
+
+
+def batch(session, base_url, temple_ids):
+    response = session.post(f"{base_url}/api/temples/batch", json={"ids": temple_ids})
+    response.raise_for_status()
+    assert len(response.json()["temples"]) == len(temple_ids)
+
+
+def median_ms(fn, *args):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    args = parser.parse_args()
+
+    session = requests.Session()
+    ids = []
+    after = ""
+    while len(ids) < max(SIZES):
+        response = session.get(f"{args.base_url}/api/temples", params={"limit": 1000, "fields": "id", "after": after})
+        response.raise_for_status()
+        ids.extend(temple["id"] for temple in response.json())
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+
+    print(f"{'N':>5} {'per-id ms':>10} {'batch ms':>9}")
+    for size in SIZES:
+        if size > len(ids):
+            break
+        temple_ids = ids[:size]
+        print(f"{size:>5} {median_ms(per_id, session, args.base_url, temple_ids):>10.1f} "
+              f"{median_ms(batch, session, args.base_url, temple_ids):>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Catalog file publish and map cost, and read latency and per-worker memory of a mapped catalog against the in-process snapshot.
+
+"index MB" is the heap a follower worker still spends on its own search,
+fuzzy, geo and typeahead indexes, built from the decoded mapped documents.
+
+    python -m benchmarks.bench_catalog_file
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.catalog import synthetic_temples
+from catalog_file import MappedCatalog, write_catalog_file
+from catalog_snapshot import CatalogSnapshot
+from fuzzy_index import FuzzyIndex
+from geo_index import GeoIndex
+from search_index import TempleSearchIndex
+from suggest_index import SuggestIndex
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 2000
+
+
+def per_query_us(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) * 1e6 / len(args)
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'temples':>8} {'file MB':>8} {'write s':>8} {'map ms':>7} {'heap MB':>8} {'mapped MB':>9} {'index MB':>9} "
+          f"{'get us':>7} {'mget us':>8} {'page us':>8} {'mpage us':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            temples = synthetic_temples(size)
+            tracemalloc.start()
+            snapshot = CatalogSnapshot(None, None)
+            snapshot.replace(temples)
+            heap_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            name = write_catalog_file(directory, 1, temples)
+            write_s = time.perf_counter() - start
+            path = os.path.join(directory, name)
+            tracemalloc.start()
+            start = time.perf_counter()
+            mapped = MappedCatalog(path)
+            map_ms = (time.perf_counter() - start) * 1000
+            mapped_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+
+            tracemalloc.start()
+            decoded = list(mapped.temples())
+            indexes = [TempleSearchIndex(), FuzzyIndex(), GeoIndex(), SuggestIndex()]
+            for index in indexes:
+                index.build(decoded)
+            del decoded
+            index_mb = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+            del indexes
+
+            ids = [rng.choice(temples)["id"] for _ in range(QUERIES)]
+            get_us = per_query_us(snapshot.get, ids)
+            mget_us = per_query_us(mapped.get, ids)
+            page_us = per_query_us(lambda after: snapshot.page(after, 100), ids[:200])
+            mpage_us = per_query_us(lambda after: mapped.page(after, 100), ids[:200])
+            print(f"{size:>8} {os.path.getsize(path) / 1e6:>8.1f} {write_s:>8.2f} {map_ms:>7.2f} {heap_mb:>8.1f} "
+                  f"{mapped_mb:>9.2f} {index_mb:>9.1f} {get_us:>7.2f} {mget_us:>8.2f} {page_us:>8.1f} {mpage_us:>9.1f}")
+            os.remove(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Distance matrix build, incremental update and submatrix latency against pairwise haversine in Python.
+
+    python -m benchmarks.bench_distance_matrix
+"""
+import random
+import sys
+import time
+
+from benchmarks.catalog import synthetic_temples
+from distance_matrix import DistanceMatrix
+from planner import road_km, temple_point
+
+SIZES = [1_000, 4_000, 20_000]
+SUBMATRIX_IDS = 100
+QUERIES = 200
+UPSERTS = 200
+
+
+def loop_submatrix(points):
+    """Pair-by-pair baseline"""
+    return [[road_km(a, b) for b in points] for a in points]
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'temples':>8} {'dense':>6} {'build s':>8} {'upsert ms':>10} {'sub ms':>8} {'loop ms':>8}")
+    for size in SIZES:
+        temples = synthetic_temples(size)
+        matrix = DistanceMatrix()
+        start = time.perf_counter()
+        matrix.build(temples)
+        build_s = time.perf_counter() - start
+
+        samples = [rng.sample(temples, SUBMATRIX_IDS) for _ in range(QUERIES)]
+        start = time.perf_counter()
+        for sample in samples:
+            matrix.submatrix([temple["id"] for temple in sample])
+        sub_ms = (time.perf_counter() - start) * 1000 / QUERIES
+        start = time.perf_counter()
+        for sample in samples[:10]:
+            loop_submatrix([temple_point(temple) for temple in sample])
+        loop_ms = (time.perf_counter() - start) * 1000 / 10
+
+        moved = [
+            {**temple, "coordinates": {"lat": rng.uniform(8.0, 32.0), "lng": rng.uniform(69.0, 89.0)}}
+            for temple in rng.sample(temples, UPSERTS)
+        ]
+        start = time.perf_counter()
+        for temple in moved:
+            matrix.upsert(temple)
+        upsert_ms = (time.perf_counter() - start) * 1000 / UPSERTS
+        print(f"{size:>8} {str(matrix.dense):>6} {build_s:>8.2f} {upsert_ms:>10.3f} {sub_ms:>8.3f} {loop_ms:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Nearest-k and within-radius latency of the grid index against a full haversine scan.
+
+    python -m benchmarks.bench_geo_index
+"""
+import random
+import sys
+import time
+
+from benchmarks.catalog import synthetic_temples
+from geo_index import GeoIndex, haversine_km
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 500
+
+
+def scan_nearest(temples, lat, lng, k, radius_km):
+    """Load-everything-and-sort baseline"""
+    hits = []
+    for temple in temples:
+        distance = haversine_km(lat, lng, temple["coordinates"]["lat"], temple["coordinates"]["lng"])
+        if radius_km is None or distance <= radius_km:
+            hits.append((temple["id"], distance))
+    hits.sort(key=lambda hit: hit[1])
+    return hits[:k]
+
+
+def main():
+    rng = random.Random(7)
+    print(f"{'temples':>8} {'query':<20} {'index ms':>9} {'scan ms':>9}")
+    for size in SIZES:
+        temples = synthetic_temples(size)
+        index = GeoIndex()
+        index.build(temples)
+        points = [(rng.uniform(8.0, 32.0), rng.uniform(69.0, 89.0)) for _ in range(QUERIES)]
+        for label, k, radius_km in (("k=10", 10, None), ("k=10 r=25km", 10, 25.0), ("r=100km", size, 100.0)):
+            start = time.perf_counter()
+            for lat, lng in points:
+                index.nearest(lat, lng, k=k, radius_km=radius_km)
+            index_ms = (time.perf_counter() - start) * 1000 / QUERIES
+            start = time.perf_counter()
+            for lat, lng in points[:10]:
+                scan_nearest(temples, lat, lng, k, radius_km)
+            scan_ms = (time.perf_counter() - start) * 1000 / 10
+            print(f"{size:>8} {label:<20} {index_ms:>9.3f} {scan_ms:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""Concurrent load against every API route, with the app running in-process.
+
+The FastAPI app runs inside this process on an in-memory Mongo stand-in
+seeded with a synthetic catalog. Trip plans go to a fake LlmChat with a
+configurable latency (see benchmarks/standins.py). Each endpoint gets
+--requests requests from --concurrency concurrent clients. Throughput and
+p50/p95/p99 latency are printed per endpoint, and --output writes them as
+JSON that --compare can diff against a later run:
+
+    python -m benchmarks.bench_load --sizes 1000,10000 --output before.json
+    python -m benchmarks.bench_load --sizes 1000,10000 --compare before.json
+
+Routes that query Mongo are timed against the stand-in, which scans in
+Python rather than using indexes. Compare those numbers between runs; don't
+read them as production latencies.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.catalog import STATES, synthetic_temples
+from benchmarks.standins import FakeLlmChat, load_server, seed_catalog
+
+DEFAULT_SIZES = "1000,10000,100000"
+# Imports rewrite the catalog, so they are capped to keep later sizes comparable
+MAX_IMPORT_REQUESTS = 20
+IMPORT_ROWS = 100
+ADMIN_TOKEN = "bench-admin-token"
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Workload:
+    """Request generators for each endpoint over one catalog"""
+
+    def __init__(self, temples: List[Dict[str, Any]], seed: int):
+        self.rng = random.Random(seed)
+        self.temples = temples
+        self.ids = [temple["id"] for temple in temples]
+        self.trip_ids: List[str] = []
+        self.etag = ""
+        self.imported = 0
+
+    def _temple(self) -> Dict[str, Any]:
+        return self.rng.choice(self.temples)
+
+    def _trip_request(self, unique: bool) -> Dict[str, Any]:
+        state = self.rng.choice(list(STATES))
+        body = {
+            "starting_location": f"{self.rng.choice(STATES[state])}, {state}",
+            "days": self.rng.randint(1, 7),
+            "preferred_states": self.rng.sample(list(STATES), self.rng.randint(0, 2)),
+            "temples_of_interest": [],
+        }
+        if unique:
+            # A distinct interest makes every request a trip-plan cache miss
+            body["temples_of_interest"] = [self._temple()["name"]]
+        return body
+
+    def _import_file(self) -> bytes:
+        rows = []
+        for temple in self.rng.sample(self.temples, min(IMPORT_ROWS, len(self.temples))):
+            self.imported += 1
+            rows.append(json.dumps({**temple, "id": f"bench_{self.imported:08d}"}, ensure_ascii=False))
+        return ("\n".join(rows) + "\n").encode()
+
+    def endpoints(self) -> List[Tuple[str, Callable[[], RequestSpec], Optional[Callable[[httpx.Response], None]]]]:
+        """(label, request factory, response hook) in the order they are run"""
+        rng = self.rng
+
+        def remember_trip(response: httpx.Response):
+            if response.status_code == 200:
+                self.trip_ids.append(response.json()["id"])
+
+        cached_trip = self._trip_request(unique=False)
+        return [
+            ("GET /", lambda: ("GET", "/", {}), None),
+            ("GET /api/temples", lambda: ("GET", "/api/temples", {"params": {"limit": 100}}), None),
+            ("GET /api/temples?after", lambda: (
+                "GET", "/api/temples", {"params": {"limit": 100, "after": rng.choice(self.ids)}}
+            ), None),
+            ("GET /api/temples?fields", lambda: (
+                "GET", "/api/temples", {"params": {"limit": 1000, "fields": "summary"}}
+            ), None),
+            ("GET /api/temples (If-None-Match)", lambda: (
+                "GET", "/api/temples", {"params": {"limit": 100}, "headers": {"If-None-Match": self.etag}}
+            ), None),
+            ("GET /api/temples?ids", lambda: (
+                "GET", "/api/temples", {"params": {"ids": ",".join(rng.sample(self.ids, min(20, len(self.ids))))}}
+            ), None),
+            ("POST /api/temples/batch", lambda: (
+                "POST", "/api/temples/batch", {"json": {"ids": rng.sample(self.ids, min(50, len(self.ids)))}}
+            ), None),
+            ("POST /api/temples/distances", lambda: (
+                "POST", "/api/temples/distances", {"json": {"ids": rng.sample(self.ids, min(50, len(self.ids)))}}
+            ), None),
+            ("GET /api/temples/{id}", lambda: ("GET", f"/api/temples/{rng.choice(self.ids)}", {}), None),
+            ("GET /api/temples/nearby", lambda: (
+                "GET", "/api/temples/nearby", {"params": {**self._temple()["coordinates"], "k": 10}}
+            ), None),
+            ("GET /api/search/temples", lambda: ("GET", "/api/search/temples", {"params": {
+                "q": self._temple()["name"].split()[1][:rng.randint(3, 6)],
+            }}), None),
+            ("GET /api/search/temples?fuzzy", lambda: ("GET", "/api/search/temples", {"params": {
+                "q": self._temple()["name"].split()[1], "fuzzy": "true",
+            }}), None),
+            ("GET /api/search/temples?facets", lambda: ("GET", "/api/search/temples", {"params": {
+                "state": self._temple()["state"], "facets": "true",
+            }}), None),
+            ("GET /api/suggest", lambda: ("GET", "/api/suggest", {"params": {
+                "prefix": self._temple()["name"][:rng.randint(1, 6)],
+            }}), None),
+            ("POST /api/trip-plan?mode=fast", lambda: (
+                "POST", "/api/trip-plan", {"params": {"mode": "fast"}, "json": self._trip_request(unique=False)}
+            ), remember_trip),
+            ("POST /api/trip-plan", lambda: (
+                "POST", "/api/trip-plan", {"json": self._trip_request(unique=True)}
+            ), remember_trip),
+            ("POST /api/trip-plan (cached)", lambda: ("POST", "/api/trip-plan", {"json": cached_trip}), None),
+            ("POST /api/trip-plan?job=true", lambda: (
+                "POST", "/api/trip-plan", {"params": {"job": "true"}, "json": self._trip_request(unique=True)}
+            ), None),
+            ("POST /api/trip-plan/stream", lambda: (
+                "POST", "/api/trip-plan/stream", {"json": self._trip_request(unique=True)}
+            ), None),
+            ("GET /api/trip-plans/{id}", lambda: ("GET", f"/api/trip-plans/{rng.choice(self.trip_ids)}", {}), None),
+            ("GET /api/trip-plan/cache", lambda: ("GET", "/api/trip-plan/cache", {}), None),
+            ("GET /api/trip-plan/jobs", lambda: ("GET", "/api/trip-plan/jobs", {}), None),
+            ("GET /metrics", lambda: ("GET", "/metrics", {}), None),
+            ("GET /healthz", lambda: ("GET", "/healthz", {}), None),
+            ("GET /readyz", lambda: ("GET", "/readyz", {}), None),
+            ("POST /api/admin/temples/import", lambda: ("POST", "/api/admin/temples/import", {
+                "files": {"file": ("temples.ndjson", self._import_file(), "application/x-ndjson")},
+                "headers": {"Authorization": f"Bearer {ADMIN_TOKEN}"},
+            }), None),
+        ]
+
+
+async def run_endpoint(client: httpx.AsyncClient, make_request, hook, total: int, concurrency: int) -> Dict[str, Any]:
+    """Send total requests from concurrency workers and summarize their latencies"""
+    # Built up front so request generation isn't timed
+    pending = [make_request() for _ in range(total)]
+    pending.reverse()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker():
+        while pending:
+            method, url, kwargs = pending.pop()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] += 1
+            if hook is not None:
+                hook(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "rps": round(total / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3),
+    }
+
+
+async def wait_for_jobs(server):
+    while True:
+        stats = server.trip_plan_jobs.stats()
+        if not stats["queued"] and not stats["running"]:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def bench_size(server, size: int, args) -> List[Dict[str, Any]]:
+    temples = synthetic_temples(size, seed=args.seed)
+    workload = Workload(temples, seed=args.seed)
+    await seed_catalog(server, temples)
+    server.trip_plan_cache = server.TripPlanCache(
+        ttl_seconds=server.trip_plan_cache.ttl_seconds, max_entries=server.trip_plan_cache.max_entries
+    )
+
+    started = time.perf_counter()
+    await server.app.router.startup()
+    await server.startup.wait_ready()
+    phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in server.startup.phases.items() if name != "import")
+    print(f"\n{size} temples, ready after {time.perf_counter() - started:.2f}s ({phases})")
+    results = []
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            workload.etag = (await client.get("/api/temples", params={"limit": 1})).headers.get("etag", "")
+            print(f"{'endpoint':<36} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+            for label, make_request, hook in workload.endpoints():
+                if args.endpoints and not any(part in label for part in args.endpoints):
+                    continue
+                if label == "GET /api/trip-plans/{id}" and not workload.trip_ids:
+                    continue
+                total = min(args.requests, MAX_IMPORT_REQUESTS) if "import" in label else args.requests
+                summary = await run_endpoint(client, make_request, hook, total, args.concurrency)
+                if "job=true" in label:
+                    await wait_for_jobs(server)
+                print(f"{label:<36} {summary['rps']:>8} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+                      f"{summary['p99_ms']:>9.2f} {summary['errors']:>6}")
+                results.append({"catalog_size": size, "endpoint": label, **summary})
+    finally:
+        await server.app.router.shutdown()
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """Print the relative change of each endpoint against a previous --output file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(row["catalog_size"], row["endpoint"]): row for row in json.load(f)["results"]}
+
+    def change(new, old):
+        if not old or new is None:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    print(f"\nChange against {baseline_path}")
+    print(f"{'temples':>8} {'endpoint':<36} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for row in results:
+        old = baseline.get((row["catalog_size"], row["endpoint"]))
+        if old is None:
+            continue
+        print(f"{row['catalog_size']:>8} {row['endpoint']:<36} {change(row['rps'], old['rps']):>9} "
+              f"{change(row['p50_ms'], old['p50_ms']):>9} {change(row['p95_ms'], old['p95_ms']):>9} "
+              f"{change(row['p99_ms'], old['p99_ms']):>9}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    FakeLlmChat.configure(args.llm_latency_ms / 1000, args.llm_jitter_ms / 1000, args.llm_failure_rate, args.llm_stall_rate)
+    server = load_server()
+    server.ADMIN_TOKEN = ADMIN_TOKEN
+    results = []
+    for size in args.sizes:
+        results.extend(await bench_size(server, size, args))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_failure_rate": args.llm_failure_rate,
+            "llm_stall_rate": args.llm_stall_rate,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        type=lambda value: [int(size) for size in value.split(",")],
+                        help=f"comma-separated catalog sizes (default {DEFAULT_SIZES})")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0,
+                        help="fraction of LLM replies that are not JSON")
+    parser.add_argument("--llm-stall-rate", type=float, default=0.0,
+                        help="fraction of LLM calls that hang for a minute; set LLM_DEADLINE_SECONDS to bound them")
+    parser.add_argument("--endpoints", nargs="*", help="only run endpoints whose label contains one of these")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file from an earlier --output to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nWrote {args.output}")
+    if args.compare:
+        compare(report["results"], args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Compare the inverted index against a regex scan as the catalog grows.
+
+The facets column is the extra cost of `facets=true` for the same query.
+The fuzzy column runs the query through the n-gram index used by
+`fuzzy=true`, and the misspelt queries at the end only match that way.
+The regex scan mirrors the old `$or` of unanchored case-insensitive
+`$regex` clauses, which Mongo had to evaluate against every document.
+
+    python -m benchmarks.bench_search_index
+"""
+import re
+import sys
+import time
+
+from benchmarks.catalog import synthetic_temples
+from fuzzy_index import FuzzyIndex
+from search_index import TempleSearchIndex
+
+SIZES = [1_000, 10_000, 50_000, 100_000]
+QUERIES = [
+    {"q": "meen"},
+    {"q": "kamarava"},
+    {"q": "kashi vish"},
+    {"q": "madurai"},
+    {"state": "Tamil Nadu"},
+    {"q": "sri", "deity": "Shiva"},
+    {"q": "minakshi"},
+    {"q": "kasi vishvanath"},
+    {"q": "brihadeeswarar"},
+]
+REPEAT = 20
+
+
+def regex_scan(temples, q="", state="", deity=""):
+    """Python equivalent of the old Mongo regex query"""
+    results = []
+    q_re = re.compile(re.escape(q), re.I) if q else None
+    state_re = re.compile(re.escape(state), re.I) if state else None
+    deity_re = re.compile(re.escape(deity), re.I) if deity else None
+    for temple in temples:
+        if q_re and not (q_re.search(temple["name"]) or q_re.search(temple["location"]) or q_re.search(temple["city"])):
+            continue
+        if state_re and not state_re.search(temple["state"]):
+            continue
+        if deity_re and not deity_re.search(temple["deity"]):
+            continue
+        results.append(temple)
+        if len(results) == 100:
+            break
+    return results
+
+
+def time_ms(fn, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    print(
+        f"{'temples':>8} {'build ms':>9} {'query':<28} {'index ms':>9} {'facets ms':>9} "
+        f"{'fuzzy ms':>9} {'scan ms':>9}"
+    )
+    for size in SIZES:
+        temples = synthetic_temples(size)
+        index = TempleSearchIndex()
+        build_ms = time_ms(lambda: index.build(temples), repeat=1)
+        fuzzy = FuzzyIndex()
+        fuzzy.build(temples)
+        for params in QUERIES:
+            label = " ".join(f"{key}={value}" for key, value in params.items())
+            index_ms = time_ms(lambda: index.search(**params))
+            facets_ms = time_ms(lambda: index.facets(**params))
+            allowed = index.allowed_ids(params.get("state", ""), params.get("deity", ""))
+            fuzzy_ms = time_ms(lambda: fuzzy.search_ids(params.get("q", ""), allowed))
+            scan_ms = time_ms(lambda: regex_scan(temples, **params))
+            print(
+                f"{size:>8} {build_ms:>9.1f} {label:<28} {index_ms:>9.3f} {facets_ms:>9.3f} "
+                f"{fuzzy_ms:>9.3f} {scan_ms:>9.3f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
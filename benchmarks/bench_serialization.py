@@ -0,0 +1,88 @@
+"""Old vs new serialization cost for the temple read routes.
+
+The old path walked each document to stringify ObjectId, re-validated it
+against the response_model and encoded it with jsonable_encoder + json.dumps.
+The new path projects `_id` away in the query and hands the documents to
+orjson directly.
+
+    python -m benchmarks.bench_serialization
+"""
+import copy
+import json
+import sys
+import time
+from typing import List
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from benchmarks.catalog import synthetic_temples
+from server import Temple, json_bytes_response
+
+REPEAT = 50
+
+
+def serialize_doc(doc):
+    """The recursive ObjectId walk the read routes used to run"""
+    if doc is None:
+        return None
+    if isinstance(doc, list):
+        return [serialize_doc(item) for item in doc]
+    if isinstance(doc, dict):
+        for key, value in doc.items():
+            if isinstance(value, ObjectId):
+                doc[key] = str(value)
+            elif isinstance(value, dict):
+                doc[key] = serialize_doc(value)
+            elif isinstance(value, list):
+                doc[key] = serialize_doc(value)
+    return doc
+
+
+def old_path(docs, adapter):
+    """serialize_doc -> response_model validation -> jsonable_encoder -> json.dumps"""
+    validated = adapter.validate_python(serialize_doc(docs))
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def new_path(docs):
+    return json_bytes_response(docs).body
+
+
+def time_ms(fn, fresh):
+    total = 0.0
+    for _ in range(REPEAT):
+        # Motor hands back fresh documents on every request
+        docs = fresh()
+        start = time.perf_counter()
+        fn(docs)
+        total += time.perf_counter() - start
+    return total * 1000 / REPEAT
+
+
+def main():
+    temples = synthetic_temples(1000)
+    with_ids = [{"_id": ObjectId(), **temple} for temple in temples]
+    list_adapter = TypeAdapter(List[Temple])
+    one_adapter = TypeAdapter(Temple)
+
+    cases = [
+        ("get_all_temples (1000)", list_adapter, with_ids, temples),
+        ("search_temples (100)", list_adapter, with_ids[:100], temples[:100]),
+        ("get_temple (1)", one_adapter, with_ids[0], temples[0]),
+    ]
+    print(f"{'route':<24} {'old ms':>9} {'new ms':>9} {'speedup':>8}")
+    for label, adapter, old_docs, new_docs in cases:
+        # Both paths must produce the same JSON
+        assert orjson.loads(old_path(copy.deepcopy(old_docs), adapter)) == orjson.loads(new_path(new_docs))
+        old_ms = time_ms(lambda docs: old_path(docs, adapter), lambda: copy.deepcopy(old_docs))
+        new_ms = time_ms(new_path, lambda: copy.deepcopy(new_docs))
+        print(f"{label:<24} {old_ms:>9.3f} {new_ms:>9.3f} {old_ms / new_ms:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
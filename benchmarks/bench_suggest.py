@@ -0,0 +1,63 @@
+"""Typeahead latency percentiles at increasing catalog sizes.
+
+Each temple contributes its name plus shared city/state/deity entries, so
+100k temples is a little over 100k suggestion entries. Then single-temple
+renames and batches of BATCH renames are applied, each followed by the
+broadest one-letter queries, which would pay for any precomputed list a
+write invalidated.
+
+    python -m benchmarks.bench_suggest
+"""
+import random
+import sys
+import time
+
+from benchmarks.catalog import synthetic_temples
+from suggest_index import SuggestIndex, fold
+
+SIZES = [1_000, 10_000, 100_000]
+QUERIES = 5000
+WRITES = 50
+BATCH = 100
+
+
+def main():
+    rng = random.Random(11)
+    print(f"{'temples':>8} {'entries':>8} {'build s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'write ms':>9} {f'x{BATCH} ms':>9} {'after ms':>9}")
+    for size in SIZES:
+        temples = synthetic_temples(size)
+        index = SuggestIndex()
+        start = time.perf_counter()
+        index.build(temples)
+        build_s = time.perf_counter() - start
+        # What a user has typed so far: 1-8 characters of a real label
+        labels = [fold(rng.choice(temples)[rng.choice(["name", "city", "state", "deity"])]) for _ in range(QUERIES)]
+        prefixes = [label[:rng.randint(1, 8)] for label in labels]
+        latencies = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.suggest(prefix, 10)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        writes = []
+        after = []
+        for batch_size in [1] * WRITES + [BATCH] * 5:
+            renamed = [{**temple, "name": f"{temple['name']} Mandir"} for temple in rng.sample(temples, batch_size)]
+            start = time.perf_counter()
+            index.upsert_many(renamed)
+            writes.append((batch_size, (time.perf_counter() - start) * 1000))
+            for prefix in "stakmr":
+                start = time.perf_counter()
+                index.suggest(prefix, 10)
+                after.append((time.perf_counter() - start) * 1000)
+        single = sorted(ms for batch_size, ms in writes if batch_size == 1)
+        print(f"{size:>8} {len(index):>8} {build_s:>8.2f} {latencies[len(latencies) // 2]:>8.3f} "
+              f"{latencies[int(len(latencies) * 0.99)]:>8.3f} {latencies[-1]:>8.3f} "
+              f"{single[len(single) // 2]:>9.3f} {max(ms for batch_size, ms in writes if batch_size == BATCH):>9.1f} "
+              f"{max(after):>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
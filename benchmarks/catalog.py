@@ -0,0 +1,67 @@
+"""Synthetic temple catalogs for benchmarks"""
+import os
+import random
+import sys
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+STATES = {
+    "Tamil Nadu": ["Madurai", "Thanjavur", "Chennai", "Rameswaram", "Kanchipuram", "Tiruchirappalli"],
+    "Kerala": ["Thiruvananthapuram", "Guruvayur", "Kochi", "Sabarimala"],
+    "Karnataka": ["Udupi", "Mysuru", "Hampi", "Gokarna"],
+    "Andhra Pradesh": ["Tirupati", "Srisailam", "Vijayawada"],
+    "Odisha": ["Puri", "Bhubaneswar", "Konark"],
+    "Uttar Pradesh": ["Varanasi", "Mathura", "Vrindavan", "Ayodhya", "Prayagraj"],
+    "Uttarakhand": ["Haridwar", "Rishikesh", "Kedarnath", "Badrinath"],
+    "Gujarat": ["Somnath", "Dwarka", "Ambaji"],
+    "Maharashtra": ["Shirdi", "Pandharpur", "Nashik", "Mumbai"],
+    "Punjab": ["Amritsar", "Anandpur Sahib"],
+    "Rajasthan": ["Pushkar", "Ajmer", "Nathdwara"],
+    "West Bengal": ["Kolkata", "Dakshineswar", "Tarapith"],
+}
+DEITIES = [
+    "Shiva", "Vishnu", "Krishna", "Rama", "Hanuman", "Ganesha", "Durga",
+    "Kali", "Lakshmi", "Saraswati", "Murugan", "Ayyappa", "Meenakshi", "Jagannath",
+]
+SYLLABLES = ["ka", "ma", "ra", "va", "sha", "ti", "nu", "pa", "la", "dhi", "go", "mu", "re", "shwa", "na", "ya"]
+NAME_PARTS = [
+    "Sri", "Maha", "Arulmigu", "Shree", "Kashi", "Vishwanath", "Ranganatha", "Venkateswara",
+    "Brihadishvara", "Kamakshi", "Mahalakshmi", "Siddhivinayak", "Kedareshwar", "Omkareshwar",
+    "Jyotirlinga", "Bhagavathi", "Padmanabha", "Annapurna", "Dakshinamurthy", "Nataraja",
+]
+
+
+def synthetic_temples(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate n temple documents shaped like SAMPLE_TEMPLES"""
+    rng = random.Random(seed)
+    states = list(STATES)
+    temples = []
+    for i in range(n):
+        state = rng.choice(states)
+        city = rng.choice(STATES[state])
+        deity = rng.choice(DEITIES)
+        # A made-up proper name keeps most temple names distinct, as in real catalogs
+        proper = "".join(rng.choice(SYLLABLES) for _ in range(4)).capitalize()
+        name = f"{rng.choice(NAME_PARTS)} {proper} {deity} Temple"
+        temples.append({
+            "id": f"temple_{i:06d}",
+            "name": name,
+            "location": f"{city}, {state}",
+            "state": state,
+            "city": city,
+            "deity": deity,
+            "image": f"https://images.example.com/temples/{i}.jpg",
+            "description": f"{name} is a temple dedicated to {deity} in {city}. " * 3,
+            "history": f"The temple in {city} has a long history. " * 6,
+            "timings": "6:00 AM - 12:00 PM, 4:00 PM - 9:00 PM",
+            "prasadam": "Sacred offerings",
+            "festivals": ["Maha Shivratri", "Navarathri"],
+            "contact": "+91-000-0000000",
+            "booking_link": "https://example.com",
+            "coordinates": {"lat": round(rng.uniform(8.0, 32.0), 5), "lng": round(rng.uniform(69.0, 89.0), 5)},
+            "nearby_attractions": ["Local market", "River ghat"],
+        })
+    return temples
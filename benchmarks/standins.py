@@ -0,0 +1,501 @@
+"""In-process stand-ins for the services server.py talks to.
+
+load_server() imports the backend app against InMemoryMongoClient and
+FakeLlmChat, so the whole API can be driven without network access or API
+keys. InMemoryMongoClient implements the slice of Motor's API the backend
+uses. It keeps an index on the `id` field, so catalogs of 100k temples stay
+usable; mongomock scans every document on each query. FakeLlmChat waits a
+configurable time and then replies with a well-formed plan.
+"""
+import asyncio
+import copy
+import importlib.util
+import json
+import random
+import re
+import sys
+import types
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from benchmarks.catalog import BACKEND_DIR
+
+DAYS_RE = re.compile(r"(\d+)-day")
+# Candidate lines of the trip prompt: "{name} | {city}, {state} | {deity} | {km}"
+PROMPT_TEMPLE_RE = re.compile(r"^([^|\n]+?) \| ([^|\n]+?) \| [^|\n]* \| (?:\d+|\?)$", re.MULTILINE)
+
+
+# Mongo
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    if op == "$eq":
+        return value == operand or (isinstance(value, list) and operand in value)
+    if op == "$ne":
+        return not _compare(value, "$eq", operand)
+    if op == "$in":
+        return any(_compare(value, "$eq", item) for item in operand)
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$exists":
+        return (value is not None) == bool(operand)
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"InMemoryCollection does not support {op}")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        value = _get(doc, key)
+        if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _compare(value, "$eq", condition):
+            return False
+    return True
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Copy of doc under a Mongo projection; nested values are shared, not copied"""
+    if not projection:
+        return dict(doc)
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        result = {key: doc[key] for key in included if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    excluded = {key for key, flag in projection.items() if not flag}
+    return {key: value for key, value in doc.items() if key not in excluded}
+
+
+class InMemoryCursor:
+    def __init__(self, collection: "InMemoryCollection", query: Dict[str, Any], projection):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._limit = 0
+
+    def sort(self, key, direction: int = 1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def _docs(self) -> Iterator[Dict[str, Any]]:
+        docs = self.collection._candidates(self.query, self._sort)
+        if self._sort != [("id", 1)]:
+            docs = list(docs)
+            for key, direction in reversed(self._sort):
+                docs.sort(key=lambda doc: (_get(doc, key) is not None, _get(doc, key)), reverse=direction < 0)
+        count = 0
+        for doc in docs:
+            if self._limit and count == self._limit:
+                return
+            count += 1
+            yield project(doc, self.projection)
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = []
+        for doc in self._docs():
+            if length is not None and len(docs) == length:
+                break
+            docs.append(doc)
+        return docs
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        for doc in self._docs():
+            yield doc
+
+
+class InMemoryCollection:
+    """Documents in a dict, with a hash and sorted index on `id`.
+
+    Queries on `id` (equality, `$in`, ranges sorted by id) use the index;
+    anything else scans. Sorting by id skips documents that have no id. Stored documents are deep copies of what was
+    written, and reads return shallow copies.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._by_id: Dict[Any, Any] = {}
+        self._sorted_ids: Optional[List[Any]] = None
+        self._unique: set = set()
+        self.indexes: Dict[str, Dict[str, Any]] = {}
+
+    # Storage
+
+    def _store(self, doc: Dict[str, Any]):
+        for field in self._unique:
+            if field == "id" or field == "_id":
+                continue
+            value = doc.get(field)
+            if any(other.get(field) == value and other["_id"] != doc["_id"] for other in self._docs.values()):
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {field}_1")
+        if "id" in doc:
+            existing = self._by_id.get(doc["id"])
+            if existing is not None and existing != doc["_id"]:
+                if "id" in self._unique:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: id_1")
+            else:
+                self._by_id[doc["id"]] = doc["_id"]
+        previous = self._docs.get(doc["_id"])
+        if previous is not None and previous.get("id") != doc.get("id"):
+            self._by_id.pop(previous.get("id"), None)
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        self._sorted_ids = None
+
+    def _delete(self, doc: Dict[str, Any]):
+        del self._docs[doc["_id"]]
+        if self._by_id.get(doc.get("id")) == doc["_id"]:
+            del self._by_id[doc["id"]]
+        self._sorted_ids = None
+
+    def _candidates(self, query: Dict[str, Any], sort: List[Tuple[str, int]] = ()) -> Iterator[Dict[str, Any]]:
+        """Documents matching query, in id order when sorting by id"""
+        condition = query.get("id")
+        docs: Any
+        if condition is not None and not isinstance(condition, dict):
+            docs = [self._docs[self._by_id[condition]]] if condition in self._by_id else []
+        elif isinstance(condition, dict) and "$in" in condition:
+            docs = [self._docs[self._by_id[value]] for value in dict.fromkeys(condition["$in"]) if value in self._by_id]
+            if list(sort) == [("id", 1)]:
+                docs.sort(key=lambda doc: doc["id"])
+        elif list(sort) == [("id", 1)]:
+            if self._sorted_ids is None:
+                self._sorted_ids = sorted(self._by_id)
+            ids = self._sorted_ids
+            lo = 0
+            if isinstance(condition, dict):
+                if "$gt" in condition:
+                    lo = bisect_right(ids, condition["$gt"])
+                if "$gte" in condition:
+                    lo = bisect_left(ids, condition["$gte"])
+            # Documents without an id are left out of this path
+            docs = (self._docs[self._by_id[ids[i]]] for i in range(lo, len(ids)))
+        else:
+            docs = list(self._docs.values())
+        return (doc for doc in docs if matches(doc, query))
+
+    def _find_one_doc(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if "_id" in query and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            return doc if doc is not None and matches(doc, query) else None
+        return next(self._candidates(query), None)
+
+    # Reads
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection=None) -> InMemoryCursor:
+        return InMemoryCursor(self, query or {}, projection)
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection=None) -> Optional[Dict[str, Any]]:
+        doc = self._find_one_doc(query or {})
+        return project(doc, projection) if doc is not None else None
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        if not query:
+            return len(self._docs)
+        return sum(1 for _ in self._candidates(query))
+
+    # Writes
+
+    async def insert_one(self, doc: Dict[str, Any]) -> InsertOneResult:
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+        self._store(doc)
+        return InsertOneResult(doc["_id"], True)
+
+    async def insert_many(self, docs: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        ids = []
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                ids.append((await self.insert_one(doc)).inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+        return InsertManyResult(ids, True)
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        doc = self._find_one_doc(query)
+        if doc is not None:
+            modified = {**replacement, "_id": doc["_id"]} != doc
+            self._store({**replacement, "_id": doc["_id"]})
+            return UpdateResult({"n": 1, "nModified": int(modified)}, True)
+        if upsert:
+            new_doc = {**{key: value for key, value in query.items() if not isinstance(value, dict)}, **replacement}
+            new_doc.setdefault("_id", ObjectId())
+            self._store(new_doc)
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": new_doc["_id"]}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        existed = self._find_one_doc(query) is not None
+        updated = await self.find_one_and_update(query, update, upsert=upsert, return_document=True)
+        if existed:
+            return UpdateResult({"n": 1, "nModified": 1}, True)
+        if updated is not None:
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": updated["_id"]}, True)
+        return UpdateResult({"n": 0, "nModified": 0}, True)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        result: Dict[str, Any] = {
+            "writeErrors": [], "nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [],
+        }
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, ReplaceOne):
+                    outcome = await self.replace_one(request._filter, request._doc, upsert=request._upsert)
+                    result["nMatched"] += outcome.matched_count
+                    result["nModified"] += outcome.modified_count
+                    if outcome.upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": outcome.upserted_id})
+                elif isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    result["nInserted"] += 1
+                elif isinstance(request, UpdateOne):
+                    existed = self._find_one_doc(request._filter) is not None
+                    updated = await self.find_one_and_update(
+                        request._filter, request._doc, upsert=request._upsert, return_document=True
+                    )
+                    if existed:
+                        result["nMatched"] += 1
+                        result["nModified"] += 1
+                    elif updated is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": updated["_id"]})
+                else:
+                    raise NotImplementedError(f"InMemoryCollection does not support {type(request).__name__}")
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=False, projection=None):
+        doc = self._find_one_doc(query)
+        if doc is None and not upsert:
+            return None
+        before = copy.deepcopy(doc) if doc is not None else None
+        updated = copy.deepcopy(doc) if doc is not None else {
+            key: value for key, value in query.items() if not isinstance(value, dict)
+        }
+        for op, fields in update.items():
+            for key, value in fields.items():
+                if op == "$inc":
+                    updated[key] = updated.get(key, 0) + value
+                elif op == "$set" or (op == "$setOnInsert" and doc is None):
+                    updated[key] = value
+                elif op != "$setOnInsert":
+                    raise NotImplementedError(f"InMemoryCollection does not support {op}")
+        updated.setdefault("_id", ObjectId())
+        self._store(updated)
+        result = updated if return_document else before
+        return project(result, projection) if result is not None else None
+
+    async def delete_many(self, query: Dict[str, Any]) -> DeleteResult:
+        doomed = list(self._candidates(query))
+        for doc in doomed:
+            self._delete(doc)
+        return DeleteResult({"n": len(doomed)}, True)
+
+    async def create_index(self, keys, unique: bool = False, **options) -> str:
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = options.get("name") or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes[name] = {"key": keys, "unique": unique, **options}
+        if unique and len(keys) == 1:
+            self._unique.add(keys[0][0])
+        return name
+
+    def watch(self, *args, **kwargs):
+        # Like a standalone mongod, so the catalog snapshot polls its version instead
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+
+class InMemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    __getattr__ = __getitem__
+
+    async def command(self, command, *args, **kwargs) -> Dict[str, Any]:
+        return {"ok": 1.0}
+
+
+class InMemoryMongoClient:
+    """Stands in for AsyncIOMotorClient; the connection string is ignored"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, InMemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = InMemoryDatabase(name)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> InMemoryDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def close(self):
+        pass
+
+
+# LLM
+
+class UserMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def fake_plan(prompt: str) -> Dict[str, Any]:
+    """A plan in the shape the prompt asks for, using the temples it lists"""
+    match = DAYS_RE.search(prompt)
+    days = int(match.group(1)) if match else 3
+    temples = PROMPT_TEMPLE_RE.findall(prompt) or [("Local Temple", "Nearby")]
+    itinerary = []
+    for day in range(1, days + 1):
+        name, location = temples[(day - 1) % len(temples)]
+        itinerary.append({
+            "day": day,
+            "location": location,
+            "temples": [name],
+            "activities": ["Temple darshan", "Evening aarti"],
+            "travel_time": "About 2.0 hours (100 km)",
+            "accommodation": f"Stay in {location.split(',')[0]}",
+        })
+    return {
+        "title": f"{days}-Day Temple Pilgrimage",
+        "duration": days,
+        "daily_itinerary": itinerary,
+        "total_temples": days,
+        "estimated_cost": f"₹{days * 3000}-{days * 5000}",
+        "best_travel_mode": "Car with driver",
+    }
+
+
+class FakeLlmChat:
+    """Replaces LlmChat: sleeps for latency ± jitter seconds, then answers.
+
+    A `failure_rate` fraction of replies is prose instead of JSON, which
+    sends the server down its parse-failure fallback. A `stall_rate` fraction
+    of calls takes `stall_seconds` instead, like a provider incident.
+    """
+
+    latency_seconds = 0.5
+    jitter_seconds = 0.1
+    failure_rate = 0.0
+    stall_rate = 0.0
+    stall_seconds = 60.0
+    calls = 0
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.session_id = session_id
+
+    @classmethod
+    def configure(cls, latency_seconds: float, jitter_seconds: float = 0.0, failure_rate: float = 0.0,
+                  stall_rate: float = 0.0):
+        cls.latency_seconds = latency_seconds
+        cls.jitter_seconds = jitter_seconds
+        cls.failure_rate = failure_rate
+        cls.stall_rate = stall_rate
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message) -> str:
+        type(self).calls += 1
+        delay = self.latency_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds)
+        if random.random() < self.stall_rate:
+            delay = self.stall_seconds
+        await asyncio.sleep(max(0.0, delay))
+        if random.random() < self.failure_rate:
+            return "I'm sorry, I can't put together an itinerary right now."
+        return "```json\n" + json.dumps(fake_plan(getattr(message, "text", str(message))), ensure_ascii=False) + "\n```"
+
+
+def load_server():
+    """Import server.py wired to InMemoryMongoClient and FakeLlmChat.
+
+    Must run before anything else imports server, since the Mongo client is
+    created at import time.
+    """
+    import motor.motor_asyncio
+
+    if "server" in sys.modules:
+        raise RuntimeError("server was imported before load_server(); it is already bound to a real Mongo client")
+    motor.motor_asyncio.AsyncIOMotorClient = InMemoryMongoClient
+    if importlib.util.find_spec("emergentintegrations") is None:
+        # The real client library is only needed to talk to the LLM, which FakeLlmChat replaces
+        package = types.ModuleType("emergentintegrations")
+        llm = types.ModuleType("emergentintegrations.llm")
+        chat = types.ModuleType("emergentintegrations.llm.chat")
+        chat.LlmChat = FakeLlmChat
+        chat.UserMessage = UserMessage
+        package.llm = llm
+        llm.chat = chat
+        sys.modules.update({
+            "emergentintegrations": package,
+            "emergentintegrations.llm": llm,
+            "emergentintegrations.llm.chat": chat,
+        })
+
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import server
+
+    server.LlmChat = FakeLlmChat
+    return server
+
+
+async def seed_catalog(server, temples: List[Dict[str, Any]], chunk_size: int = 5000):
+    """Replace the stand-in database contents with temples"""
+    for collection in (server.temples_collection, server.trips_collection, server.plans_collection, server.meta_collection):
+        await collection.delete_many({})
+    for start in range(0, len(temples), chunk_size):
+        # insert_many adds _id to the dicts it is given
+        await server.temples_collection.insert_many([dict(temple) for temple in temples[start:start + chunk_size]])
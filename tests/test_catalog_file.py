@@ -0,0 +1,94 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pymongo")
+
+from catalog_file import (  # noqa: E402
+    BuilderLock, MappedCatalog, catalog_file_changes, prune_catalog_files, read_current, write_catalog_file,
+    write_current
+)
+from catalog_snapshot import CatalogSnapshot  # noqa: E402
+
+
+def temple(i, **fields):
+    return {"id": f"t{i:03d}", "name": f"Temple {i}", "state": "Goa" if i % 2 else "Kerala",
+            "coordinates": {"lat": 10.0 + i / 10, "lng": 76.0 + i / 10}, **fields}
+
+
+@pytest.fixture
+def temples():
+    return [temple(i) for i in range(20)]
+
+
+def mapped(directory, temples, version=1):
+    return MappedCatalog(os.path.join(directory, write_catalog_file(directory, version, temples)))
+
+
+def test_reads_from_the_mapping(tmp_path, temples):
+    catalog = mapped(str(tmp_path), [{**temples[3], "_id": "oid"}] + temples[:3] + temples[4:])
+    assert len(catalog) == 20
+    assert catalog.get("t003") == temples[3]
+    assert catalog.get("missing") is None
+    assert [doc["id"] for doc in catalog.page("t017")] == ["t018", "t019"]
+    found, missing = catalog.many(["t005", "nope", "t001"])
+    assert [doc["id"] for doc in found] == ["t005", "t001"] and missing == ["nope"]
+    assert [doc["id"] for doc in catalog.in_states(["Goa"], limit=3)] == ["t001", "t003", "t005"]
+    assert catalog.distances.shape == (20, 20) and catalog.distances[0, 0] == 0
+    np.testing.assert_allclose(catalog.coordinates[2], [10.2, 76.2])
+
+
+def test_changes_between_files(tmp_path, temples):
+    old = mapped(str(tmp_path), temples)
+    changed = temples[1:5] + [temple(5, name="Renamed")] + temples[6:] + [temple(99)]
+    upserted, removed = catalog_file_changes(old, mapped(str(tmp_path), changed, version=2))
+    assert sorted(doc["id"] for doc in upserted) == ["t005", "t099"]
+    assert removed == ["t000"]
+    assert catalog_file_changes(old, old) == ([], [])
+
+
+def test_prune_keeps_the_newest_files(tmp_path, temples):
+    names = [write_catalog_file(str(tmp_path), version, temples) for version in (1, 2, 3)]
+    prune_catalog_files(str(tmp_path), names[2])
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".bin")) == names[1:]
+
+
+def test_one_builder_at_a_time(tmp_path):
+    first, second = BuilderLock(str(tmp_path)), BuilderLock(str(tmp_path))
+    assert first.acquire() and not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_followers_apply_only_what_a_new_file_changed(tmp_path, temples):
+    directory = str(tmp_path)
+    calls = []
+
+    async def on_reload(docs):
+        calls.append(("reload", len(docs)))
+
+    async def on_change(upserted, removed):
+        calls.append(("change", sorted(doc["id"] for doc in upserted), removed))
+
+    def publish(docs, version):
+        write_current(directory, write_catalog_file(directory, version, docs), version, time.time())
+
+    async def scenario():
+        follower = CatalogSnapshot(None, None, on_reload=on_reload, on_change=on_change, catalog_file=directory)
+        follower.catalog_version = type("Version", (), {"value": 0})()
+        publish(temples, 1)
+        await follower._map_current()
+        publish(temples[:3] + [temple(3, name="Renamed")] + temples[4:-1], 2)
+        await follower._map_current()
+        # Nothing new published
+        await follower._map_current()
+        return follower
+
+    follower = asyncio.run(scenario())
+    assert calls == [("reload", 20), ("change", ["t003"], ["t019"])]
+    assert follower.get("t003")["name"] == "Renamed" and follower.fresh
+    assert read_current(directory)["version"] == 2
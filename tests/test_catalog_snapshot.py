@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import catalog_snapshot  # noqa: E402
+from catalog_snapshot import CatalogSnapshot  # noqa: E402
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return [dict(doc) for doc in self.docs]
+
+
+class TemplesCollection:
+    """The find() CatalogSnapshot.reload makes, over docs keyed by temple id"""
+
+    def __init__(self, temples):
+        self.docs = {temple["id"]: {**temple, "_id": f"oid-{temple['id']}"} for temple in temples}
+
+    def find(self, query):
+        return Cursor(list(self.docs.values()))
+
+
+class Version:
+    def __init__(self):
+        self.value = 0
+        self.stored = 1
+
+    async def read(self):
+        return self.stored
+
+
+def temple(i, state="Kerala", name=None):
+    return {"id": f"t{i:03d}", "name": name or f"Temple {i}", "state": state}
+
+
+@pytest.fixture
+def catalog():
+    """(snapshot, collection, calls) where calls records the reload and change hooks"""
+    collection = TemplesCollection([temple(i, "Kerala" if i % 2 else "Goa") for i in range(50)])
+    calls = []
+
+    async def on_reload(temples):
+        calls.append(("reload", len(temples)))
+
+    async def on_change(upserted, removed):
+        calls.append(("change", sorted(doc["id"] for doc in upserted), sorted(removed)))
+
+    snapshot = CatalogSnapshot(collection, Version(), on_reload=on_reload, on_change=on_change)
+    snapshot._ready.set()
+    asyncio.run(snapshot.reload())
+    calls.clear()
+    return snapshot, collection, calls
+
+
+def test_reads(catalog):
+    snapshot, _, _ = catalog
+    assert snapshot.get("t007") == temple(7, "Kerala")
+    assert snapshot.get("t007", {"name": 1}) == {"name": "Temple 7"}
+    assert [doc["id"] for doc in snapshot.page("t045", limit=3)] == ["t046", "t047", "t048"]
+    temples, missing = snapshot.many(["t002", "nope", "t001"])
+    assert [doc["id"] for doc in temples] == ["t002", "t001"] and missing == ["nope"]
+    assert [doc["id"] for doc in snapshot.in_states(["Goa"], limit=3)] == ["t000", "t002", "t004"]
+
+
+def test_reload_applies_only_what_changed(catalog):
+    snapshot, collection, calls = catalog
+    collection.docs["t003"]["name"] = "Renamed"
+    collection.docs["t004"]["state"] = "Kerala"
+    del collection.docs["t010"]
+    collection.docs["t099"] = {**temple(99), "_id": "oid-t099"}
+    asyncio.run(snapshot.reload())
+    assert calls == [("change", ["t003", "t004", "t099"], ["t010"])]
+    assert snapshot.get("t003")["name"] == "Renamed" and snapshot.get("t010") is None
+    assert "t004" in snapshot.by_state["Kerala"] and "t004" not in snapshot.by_state["Goa"]
+    assert [doc["id"] for doc in snapshot.page("t098")] == ["t099"]
+
+    calls.clear()
+    asyncio.run(snapshot.reload())
+    assert calls == []
+
+
+def test_large_changes_replace_everything(catalog, monkeypatch):
+    snapshot, collection, calls = catalog
+    monkeypatch.setattr(catalog_snapshot, "RELOAD_MAX_CHANGES", 2)
+    for i in range(3):
+        collection.docs[f"t{i:03d}"]["name"] = "Renamed"
+    asyncio.run(snapshot.reload())
+    assert calls == [("reload", 50)]
+    assert snapshot.get("t001")["name"] == "Renamed"
+
+
+def test_local_writes_are_applied():
+    snapshot = CatalogSnapshot(None, None)
+    snapshot.replace([temple(1), temple(2)])
+    snapshot.apply([temple(2, "Goa"), temple(3)], ["t001"])
+    assert [doc["id"] for doc in snapshot.page()] == ["t002", "t003"]
+    assert snapshot.by_state == {"Goa": {"t002"}, "Kerala": {"t003"}}
+
+
+def test_wait_ready_is_bounded():
+    async def scenario():
+        snapshot = CatalogSnapshot(None, None)
+        assert not await snapshot.wait_ready(0.01)
+        snapshot._ready.set()
+        assert await snapshot.wait_ready(0.01)
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from catalog_version import CATALOG_VERSION_ID, CatalogVersion, etag_matches  # noqa: E402
+
+
+class MetaCollection:
+    """The two calls CatalogVersion makes on the meta collection"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"]})
+        for field, amount in update["$inc"].items():
+            doc[field] = doc.get(field, 0) + amount
+        return doc
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    ('"catalog-3"', True),
+    ('W/"catalog-3"', True),
+    ('"catalog-2", "catalog-3"', True),
+    ('"catalog-2"', False),
+    ("catalog-3", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"catalog-3"') is expected
+
+
+def test_bump_changes_the_etag_and_is_shared_through_mongo():
+    async def main():
+        meta = MetaCollection()
+        version = CatalogVersion(meta)
+        assert await version.load() == 0
+        first = version.etag
+        assert await version.bump() == 1
+        assert version.etag != first
+        # Another replica reads the same version
+        replica = CatalogVersion(meta)
+        await replica.load()
+        return version, replica, meta
+
+    version, replica, meta = asyncio.run(main())
+    assert replica.etag == version.etag == '"catalog-1"'
+    assert meta.docs[CATALOG_VERSION_ID]["version"] == 1
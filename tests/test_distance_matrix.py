@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+from distance_matrix import DistanceMatrix
+
+
+def temple(temple_id, lat, lng):
+    return {"id": temple_id, "coordinates": {"lat": lat, "lng": lng}}
+
+
+@pytest.fixture
+def temples():
+    rng = random.Random(7)
+    return [temple(f"t{i}", rng.uniform(8.0, 32.0), rng.uniform(69.0, 89.0)) for i in range(200)]
+
+
+def test_dense_and_on_request_agree(temples):
+    dense = DistanceMatrix()
+    dense.build(temples)
+    sparse = DistanceMatrix(max_dense=10)
+    sparse.build(temples)
+    assert dense.dense and not sparse.dense
+    ids = [t["id"] for t in temples[::7]] + ["missing"]
+    found, km, missing = dense.submatrix(ids)
+    assert missing == ["missing"]
+    assert found == sparse.submatrix(ids)[0]
+    np.testing.assert_allclose(km, sparse.submatrix(ids)[1], rtol=1e-5)
+
+
+def test_writes_keep_the_matrix_current(temples):
+    matrix = DistanceMatrix()
+    matrix.build(temples[:100])
+    for t in temples[100:]:
+        matrix.upsert(t)
+    matrix.upsert(temple("t0", 30.0, 70.0))
+    matrix.remove("t1")
+    fresh = DistanceMatrix()
+    fresh.build([temple("t0", 30.0, 70.0)] + temples[2:])
+    ids = ["t0"] + [t["id"] for t in temples[2::5]]
+    np.testing.assert_allclose(matrix.submatrix(ids)[1], fresh.submatrix(ids)[1], rtol=1e-5)
+    assert "t1" not in matrix.rows
+
+
+def test_matrix_never_grows_past_max_dense(temples):
+    matrix = DistanceMatrix(max_dense=100)
+    matrix.build(temples[:64])
+    for t in temples[64:100]:
+        matrix.upsert(t)
+        assert matrix._km.shape[0] <= 100
+    assert matrix.dense
+    matrix.upsert(temples[100])
+    assert not matrix.dense
+    # Freed rows are reused without growing the matrix either
+    matrix = DistanceMatrix(max_dense=100)
+    matrix.build(temples[:100])
+    matrix.remove("t0")
+    matrix.upsert(temples[100])
+    assert matrix.dense and matrix._km.shape[0] == 100
+
+
+def test_a_mapped_matrix_survives_writes_that_do_not_move_temples(tmp_path, temples):
+    from catalog_file import MappedCatalog, write_catalog_file
+
+    mapped = MappedCatalog(str(tmp_path / write_catalog_file(str(tmp_path), 1, temples)))
+    matrix = DistanceMatrix()
+    matrix.map(mapped)
+    assert matrix.dense and matrix.mapped is mapped
+    matrix.upsert({**temples[0], "name": "Renamed"})
+    assert matrix.dense
+    matrix.upsert(temple("t0", 30.0, 70.0))
+    assert not matrix.dense
+    fresh = DistanceMatrix()
+    fresh.build([temple("t0", 30.0, 70.0)] + temples[1:])
+    ids = [t["id"] for t in temples[::9]]
+    np.testing.assert_allclose(matrix.submatrix(ids)[1], fresh.submatrix(ids)[1], rtol=1e-5)
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from geo_index import GeoIndex, haversine_km
+
+
+def scan(points, lat, lng, k, radius_km=None):
+    hits = sorted(
+        (haversine_km(lat, lng, p_lat, p_lng), temple_id) for temple_id, (p_lat, p_lng) in points.items()
+    )
+    return [temple_id for distance, temple_id in hits if radius_km is None or distance <= radius_km][:k]
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(5)
+    return {f"t{i}": (rng.uniform(8.0, 32.0), rng.uniform(69.0, 89.0)) for i in range(2000)}
+
+
+@pytest.fixture
+def index(points):
+    index = GeoIndex()
+    index.build({"id": temple_id, "coordinates": {"lat": lat, "lng": lng}} for temple_id, (lat, lng) in points.items())
+    return index
+
+
+def test_nearest_matches_full_scan(index, points):
+    rng = random.Random(6)
+    for _ in range(100):
+        lat, lng = rng.uniform(8.0, 32.0), rng.uniform(69.0, 89.0)
+        hits = index.nearest(lat, lng, k=10)
+        assert [temple_id for temple_id, _ in hits] == scan(points, lat, lng, 10)
+        distances = [distance for _, distance in hits]
+        assert distances == sorted(distances)
+
+
+@pytest.mark.parametrize("lat, lng", [(-40.0, 179.9), (60.0, -170.0), (31.9, -88.2), (-80.0, 80.0)])
+def test_nearest_from_far_away_matches_full_scan(index, points, lat, lng):
+    assert [temple_id for temple_id, _ in index.nearest(lat, lng, k=5)] == scan(points, lat, lng, 5)
+
+
+def test_within_radius(index, points):
+    hits = index.within(20.0, 78.0, 150.0)
+    assert [temple_id for temple_id, _ in hits] == scan(points, 20.0, 78.0, len(points), 150.0)
+    assert all(distance <= 150.0 for _, distance in hits)
+    assert index.nearest(20.0, 78.0, k=3, radius_km=0.001) == []
+
+
+def test_upsert_moves_and_remove_drops(index):
+    index.upsert({"id": "t0", "coordinates": {"lat": 50.0, "lng": 50.0}})
+    assert index.nearest(50.0, 50.0, k=1)[0][0] == "t0"
+    index.remove("t0")
+    assert index.nearest(50.0, 50.0, k=1)[0][0] != "t0"
+    # Without coordinates a temple is not indexed at all
+    index.upsert({"id": "t1", "coordinates": {}})
+    assert "t1" not in index.points
+
+
+def test_empty_index():
+    assert GeoIndex().nearest(20.0, 78.0) == []
@@ -0,0 +1,114 @@
+import asyncio
+import io
+import json
+from typing import Dict, List
+
+import pytest
+
+pydantic = pytest.importorskip("pydantic")
+pytest.importorskip("pymongo")
+
+from pymongo.errors import BulkWriteError  # noqa: E402
+
+from benchmarks.standins import InMemoryCollection  # noqa: E402
+from ingest import MAX_REPORTED_ERRORS, detect_format, import_temples, iter_rows  # noqa: E402
+
+
+class Temple(pydantic.BaseModel):
+    """The parts of the server's Temple model that imports have to get right"""
+
+    id: str
+    name: str
+    festivals: List[str]
+    nearby_attractions: List[str]
+    coordinates: Dict[str, float]
+
+
+CSV = (
+    "id,name,festivals,nearby_attractions,lat,lng,coordinates,extra\n"
+    't1,Meenakshi,Chithirai|Navaratri,"[""Palace""]",9.9,78.1,,x\n'
+    't2,Kashi,,,,,"{""lat"": 25.3, ""lng"": 83.0}",x\n'
+    "t3,Broken,,,north,78.1,,x\n"
+    "t4,No coordinates,,,,,,x\n"
+    "t5,Spilled,,,1,2,,x,surplus\n"
+)
+
+
+def ndjson(*rows):
+    return "".join((row if isinstance(row, str) else json.dumps(row)) + "\n" for row in rows)
+
+
+def temple(temple_id, name="Temple"):
+    return {"id": temple_id, "name": name, "festivals": [], "nearby_attractions": [],
+            "coordinates": {"lat": 10.0, "lng": 78.0}}
+
+
+def run_import(collection, text, fmt, **options):
+    return asyncio.run(import_temples(collection, io.StringIO(text), fmt, Temple, **options))
+
+
+def test_csv_rows_become_temple_documents():
+    rows = dict(iter_rows(io.StringIO(CSV), "csv"))
+    assert rows[1]["festivals"] == ["Chithirai", "Navaratri"] and rows[1]["nearby_attractions"] == ["Palace"]
+    assert rows[1]["coordinates"] == {"lat": 9.9, "lng": 78.1} and "lat" not in rows[1]
+    assert rows[2]["coordinates"] == {"lat": 25.3, "lng": 83.0} and rows[2]["festivals"] == []
+    assert isinstance(rows[3], ValueError)
+    # Surplus cells go under the None key, which is dropped
+    assert None not in rows[5]
+
+
+def test_csv_errors_are_reported_by_row():
+    collection = InMemoryCollection("temples")
+    report = run_import(collection, CSV, "csv").as_dict()
+    assert report["rows"] == 5 and report["valid"] == 3 and report["upserted"] == 3
+    assert [error["row"] for error in report["errors"]] == [3, 4]
+    assert report["errors"][0]["error"].startswith("Unreadable row:")
+    assert report["errors"][1]["error"].startswith("coordinates:")
+    assert asyncio.run(collection.find_one({"id": "t1"}, {"_id": 0}))["name"] == "Meenakshi"
+
+
+def test_ndjson_import_upserts_in_batches():
+    collection = InMemoryCollection("temples")
+    batches = []
+
+    async def on_batch(docs):
+        batches.append([doc["id"] for doc in docs])
+
+    text = ndjson(temple("a"), "", "{not json", temple("b"), {"id": "c"}, temple("d"))
+    first = run_import(collection, text, "ndjson", batch_size=2, on_batch=on_batch).as_dict()
+    assert batches == [["a", "b"], ["d"]]
+    assert first["rows"] == 5 and first["valid"] == 3 and first["upserted"] == 3
+    assert [error["row"] for error in first["errors"]] == [3, 5]
+
+    again = run_import(collection, ndjson(temple("a"), temple("b", name="Renamed")), "ndjson").as_dict()
+    assert (again["upserted"], again["modified"], again["unchanged"]) == (0, 1, 1)
+
+
+def test_write_errors_are_reported_and_skip_on_batch():
+    class RejectingCollection(InMemoryCollection):
+        async def bulk_write(self, requests, ordered=True):
+            raise BulkWriteError({"writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}],
+                                  "nUpserted": 2, "nMatched": 0, "nModified": 0})
+
+    written = []
+
+    async def on_batch(docs):
+        written.extend(doc["id"] for doc in docs)
+
+    report = run_import(RejectingCollection("temples"), ndjson(temple("a"), temple("b"), temple("c")), "ndjson",
+                        on_batch=on_batch).as_dict()
+    assert report["upserted"] == 2 and written == ["a", "c"]
+    assert report["errors"] == [{"row": 2, "error": "Document failed validation"}]
+
+
+def test_only_the_first_errors_are_kept():
+    report = run_import(InMemoryCollection("temples"), "{\n" * (MAX_REPORTED_ERRORS + 5), "ndjson").as_dict()
+    assert report["error_count"] == MAX_REPORTED_ERRORS + 5 and len(report["errors"]) == MAX_REPORTED_ERRORS
+
+
+def test_format_comes_from_the_extension():
+    assert detect_format("Temples.CSV") == "csv" and detect_format("dump.jsonl") == "ndjson"
+    with pytest.raises(ValueError):
+        detect_format("temples.xlsx")
+    with pytest.raises(ValueError):
+        list(iter_rows(io.StringIO(""), "xml"))
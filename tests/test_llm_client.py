@@ -0,0 +1,159 @@
+import asyncio
+import time
+
+import pytest
+
+from llm_client import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, ResilientLlm
+
+
+class Provider:
+    """send/stream callables whose replies take `delays` in turn"""
+
+    def __init__(self, *delays, fail=False):
+        self.delays = list(delays)
+        self.fail = fail
+        self.calls = 0
+
+    async def send(self, text):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if self.fail:
+            raise RuntimeError("provider error")
+        return f"{text} after {delay}"
+
+    async def stream(self, text):
+        for word in (await self.send(text)).split():
+            yield word
+
+
+def client(provider, slots=2, **options):
+    return ResilientLlm(provider.send, provider.stream, asyncio.Semaphore(slots), **options)
+
+
+def test_deadline_abandons_a_slow_call():
+    async def scenario():
+        llm = client(Provider(10.0), deadline_seconds=0.05)
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await llm.send("plan")
+        return time.monotonic() - started, llm
+
+    elapsed, llm = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert llm.breaker.failures == 1 and not llm.semaphore.locked()
+
+
+def test_a_slow_call_is_hedged_once_latencies_are_known():
+    async def scenario(hedge_percentile):
+        provider = Provider(10.0, 0.0)
+        llm = client(provider, deadline_seconds=0.5, hedge_percentile=hedge_percentile)
+        for _ in range(20):
+            llm.latencies.add(0.01)
+        try:
+            return await llm.send("plan"), provider.calls
+        except asyncio.TimeoutError:
+            return None, provider.calls
+
+    assert asyncio.run(scenario(95)) == ("plan after 0.0", 2)
+    assert asyncio.run(scenario(0)) == (None, 1)
+
+
+def test_no_hedge_without_enough_samples_or_a_free_slot():
+    async def scenario(samples, slots):
+        provider = Provider(0.1)
+        llm = client(provider, slots=slots, hedge_percentile=50)
+        for _ in range(samples):
+            llm.latencies.add(0.01)
+        await llm.send("plan")
+        return provider.calls
+
+    assert asyncio.run(scenario(19, 2)) == 1
+    assert asyncio.run(scenario(20, 1)) == 1
+    assert asyncio.run(scenario(20, 2)) == 2
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.rejecting and not breaker.allow()
+    time.sleep(0.06)
+    # One probe goes out, the requests behind it wait for its outcome
+    assert not breaker.rejecting and breaker.allow()
+    assert breaker.state == HALF_OPEN and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opens == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    # A probe that ends without an outcome lets the next request probe instead
+    breaker.release()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.failures == 0 and breaker.allow()
+
+
+def test_an_open_breaker_rejects_without_calling():
+    async def scenario():
+        provider = Provider(0.0, fail=True)
+        llm = client(provider, breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60))
+        with pytest.raises(RuntimeError):
+            await llm.send("plan")
+        with pytest.raises(CircuitOpen):
+            await llm.send("plan")
+        with pytest.raises(CircuitOpen):
+            llm.check("plan")
+        with pytest.raises(CircuitOpen):
+            async for _ in llm.stream("plan"):
+                pass
+        return provider.calls
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_stream_releases_the_slot_while_the_consumer_is_busy():
+    async def scenario():
+        llm = client(Provider(0.0), slots=1)
+        chunks = []
+        async for chunk in llm.stream("day one"):
+            chunks.append(chunk)
+            if len(chunks) == 1:
+                await asyncio.sleep(0.01)
+                # The model has finished, so another call gets the slot
+                assert not llm.semaphore.locked()
+                assert await asyncio.wait_for(llm.send("next"), 0.5) == "next after 0.0"
+        return chunks, llm
+
+    chunks, llm = asyncio.run(scenario())
+    assert chunks == ["day", "one", "after", "0.0"]
+    assert llm.breaker.state == CLOSED
+
+
+def test_stream_deadline_and_provider_errors_count_as_failures():
+    async def scenario(provider):
+        llm = client(provider, deadline_seconds=0.05)
+        with pytest.raises((asyncio.TimeoutError, RuntimeError)):
+            async for _ in llm.stream("plan"):
+                pass
+        await asyncio.sleep(0)
+        return llm
+
+    for provider in (Provider(10.0), Provider(0.0, fail=True)):
+        llm = asyncio.run(scenario(provider))
+        assert llm.breaker.failures == 1 and not llm.semaphore.locked()
+
+
+def test_stopping_a_stream_early_is_not_a_failure():
+    async def scenario():
+        llm = client(Provider(0.0), breaker=CircuitBreaker(failure_threshold=1, reset_seconds=0))
+        llm.breaker.record_failure()
+        stream = llm.stream("plan")
+        assert await stream.__anext__() == "plan"
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return llm
+
+    llm = asyncio.run(scenario())
+    # The probe ended without an outcome, so the next request may probe again
+    assert llm.breaker.state == HALF_OPEN and llm.breaker.failures == 1 and llm.breaker.allow()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from plan_stream import ItineraryStreamParser, iter_reply_chunks, streams_replies, strip_code_fences
+
+PLAN = {
+    "title": "A {braced} \"quoted\" trip",
+    "duration": 3,
+    "daily_itinerary": [
+        {"day": 1, "location": "Madurai", "activities": ["Darshan at } the gate", "Aarti \\ {evening"]},
+        {"day": 2, "location": "Rameswaram \"Island\"", "temples": ["]Ramanathaswamy["]},
+        {"day": 3, "location": "Kanyakumari", "notes": {"nested": [1, {"deep": "}]"}]}},
+    ],
+    "total_temples": 3,
+}
+
+
+def reply():
+    return "```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+
+
+def feed_all(parser, chunks):
+    return [day for chunk in chunks for day in parser.feed(chunk)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10000])
+def test_days_split_across_chunks(size):
+    text = reply()
+    parser = ItineraryStreamParser()
+    days = feed_all(parser, [text[i:i + size] for i in range(0, len(text), size)])
+    assert days == PLAN["daily_itinerary"]
+    assert parser.result() == PLAN
+
+
+def test_each_day_is_returned_once_it_closes():
+    text = json.dumps(PLAN)
+    first_end = text.index('}, {"day": 2')
+    parser = ItineraryStreamParser()
+    assert parser.feed(text[:first_end]) == []
+    assert parser.feed(text[first_end:first_end + 1]) == PLAN["daily_itinerary"][:1]
+    assert parser.feed(text[first_end + 1:]) == PLAN["daily_itinerary"][1:]
+
+
+def test_nothing_after_the_itinerary_is_mistaken_for_a_day():
+    parser = ItineraryStreamParser()
+    text = json.dumps({"daily_itinerary": [{"day": 1}], "extra": [{"day": 99}]})
+    assert feed_all(parser, text) == [{"day": 1}]
+
+
+def test_a_reply_that_is_not_an_object_is_an_error():
+    parser = ItineraryStreamParser()
+    assert parser.feed("Sorry, no itinerary today.") == []
+    with pytest.raises(ValueError):
+        parser.result()
+    assert strip_code_fences("```\n[1]\n```") == "[1]"
+
+
+def test_reply_chunks_come_from_the_streaming_call():
+    class StreamingChat:
+        async def stream_message(self, message):
+            for chunk in (message, 1, "b"):
+                yield chunk
+
+    async def collect():
+        return [chunk async for chunk in iter_reply_chunks(StreamingChat(), "a")]
+
+    assert asyncio.run(collect()) == ["a", "1", "b"]
+    assert streams_replies(StreamingChat) and not streams_replies(object)
@@ -0,0 +1,72 @@
+import random
+from types import SimpleNamespace
+
+from planner import MAX_TEMPLES_PER_DAY, TWO_OPT_MAX_POINTS, order_route, plan_itinerary, road_km
+
+
+def path_km(points, start, order):
+    stops = ([start] if start is not None else []) + [points[i] for i in order]
+    return sum(road_km(stops[i], stops[i + 1]) for i in range(len(stops) - 1))
+
+
+def test_empty_route():
+    assert order_route([], (10.0, 78.0)) == []
+
+
+def test_points_on_a_line_are_visited_in_order():
+    points = [(10.0, 78.0 + 0.1 * i) for i in range(8)]
+    shuffled = points[:]
+    random.Random(1).shuffle(shuffled)
+    order = order_route(shuffled, start=(10.0, 77.9))
+    assert [shuffled[i] for i in order] == points
+
+
+def test_route_is_a_permutation_and_no_longer_than_nearest_neighbour():
+    rng = random.Random(2)
+    for size in (2, 5, 20, TWO_OPT_MAX_POINTS + 10):
+        points = [(rng.uniform(8.0, 30.0), rng.uniform(70.0, 88.0)) for _ in range(size)]
+        start = (20.0, 78.0)
+        order = order_route(points, start)
+        assert sorted(order) == list(range(size))
+
+        # Greedy tour that 2-opt starts from
+        remaining = set(range(size))
+        greedy = []
+        position = start
+        while remaining:
+            nearest = min(remaining, key=lambda i: (road_km(position, points[i]), i))
+            remaining.remove(nearest)
+            greedy.append(nearest)
+            position = points[nearest]
+        assert path_km(points, start, order) <= path_km(points, start, greedy) + 1e-6
+
+
+def test_two_opt_improves_the_nearest_neighbour_tour():
+    # Nearest neighbour from the start goes 0 -> 1 -> 2 -> 3; visiting 2 before 1 is shorter
+    points = [(0.0, 1.0), (0.0, 2.0), (1.0, 1.0), (1.0, 3.0)]
+    order = order_route(points, start=(0.0, 0.0))
+    assert path_km(points, (0.0, 0.0), order) < path_km(points, (0.0, 0.0), [0, 1, 2, 3])
+
+
+def test_precomputed_distances_give_the_same_route():
+    rng = random.Random(3)
+    points = [(rng.uniform(8.0, 30.0), rng.uniform(70.0, 88.0)) for _ in range(15)]
+    start = (12.0, 80.0)
+    nodes = [start] + points
+    dist = [[road_km(a, b) for b in nodes] for a in nodes]
+    assert order_route(points, start, dist) == order_route(points, start)
+
+
+def test_plan_itinerary_fills_every_day():
+    temples = [
+        {"id": f"t{i}", "name": f"Temple {i}", "city": "Madurai" if i == 0 else f"Town {i}", "state": "Tamil Nadu",
+         "coordinates": {"lat": 9.9 + 0.05 * i, "lng": 78.1 + 0.05 * i}}
+        for i in range(20)
+    ]
+    request = SimpleNamespace(starting_location="Madurai, Tamil Nadu", days=3, preferred_states=["Tamil Nadu"],
+                              temples_of_interest=["Temple 15"])
+    plan = plan_itinerary(request, temples)
+    assert [day["day"] for day in plan["daily_itinerary"]] == [1, 2, 3]
+    visited = [name for day in plan["daily_itinerary"] for name in day["temples"]]
+    assert "Temple 15" in visited
+    assert len(visited) == len(set(visited)) == plan["total_temples"] <= 3 * MAX_TEMPLES_PER_DAY
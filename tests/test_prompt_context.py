@@ -0,0 +1,63 @@
+import prompt_context
+from prompt_context import HEADER, build_context, encode_temple, estimate_tokens, rank_candidates
+
+MADURAI = (9.92, 78.12)
+
+
+def temple(temple_id, lat=None, lng=None, **fields):
+    coordinates = {"lat": lat, "lng": lng} if lat is not None else None
+    return {"id": temple_id, "name": fields.pop("name", temple_id.title()), "city": "City", "state": "Tamil Nadu",
+            "deity": "Shiva", "coordinates": coordinates, **fields}
+
+
+CANDIDATES = [
+    temple("far", 28.6, 77.2),
+    temple("near", 9.95, 78.10),
+    temple("nearby", 10.0, 78.2),
+    temple("midway", 13.0, 80.2),
+    temple("nowhere"),
+]
+
+
+def ids(temples):
+    return [t["id"] for t in temples]
+
+
+def test_interests_come_first_in_the_order_given():
+    ranked = rank_candidates(CANDIDATES + [temple("near", 0.0, 0.0)], MADURAI, ["far", "missing", "midway", "far"])
+    assert ids(ranked) == ["far", "midway", "near", "nearby", "nowhere"]
+    # The first copy of a duplicated id wins
+    assert ranked[2]["coordinates"]["lat"] == 9.95
+
+
+def test_closer_temples_rank_higher_and_unlocated_ones_last():
+    assert ids(rank_candidates(CANDIDATES, MADURAI)) == ["near", "nearby", "midway", "far", "nowhere"]
+
+
+def test_without_a_start_clusters_rank_above_lone_temples():
+    candidates = [temple("lone", 28.6, 77.2), temple("b", 10.0, 78.0), temple("a", 10.1, 78.1), temple("c", 10.2, 78.2)]
+    assert ids(rank_candidates(candidates, None)) == ["a", "b", "c", "lone"]
+
+
+def test_only_the_closest_candidates_are_scored(monkeypatch):
+    monkeypatch.setattr(prompt_context, "MAX_RANKED", 2)
+    assert ids(rank_candidates(CANDIDATES, MADURAI)) == ["near", "nearby", "nowhere"]
+
+
+def test_lines_are_added_until_the_budget_is_spent():
+    lines = [encode_temple(t, MADURAI) for t in rank_candidates(CANDIDATES, MADURAI)]
+    budget = estimate_tokens(HEADER) + sum(estimate_tokens(line) + 1 for line in lines[:2])
+    context = build_context(CANDIDATES, MADURAI, token_budget=budget)
+    assert context.text.splitlines() == [HEADER] + lines[:2]
+    assert ids(context.temples) == ["near", "nearby"]
+    assert context.candidates == 5 and context.tokens == budget
+    assert len(build_context(CANDIDATES, MADURAI, token_budget=budget - 1).temples) == 1
+
+
+def test_encoding_and_an_empty_context():
+    assert encode_temple(CANDIDATES[1], MADURAI) == "Near | City, Tamil Nadu | Shiva | 5"
+    assert encode_temple(CANDIDATES[1], None).endswith("| ?")
+    assert encode_temple(CANDIDATES[4], MADURAI).endswith("| ?")
+    empty = build_context(CANDIDATES, MADURAI, token_budget=estimate_tokens(HEADER))
+    assert empty.text == "No temples found for selected states" and empty.temples == [] and empty.tokens == 0
+    assert build_context([], None).candidates == 0
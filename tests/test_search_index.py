@@ -0,0 +1,106 @@
+import pytest
+
+from fuzzy_index import FuzzyIndex, bounded_distance
+from search_index import TempleSearchIndex
+
+TEMPLES = [
+    {"id": "meenakshi", "name": "Meenakshi Amman Temple", "city": "Madurai",
+     "location": "Madurai, Tamil Nadu", "state": "Tamil Nadu", "deity": "Meenakshi"},
+    {"id": "murugan", "name": "Thiruparankundram Murugan Temple", "city": "Madurai",
+     "location": "Madurai, Tamil Nadu", "state": "Tamil Nadu", "deity": "Murugan"},
+    {"id": "veeran", "name": "Madurai Veeran Temple", "city": "Chennai",
+     "location": "Chennai, Tamil Nadu", "state": "Tamil Nadu", "deity": "Madurai Veeran"},
+    {"id": "kashi", "name": "Kashi Vishwanath Temple", "city": "Varanasi",
+     "location": "Varanasi, Uttar Pradesh", "state": "Uttar Pradesh", "deity": "Shiva"},
+    {"id": "brihadeeswarar", "name": "Brihadeeswarar Temple", "city": "Thanjavur",
+     "location": "Thanjavur, Tamil Nadu", "state": "Tamil Nadu", "deity": "Shiva"},
+]
+
+
+@pytest.fixture
+def index():
+    index = TempleSearchIndex()
+    index.build(TEMPLES)
+    return index
+
+
+@pytest.fixture
+def fuzzy():
+    fuzzy = FuzzyIndex()
+    fuzzy.build(TEMPLES)
+    return fuzzy
+
+
+def test_prefix_matches_while_typing(index):
+    assert index.search_ids("meen") == ["meenakshi"]
+    assert index.search_ids("vishwa") == ["kashi"]
+
+
+def test_name_match_ranks_above_city_match(index):
+    # Veeran has Madurai in its name; the other two only in their city, tied and ordered by name
+    assert index.search_ids("madurai") == ["veeran", "meenakshi", "murugan"]
+
+
+def test_exact_word_ranks_above_prefix(index):
+    index.upsert({"id": "kashipur", "name": "Kashipur Devi Temple", "city": "Kashipur",
+                  "location": "Kashipur, Uttarakhand", "state": "Uttarakhand", "deity": "Durga"})
+    assert index.search_ids("kashi") == ["kashi", "kashipur"]
+
+
+def test_every_query_word_must_match(index):
+    assert index.search_ids("meenakshi temple") == ["meenakshi"]
+    assert index.search_ids("meenakshi varanasi") == []
+
+
+def test_filters_without_text_return_name_order(index):
+    assert index.search_ids(state="Tamil Nadu") == ["brihadeeswarar", "veeran", "meenakshi", "murugan"]
+    assert index.search_ids("temple", deity="shiva") == ["brihadeeswarar", "kashi"]
+    assert index.search_ids(state="Kerala") == []
+
+
+def test_limit(index):
+    assert index.search_ids("temple", limit=2) == index.search_ids("temple", limit=None)[:2]
+
+
+def test_writes_are_searchable(index):
+    index.remove("kashi")
+    assert index.search_ids("kashi") == []
+    index.upsert({**TEMPLES[0], "name": "Sri Meenakshi Sundareswarar Temple"})
+    assert index.search_ids("sundareswarar") == ["meenakshi"]
+    assert index.search_ids("amman") == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Minakshi", "meenakshi"),
+    ("Kasi Vishvanath", "kashi"),
+    ("Brihadishvara", "brihadeeswarar"),
+    ("Meenaksi temple", "meenakshi"),
+    ("Meenaksi tempel", "meenakshi"),
+    ("Thanajvur", "brihadeeswarar"),
+])
+def test_fuzzy_matches_transliteration_variants(fuzzy, query, expected):
+    assert fuzzy.search_ids(query)[0] == expected
+
+
+def test_transposed_letters_are_one_edit():
+    assert bounded_distance("tempel", "temple", 1) == 1
+    assert bounded_distance("abcd", "badc", 2) == 2
+    assert bounded_distance("kitten", "sitting", 3) == 3
+    assert bounded_distance("temple", "tmeple", 0) == 1
+    assert bounded_distance("ca", "abc", 5) == 3
+
+
+def test_fuzzy_ranks_closer_matches_first(fuzzy):
+    # Meenakshi matches Madurai by city and Veeran by name, which weighs more
+    assert fuzzy.search_ids("Madurei") == ["veeran", "meenakshi", "murugan"]
+
+
+def test_fuzzy_last_word_matches_as_prefix(fuzzy):
+    assert fuzzy.search_ids("thiruparan") == ["murugan"]
+
+
+def test_fuzzy_respects_allowed_and_removal(fuzzy):
+    assert fuzzy.search_ids("vishvanath", allowed={"meenakshi"}) == []
+    assert fuzzy.search_ids("vishvanath", allowed={"kashi"}) == ["kashi"]
+    fuzzy.remove("kashi")
+    assert fuzzy.search_ids("vishvanath") == []
@@ -0,0 +1,177 @@
+"""API-level checks against the in-memory stand-ins in benchmarks/standins.py"""
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("motor")
+
+from benchmarks.catalog import synthetic_temples  # noqa: E402
+from benchmarks.standins import load_server, seed_catalog  # noqa: E402
+
+ADMIN_TOKEN = "test-admin-token"
+# Large enough that building the catalog indexes takes a few seconds
+WARM_UP_TEMPLES = 20000
+
+
+@pytest.fixture(scope="module")
+def api():
+    """(server module, client, run) where run(coroutine) runs on the loop the app started on"""
+    server = load_server()
+    loop = asyncio.new_event_loop()
+
+    async def start():
+        await seed_catalog(server, synthetic_temples(50))
+        await server.app.router.startup()
+        await server.startup.wait_ready()
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test")
+
+    client = loop.run_until_complete(start())
+    yield server, client, loop.run_until_complete
+    loop.run_until_complete(client.aclose())
+    loop.run_until_complete(server.app.router.shutdown())
+    loop.close()
+
+
+def import_file(temple_id: str) -> bytes:
+    return (json.dumps({**synthetic_temples(1)[0], "id": temple_id}) + "\n").encode()
+
+
+def test_catalog_reads_answer_304_until_a_write(api):
+    server, client, run = api
+    first = run(client.get("/api/temples", params={"limit": 5}))
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and "max-age" in first.headers["cache-control"]
+
+    for header in (etag, f"W/{etag}", f'"stale", {etag}'):
+        cached = run(client.get("/api/temples", params={"limit": 5}, headers={"If-None-Match": header}))
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag and cached.content == b""
+
+    server.ADMIN_TOKEN = ADMIN_TOKEN
+    imported = run(client.post(
+        "/api/admin/temples/import",
+        files={"file": ("temples.ndjson", import_file("etag_test"), "application/x-ndjson")},
+        headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+    ))
+    assert imported.status_code == 200 and imported.json()["upserted"] == 1
+
+    after = run(client.get("/api/temples", params={"limit": 5}, headers={"If-None-Match": etag}))
+    assert after.status_code == 200
+    assert after.headers["etag"] != etag
+
+
+def test_admin_import_needs_the_token(api):
+    server, client, run = api
+
+    def post(headers):
+        return run(client.post(
+            "/api/admin/temples/import",
+            files={"file": ("temples.ndjson", import_file("admin_test"), "application/x-ndjson")},
+            headers=headers,
+        ))
+
+    server.ADMIN_TOKEN = None
+    assert post({"Authorization": "Bearer anything"}).status_code == 403
+    server.ADMIN_TOKEN = ADMIN_TOKEN
+    assert post({}).status_code == 401
+    assert post({"Authorization": "Bearer wrong"}).status_code == 401
+    assert run(client.get("/api/temples/admin_test")).status_code == 404
+
+
+def test_trip_jobs_can_be_polled_from_any_worker(api):
+    server, client, run = api
+    request = {"starting_location": "Madurai", "days": 2, "preferred_states": [], "temples_of_interest": []}
+
+    async def submit_and_wait():
+        accepted = await client.post("/api/trip-plan", params={"job": "true", "mode": "fast"}, json=request)
+        assert accepted.status_code == 202
+        job_id = accepted.json()["id"]
+        for _ in range(100):
+            if (await client.get(f"/api/trip-plans/{job_id}")).json().get("status") == "done":
+                break
+            await asyncio.sleep(0.01)
+        return job_id, await server.jobs_collection.find_one({"_id": job_id}, {"_id": 0, "updated_at": 0})
+
+    job_id, recorded = run(submit_and_wait())
+    assert recorded == {"status": "done"}
+
+    # Jobs this worker never saw, as recorded by another one
+    async def record(job_id, status):
+        await server.jobs_collection.update_one({"_id": job_id}, {"$set": {"status": status}}, upsert=True)
+
+    run(record("elsewhere", "running"))
+    assert run(client.get("/api/trip-plans/elsewhere")).json() == {"id": "elsewhere", "status": "running"}
+
+    async def done_elsewhere():
+        # Finished on the other worker, whose write buffer reaches Mongo a moment later
+        await record("finished-elsewhere", "done")
+        plan = {**(await client.get(f"/api/trip-plans/{job_id}")).json(), "id": "finished-elsewhere"}
+        del plan["status"]
+
+        async def write_later():
+            await asyncio.sleep(server.trip_store.flush_interval)
+            server.trip_store.add(plan)
+            await server.trip_store.flush()
+
+        writer = asyncio.create_task(write_later())
+        response = await client.get("/api/trip-plans/finished-elsewhere")
+        await writer
+        return response
+
+    response = run(done_elsewhere())
+    assert response.status_code == 200 and response.json()["status"] == "done"
+    assert run(client.get("/api/trip-plans/never-submitted")).status_code == 404
+
+
+def test_plan_stream_says_whether_days_arrive_incrementally(api, monkeypatch):
+    server, client, run = api
+    fake = server.LlmChat
+    monkeypatch.setattr(fake, "latency_seconds", 0.0)
+    monkeypatch.setattr(fake, "jitter_seconds", 0.0)
+
+    def stream(location):
+        request = {"starting_location": location, "days": 3, "preferred_states": [], "temples_of_interest": []}
+        response = run(client.post("/api/trip-plan/stream", json=request))
+        events = [json.loads(line) for line in response.text.splitlines()]
+        return response.headers["x-plan-delivery"], [event["type"] for event in events]
+
+    # The stand-in chat, like the real client, can only send the whole reply
+    assert stream("Madurai") == ("buffered", ["day", "day", "day", "plan"])
+
+    class StreamingChat(fake):
+        async def stream_message(self, message):
+            reply = await self.send_message(message)
+            for start in range(0, len(reply), 40):
+                yield reply[start:start + 40]
+
+    monkeypatch.setattr(server, "LlmChat", StreamingChat)
+    assert stream("Thanjavur") == ("incremental", ["day", "day", "day", "plan"])
+
+
+def test_healthz_answers_while_the_catalog_warms_up(api):
+    server, client, run = api
+
+    async def restart_and_poll():
+        await server.app.router.shutdown()
+        await seed_catalog(server, synthetic_temples(WARM_UP_TEMPLES))
+        await server.app.router.startup()
+        # Longest time between two answered polls, which includes any event-loop stall
+        longest_gap, polls = 0.0, 0
+        answered = time.perf_counter()
+        while not server.startup.ready:
+            assert (await client.get("/healthz")).status_code == 200
+            now = time.perf_counter()
+            longest_gap, answered = max(longest_gap, now - answered), now
+            polls += 1
+            await asyncio.sleep(0.01)
+        return longest_gap, polls
+
+    longest_gap, polls = run(restart_and_poll())
+    # The index builds take seconds; liveness must keep answering throughout
+    assert polls >= 10
+    assert longest_gap < 0.5
+    assert len(server.search_index) == WARM_UP_TEMPLES
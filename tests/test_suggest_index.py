@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+import suggest_index
+from suggest_index import SuggestIndex
+
+TEMPLES = [
+    {"id": "t1", "name": "Kashi Vishwanath Temple", "city": "Varanasi", "state": "Uttar Pradesh", "deity": "Shiva"},
+    {"id": "t2", "name": "Kamakhya Temple", "city": "Guwahati", "state": "Assam", "deity": "Kamakhya"},
+    {"id": "t3", "name": "Kedarnath Temple", "city": "Kedarnath", "state": "Uttarakhand", "deity": "Shiva"},
+    {"id": "t4", "name": "Meenakshi Temple", "city": "Madurai", "state": "Tamil Nadu", "deity": "Meenakshi"},
+    {"id": "t5", "name": "Kapaleeshwarar Temple", "city": "Chennai", "state": "Tamil Nadu", "deity": "Shiva"},
+]
+
+
+def labels(index, prefix, k=10):
+    return [(hit["type"], hit["label"]) for hit in index.suggest(prefix, k)]
+
+
+def test_whole_label_matches_rank_first_then_shorter_labels():
+    index = SuggestIndex()
+    index.build(TEMPLES)
+    assert labels(index, "ka", 3) == [
+        ("deity", "Kamakhya"), ("temple", "Kamakhya Temple"), ("temple", "Kapaleeshwarar Temple")
+    ]
+    # Word suffixes match too, after whole-label matches
+    assert labels(index, "te", 2) == [("temple", "Kamakhya Temple"), ("temple", "Kedarnath Temple")]
+    assert labels(index, "vish") == [("temple", "Kashi Vishwanath Temple")]
+    assert labels(index, "Tamil  ") == [("state", "Tamil Nadu")]
+    assert labels(index, "") == [] and labels(index, "zzz") == []
+
+
+def test_categories_with_more_temples_rank_first():
+    index = SuggestIndex()
+    index.build(TEMPLES + [{"id": "t6", "name": "Kadri Temple", "city": "Mangaluru", "state": "Karnataka", "deity": "Kadri"}])
+    assert labels(index, "k", 1) == [("deity", "Kadri")]
+    index.upsert_many([{**TEMPLES[0], "city": "Kedarnath"}])
+    # Kedarnath is now the city of two temples
+    assert labels(index, "k", 1) == [("city", "Kedarnath")]
+
+
+def test_counts_follow_writes():
+    index = SuggestIndex()
+    index.build(TEMPLES)
+    index.remove("t4")
+    assert labels(index, "meenakshi") == []
+    assert labels(index, "tamil") == [("state", "Tamil Nadu")]
+    index.remove("t5")
+    assert labels(index, "tamil") == []
+    index.upsert_many([{**TEMPLES[1], "name": "Kamakhya Devi Temple"}])
+    assert ("temple", "Kamakhya Devi Temple") in labels(index, "devi")
+    assert ("temple", "Kamakhya Temple") not in labels(index, "kamakhya")
+
+
+@pytest.mark.parametrize("threshold", [8, 256])
+def test_incremental_writes_match_a_rebuild(monkeypatch, threshold):
+    # A small threshold precomputes most prefixes, so writes move entries within their lists and refill them
+    monkeypatch.setattr(suggest_index, "PRECOMPUTE_THRESHOLD", threshold)
+    monkeypatch.setattr(suggest_index, "MAX_K", 3)
+    monkeypatch.setattr(suggest_index, "TOP_DEPTH", 5)
+    rng = random.Random(4)
+    words = ["Sri", "Maha", "Kashi", "Kala", "Rama", "Ranga", "Shiva", "Siddhi", "Temple", "Mandir"]
+    states = ["Kerala", "Karnataka", "Tamil Nadu", "Telangana"]
+
+    def temple(temple_id):
+        return {"id": temple_id, "name": " ".join(rng.sample(words, 3)), "city": rng.choice(words),
+                "state": rng.choice(states), "deity": rng.choice(words)}
+
+    temples = {f"t{i}": temple(f"t{i}") for i in range(300)}
+    index = SuggestIndex()
+    index.build(temples.values())
+    prefixes = [""] + [word.lower()[:end] for word in words + states for end in (1, 2, 4)]
+    for step in range(40):
+        batch = [temple(rng.choice(list(temples)) if rng.random() < 0.7 else f"n{step}_{i}")
+                 for i in range(rng.choice([1, 5, 60]))]
+        for changed in batch:
+            temples[changed["id"]] = changed
+        index.upsert_many(batch)
+        for temple_id in rng.sample(list(temples), 2):
+            del temples[temple_id]
+            index.remove(temple_id)
+
+        rebuilt = SuggestIndex()
+        rebuilt.build(temples.values())
+        assert index.keys == rebuilt.keys
+        for prefix in prefixes:
+            assert index.suggest(prefix, 3) == rebuilt.suggest(prefix, 3), (step, prefix)
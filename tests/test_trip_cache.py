@@ -0,0 +1,142 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import trip_cache
+from trip_cache import TripPlanCache, trip_plan_cache_key
+
+
+def request(**overrides):
+    fields = {"starting_location": "Chennai", "days": 3, "preferred_states": ["Tamil Nadu"], "temples_of_interest": []}
+    return SimpleNamespace(**{**fields, **overrides})
+
+
+def test_key_ignores_case_whitespace_and_order():
+    assert trip_plan_cache_key(request(starting_location="  chennai ")) == trip_plan_cache_key(request())
+    assert (
+        trip_plan_cache_key(request(preferred_states=["Kerala", "tamil nadu", "Tamil Nadu"]))
+        == trip_plan_cache_key(request(preferred_states=["Tamil  Nadu", "kerala"]))
+    )
+    assert trip_plan_cache_key(request(days=4)) != trip_plan_cache_key(request())
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(trip_cache.time, "monotonic", lambda: now[0])
+    cache = TripPlanCache(ttl_seconds=60)
+    cache.put("k", "plan")
+    now[0] += 59
+    assert cache.get("k") == "plan"
+    now[0] += 1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TripPlanCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_concurrent_callers_share_one_computation():
+    async def main():
+        cache = TripPlanCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "plan", True
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        again = await cache.get_or_compute("k", compute)
+        return cache, calls, results, again
+
+    cache, calls, results, again = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == ["plan"] * 5 and again == "plan"
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 1)
+
+
+def test_uncacheable_value_is_shared_but_not_stored():
+    async def main():
+        cache = TripPlanCache()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return "fallback", False
+
+        results = await asyncio.gather(cache.get_or_compute("k", compute), cache.get_or_compute("k", compute))
+        return cache, results
+
+    cache, results = asyncio.run(main())
+    assert results == ["fallback", "fallback"]
+    assert cache.get("k") is None
+
+
+def test_error_reaches_every_waiter_and_is_not_cached():
+    async def main():
+        cache = TripPlanCache()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("llm down")
+
+        results = await asyncio.gather(
+            cache.get_or_compute("k", compute), cache.get_or_compute("k", compute), return_exceptions=True
+        )
+        return cache, results
+
+    cache, results = asyncio.run(main())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert cache.get("k") is None and cache.stats()["in_flight"] == 0
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled():
+    async def main():
+        cache = TripPlanCache()
+        calls = []
+
+        async def compute(tag):
+            calls.append(tag)
+            await asyncio.sleep(0.05)
+            return tag, True
+
+        leader = asyncio.create_task(cache.get_or_compute("k", lambda: compute("leader")))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", lambda tag=tag: compute(tag))) for tag in ("w1", "w2")]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return calls, await asyncio.gather(*waiters)
+
+    calls, results = asyncio.run(main())
+    assert calls == ["leader", "w1"]
+    assert results == ["w1", "w1"]
+
+
+def test_cancelled_waiter_leaves_the_computation_running():
+    async def main():
+        cache = TripPlanCache()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "plan", True
+
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(main()) == "plan"
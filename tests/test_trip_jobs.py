@@ -0,0 +1,91 @@
+import asyncio
+
+from trip_jobs import DONE, FAILED, PENDING, RUNNING, TripPlanJobQueue
+
+
+class StatusCollection:
+    """Just enough of a Motor collection for job statuses"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            doc = self.docs[query["_id"]] = {}
+            doc.update(update.get("$setOnInsert", {}))
+        doc.update(update.get("$set", {}))
+
+    async def find_one(self, query, projection):
+        doc = self.docs.get(query["_id"])
+        return None if doc is None else {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+def test_statuses_are_recorded_for_other_workers():
+    async def scenario():
+        release = asyncio.Event()
+        statuses = StatusCollection()
+
+        async def handler(job):
+            await release.wait()
+            if job.request == "bad":
+                raise ValueError("no plan")
+
+        queue = TripPlanJobQueue(handler, concurrency=2, status_collection=statuses)
+        # Another worker only sees what the queue recorded
+        elsewhere = TripPlanJobQueue(handler, status_collection=statuses)
+        queue.start()
+        good, bad = queue.submit("good"), queue.submit("bad")
+        await queue.record(good)
+        await queue.record(bad)
+        assert (await elsewhere.recorded(good.id))["status"] in (PENDING, RUNNING)
+        await asyncio.sleep(0)
+        assert (await elsewhere.recorded(good.id))["status"] == RUNNING
+        # A late pending write does not undo the worker's update
+        good.status = PENDING
+        await queue.record(good)
+        assert (await elsewhere.recorded(good.id))["status"] == RUNNING
+        release.set()
+        await queue._queue.join()
+        await asyncio.sleep(0)
+        await queue.stop()
+        assert await elsewhere.recorded(good.id) == {"id": good.id, "status": DONE}
+        assert await elsewhere.recorded(bad.id) == {"id": bad.id, "status": FAILED, "error": "no plan"}
+        assert await elsewhere.recorded("unknown") is None
+
+    asyncio.run(scenario())
+
+
+def test_nothing_is_recorded_without_a_collection():
+    async def scenario():
+        queue = TripPlanJobQueue(lambda job: asyncio.sleep(0))
+        queue.start()
+        job = queue.submit("request")
+        await queue.record(job)
+        await queue._queue.join()
+        await queue.stop()
+        assert job.status == DONE
+        assert await queue.recorded(job.id) is None
+
+    asyncio.run(scenario())
+
+
+def test_stop_drains_then_fails_what_is_left():
+    async def scenario(timeout):
+        statuses = StatusCollection()
+        stuck = asyncio.Event()
+
+        async def handler(job):
+            if job.request == "slow":
+                await stuck.wait()
+
+        queue = TripPlanJobQueue(handler, concurrency=1, status_collection=statuses)
+        queue.start()
+        jobs = [queue.submit(request) for request in ("quick", "slow", "queued")]
+        await queue.stop(timeout=timeout)
+        return jobs, [statuses.docs.get(job.id, {}).get("status") for job in jobs], queue
+
+    jobs, recorded, queue = asyncio.run(scenario(0.05))
+    assert [job.status for job in jobs] == recorded == [DONE, FAILED, FAILED]
+    assert "shut down" in jobs[1].error and "shut down" in jobs[2].error
+    assert queue.failed == 2 and queue.stats()["running"] == 0
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from benchmarks.standins import InMemoryCollection  # noqa: E402
+from trip_store import WRITE_ATTEMPTS, TripStore, plan_body, plan_hash  # noqa: E402
+
+
+def trip(trip_id, title="Temple Trail", days=2):
+    return {
+        "id": trip_id,
+        "title": title,
+        "duration": days,
+        "daily_itinerary": [{"day": day, "location": "Madurai"} for day in range(1, days + 1)],
+        "total_temples": days,
+        "estimated_cost": "₹6000",
+        "best_travel_mode": "Car",
+    }
+
+
+class FlakyCollection(InMemoryCollection):
+    """Fails the next `failures` insert_many calls, after storing the first `stored` documents"""
+
+    def __init__(self, name, failures=0, stored=0):
+        super().__init__(name)
+        self.failures = failures
+        self.stored = stored
+        self.calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            await super().insert_many(docs[:self.stored], ordered)
+            raise ConnectionError("primary stepped down")
+        return await super().insert_many(docs, ordered)
+
+
+async def store(trips=None, **options):
+    trips = trips or InMemoryCollection("trips")
+    # The unique index the server creates, which makes a retried insert a duplicate
+    await trips.create_index([("id", 1)], unique=True)
+    return TripStore(trips, InMemoryCollection("plans"), **options)
+
+
+def test_trips_are_written_in_batches_and_readable_throughout():
+    async def scenario():
+        trips = FlakyCollection("trips")
+        trip_store = await store(trips, batch_size=2, flush_interval=60)
+        trip_store.start()
+        trip_store.add(trip("trip-0", title="Trip 0"))
+        await asyncio.sleep(0.01)
+        # Less than a batch waits for the interval, and is served from memory meanwhile
+        assert trips.calls == 0 and (await trip_store.get("trip-0"))["title"] == "Trip 0"
+        for i in range(1, 5):
+            trip_store.add(trip(f"trip-{i}", title=f"Trip {i}"))
+        # A full batch wakes the flusher, which writes everything buffered
+        await asyncio.sleep(0.01)
+        assert trips.calls == 3 and not trip_store.pending
+        trip_store.add(trip("trip-5", title="Trip 5"))
+        await trip_store.stop()
+        return trip_store, trips
+
+    trip_store, trips = asyncio.run(scenario())
+    assert trips.calls == 4 and not trip_store.pending
+    assert trip_store.stats() == {"buffered": 0, "written": 6, "deduplicated": 0, "failed": 0, "dropped": 0}
+    assert asyncio.run(trip_store.get("trip-3")) == trip("trip-3", title="Trip 3")
+
+
+def test_identical_itineraries_are_stored_once():
+    async def scenario():
+        trip_store = await store()
+        for i in range(3):
+            trip_store.add(trip(f"same-{i}"))
+        trip_store.add(trip("other", days=3))
+        await trip_store.flush()
+        trip_store.add(trip("same-again"))
+        await trip_store.flush()
+        return trip_store, [await trip_store.get(trip_id) for trip_id in ("same-0", "same-again", "other")]
+
+    trip_store, read = asyncio.run(scenario())
+    assert trip_store.deduplicated == 3
+    assert len(trip_store.plans_collection._docs) == 2
+    stored = asyncio.run(trip_store.trips_collection.find_one({"id": "same-1"}, {"_id": 0}))
+    assert set(stored) == {"id", "plan_hash", "created_at"}
+    assert stored["plan_hash"] == plan_hash(plan_body(trip("same-1")))
+    assert read == [trip("same-0"), trip("same-again"), trip("other", days=3)]
+
+
+def test_a_failed_batch_is_retried_on_later_flushes():
+    async def scenario():
+        # The first attempt stores one trip before failing; the retry must not trip over it
+        trips = FlakyCollection("trips", failures=1, stored=1)
+        trip_store = await store(trips)
+        trip_store.add(trip("a"))
+        trip_store.add(trip("b"))
+        await trip_store.flush()
+        assert trip_store.stats()["buffered"] == 2 and (await trip_store.get("b")) == trip("b")
+        await trip_store.flush()
+        return trip_store
+
+    trip_store = asyncio.run(scenario())
+    assert trip_store.written == 2 and trip_store.failed == 0 and not trip_store.pending
+    assert len(trip_store.trips_collection._docs) == 2
+
+
+def test_a_batch_is_given_up_after_its_attempts():
+    async def scenario():
+        trip_store = await store(FlakyCollection("trips", failures=WRITE_ATTEMPTS))
+        trip_store.add(trip("doomed"))
+        for _ in range(WRITE_ATTEMPTS):
+            await trip_store.flush()
+        return trip_store
+
+    trip_store = asyncio.run(scenario())
+    assert trip_store.failed == 1 and trip_store.written == 0
+    assert asyncio.run(trip_store.get("doomed")) is None
+
+
+def test_shutdown_does_not_retry_and_a_full_buffer_drops_the_oldest():
+    async def scenario():
+        trip_store = await store(FlakyCollection("trips", failures=1), max_buffered=2)
+        for trip_id in ("first", "second", "third"):
+            trip_store.add(trip(trip_id))
+        assert list(trip_store.pending) == ["second", "third"]
+        await trip_store.stop()
+        return trip_store
+
+    trip_store = asyncio.run(scenario())
+    # The two left share a body, which is stored even though their trips are not
+    assert trip_store.stats() == {"buffered": 0, "written": 0, "deduplicated": 1, "failed": 2, "dropped": 1}
+
+
+def test_a_trip_whose_body_expired_is_gone():
+    async def scenario():
+        trip_store = await store()
+        trip_store.add(trip("expiring"))
+        await trip_store.flush()
+        await trip_store.plans_collection.delete_many({})
+        return await trip_store.get("expiring")
+
+    assert asyncio.run(scenario()) is None